@@ -1,19 +1,43 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file, Response, stream_with_context
 import os
 import json
-import plotly
-import plotly.graph_objs as go
-from datetime import datetime
+import atexit
+import time
+import threading
+from datetime import datetime, timedelta, timezone
 import logging
 from dotenv import load_dotenv
 
 # Import our utility modules
+from utils.lazy_import import LazyModule, preload
 from utils.stock_api import StockAPI
 from utils.news_api import NewsAPI
+from utils.news_store import NewsStore, NewsIngester
+from utils.news_ranker import NewsRanker, ArticleEmbedder
 from utils.cache import SimpleCache
+from utils.cache_warmer import CacheWarmer
+from utils.symbol_index import SymbolIndex
+from utils import metrics
+from utils.metrics import stage
+from utils.deadline import Deadline
+from utils.circuit_breaker import upstream_guard, upstream_status, BREAKER_RESET_SECONDS
+from utils.admission import AdmissionController, Overloaded
+from utils.profiler import RequestProfiler
+from utils.responses import json_response, entry_etag, make_etag
+from utils.response_profiles import PROFILES, DEFAULT_PROFILE, render_profile, to_columnar
+from utils.fundamentals_store import FundamentalsStore, FundamentalsSnapshotter, parse_screen_query
+from utils.history_store import HistoryStore, HISTORY_PAGE_SIZE
+from utils.intraday_store import IntradayStore, RESOLUTIONS, RANGES, BASE_RESOLUTION, INTRADAY_RETENTION_DAYS
+from utils.quote_stream import QuoteHub, QUOTE_MAX_SYMBOLS, QUOTE_STREAM_MAX_SECONDS, QUOTE_HEARTBEAT_SECONDS
+from utils.watchlists import WatchlistStore, AlertEvaluator, NOTIFICATION_PAGE_SIZE, WATCHLIST_MAX_TICKERS
+from utils.backtest import backtest, BACKTEST_HORIZONS, BACKTEST_BENCHMARK
+from utils.portfolio import parse_holdings, portfolio_risk, sector_weights, PORTFOLIO_HISTORY_MONTHS
 
 # Import LLMClient - use Lambda API for RAG
-from utils.llm_client_lambda_api import LambdaAPILLMClient as LLMClient
+from utils.llm_client_lambda_api import LambdaAPILLMClient as LLMClient, llm_cache_stats, LAMBDA_API_ENDPOINT
+
+# Plotly is only needed for the full response profile's chart
+go = LazyModule('plotly.graph_objs')
 
 # Load environment variables
 load_dotenv()
@@ -25,12 +49,31 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+metrics.init_app(app)
 
 # Initialize our services
-stock_api = StockAPI()
-news_api = NewsAPI()
 cache = SimpleCache()
 
+# Global affairs news is ingested in the background and analyses read it from the local store
+news_store = NewsStore(os.path.join(cache.cache_dir, 'news.sqlite3'))
+news_api = NewsAPI(store=news_store)
+
+# Stored articles are embedded once with the book corpus model and ranked per ticker
+news_ranker = NewsRanker(news_store, ArticleEmbedder(LAMBDA_API_ENDPOINT))
+
+# Caps concurrent cold analyses across workers so cache hits never wait behind LLM calls
+admission = AdmissionController(lock_dir=os.path.join(cache.cache_dir, 'admission'))
+
+# Opt-in request profiling (PROFILE_SAMPLE_RATE or X-Profile header with the admin token)
+profiler = RequestProfiler(profile_dir=os.path.join(cache.cache_dir, 'profiles'))
+profiler.init_app(app)
+
+# Analyses that skipped stages to meet the deadline are only cached briefly
+DEGRADED_CACHE_MINUTES = float(os.getenv('DEGRADED_CACHE_MINUTES', 5))
+
+# Largest portfolio holdings whose company data (name, sector) is fetched for the portfolio analysis
+PORTFOLIO_INFO_HOLDINGS = int(os.getenv('PORTFOLIO_INFO_HOLDINGS', 10))
+
 # Popular tickers for the dropdown
 POPULAR_TICKERS = [
     ('AAPL', 'Apple Inc.'),
@@ -45,6 +88,28 @@ POPULAR_TICKERS = [
     ('QQQ', 'Invesco QQQ Trust')
 ]
 
+# Local symbol directory: validation and autocomplete without a network call
+symbol_index = SymbolIndex(os.path.join(cache.cache_dir, 'symbols.tsv'), seed=POPULAR_TICKERS)
+stock_api = StockAPI(symbol_index=symbol_index)
+
+# Answer from the last stored analysis (up to this old) when a fresh one cannot be produced
+HISTORY_FALLBACK_MAX_DAYS = float(os.getenv('HISTORY_FALLBACK_MAX_DAYS', 7))
+
+# Append-only record of every analysis produced (/history, /backtest and the stale fallback)
+history = HistoryStore(os.path.join(cache.cache_dir, 'history.sqlite3'))
+
+# Per-ticker 1-minute bars and their resampled pyramid behind /intraday
+intraday = IntradayStore(os.path.join(cache.cache_dir, 'intraday'))
+
+# One quote poller per worker, fanned out to every /quotes/stream client
+quote_hub = QuoteHub(stock_api.get_quotes, cache, os.path.join(cache.cache_dir, 'quotes.lock'))
+
+# Users' watchlists, alert rules and triggered notifications
+watchlists = WatchlistStore(os.path.join(cache.cache_dir, 'watchlists.sqlite3'))
+
+# Daily columnar fundamentals snapshots behind /screener
+fundamentals = FundamentalsStore(os.path.join(cache.cache_dir, 'fundamentals'))
+
 @app.route('/')
 def index():
     """Main page with stock analysis form"""
@@ -57,93 +122,710 @@ def index():
 @app.route('/analyze', methods=['POST'])
 def analyze_stock():
     """Analyze a stock and return the results"""
+    ticker = request.form.get('ticker', '').upper().strip()
+    return analysis_response(ticker, request.values.get('profile', DEFAULT_PROFILE))
+
+@app.route('/analyze/<ticker>', methods=['GET'])
+def analyze_stock_get(ticker):
+    """Cacheable GET variant of /analyze supporting ETag / If-None-Match"""
+    return analysis_response(ticker.upper().strip(), request.args.get('profile', DEFAULT_PROFILE))
+
+@app.route('/analyze/<ticker>/version')
+def analysis_version(ticker):
+    """Freshness check for client-side caches: the ETag /analyze/<ticker> would return, without analyzing.
+
+    `version` is null when no analysis of the ticker is cached yet today.
+    """
     try:
-        ticker = request.form.get('ticker', '').upper().strip()
-        
-        if not ticker:
-            return jsonify({'error': 'Please provide a stock ticker symbol.'}), 400
+        ticker = ticker.upper().strip()
+        profile = request.args.get('profile', DEFAULT_PROFILE).lower()
+        if profile not in PROFILES:
+            return jsonify({'error': f'Invalid profile: {profile}. Use one of: {", ".join(PROFILES)}'}), 400
+        cached_entry = cache.get_entry(analysis_cache_key(ticker))
+        return jsonify({
+            'ticker': ticker,
+            'profile': profile,
+            'version': entry_etag(cached_entry, profile) if cached_entry else None,
+            'generated_at': cached_entry['value'].get('generated_at') if cached_entry else None
+        })
+    except Exception as e:
+        logger.error(f"Error in analysis_version: {str(e)}")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/symbols/search')
+def search_symbols():
+    """Autocomplete: ranked symbol / company name matches from the local directory"""
+    query = request.args.get('q', '').strip()
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if len(query) > 40:
+        return jsonify({'error': 'Query too long'}), 400
+    return json_response({'query': query, 'results': symbol_index.search(query, limit=limit)},
+                         cache_control='public, max-age=3600')
+
+@app.route('/portfolio', methods=['POST'])
+def analyze_portfolio():
+    """Risk metrics and one consolidated analysis for a portfolio of holdings"""
+    try:
+        payload = request.get_json(silent=True) or {}
+        try:
+            holdings = parse_holdings(payload.get('holdings'))
+            months = min(max(int(payload.get('months', PORTFOLIO_HISTORY_MONTHS)), 2), 60)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Validate ticker
-        if not stock_api.validate_ticker(ticker):
-            return jsonify({'error': f'Invalid ticker symbol: {ticker}'}), 400
+        rejected = [ticker for ticker, _ in holdings if symbol_index.rejects(ticker)]
+        if rejected:
+            return jsonify({'error': f'Invalid ticker symbol: {", ".join(rejected)}'}), 400
         
-        # Create cache key for this analysis
         cache_key = {
-            'ticker': ticker,
-            'date': datetime.now().strftime('%Y-%m-%d'),
-            'type': 'full_analysis'
+            'type': 'portfolio_analysis',
+            'holdings': sorted([ticker, round(weight, 6)] for ticker, weight in holdings),
+            'months': months,
+            'date': datetime.now().strftime('%Y-%m-%d')
         }
+        deadline = Deadline()
         
-        # Check cache first
-        cached_result = cache.get(cache_key)
+        with stage('cache_get'):
+            cached_result = cache.get(cache_key)
+        metrics.record_cache_lookup(bool(cached_result))
         if cached_result:
-            logger.info(f"Returning cached analysis for {ticker}")
-            return jsonify(cached_result)
-        
-        # Get stock data
-        logger.info(f"Fetching stock data for {ticker}")
-        company_data = stock_api.get_company_info(ticker)
-        if not company_data:
-            return jsonify({'error': f'Failed to fetch company data for {ticker}'}), 500
-        
-        price_data = stock_api.get_historical_data(ticker, months=6)
-        if not price_data:
-            return jsonify({'error': f'Failed to fetch price data for {ticker}'}), 500
-        
-        # Note: News and RAG analysis now handled internally by LLM client
-        # The enhanced RAG system will:
-        # 1. Get global affairs news automatically
-        # 2. Generate investment themes from current events  
-        # 3. Search books for relevant investment principles
-        # 4. Use both global context + book wisdom in analysis
-        
-        # Create price chart
-        logger.info(f"About to create price chart for {company_data['name']}")
-        price_chart = create_price_chart(price_data, company_data['name'])
-        logger.info(f"Price chart created: {bool(price_chart)}, length: {len(price_chart) if price_chart else 0}")
-        
-        # Get enhanced LLM analysis with global affairs + investment literature
-        logger.info(f"Getting enhanced RAG analysis for {ticker}")
+            logger.info(f"Returning cached portfolio analysis ({len(holdings)} holdings)")
+            return json_response(cached_result)
+        
+        if not upstream_guard('yfinance').available():
+            return market_data_unavailable()
+        
+        # A portfolio costs about as much as one cold analysis: one batched download and one Claude call
+        with admission.slot(max_wait=deadline.remaining() / 2):
+            result, error = run_portfolio_analysis(holdings, months, deadline)
+            if error:
+                return jsonify({'error': error}), 504 if deadline.expired() else 500
+            with stage('cache_set'):
+                cache.set(cache_key, result, expiry_hours=result_expiry_hours(result))
+        
+        return json_response(result)
+        
+    except Overloaded as e:
+        response = jsonify({'error': 'The server is busy with other analyses. Please try again shortly.'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except Exception as e:
+        logger.error(f"Error in analyze_portfolio: {str(e)}")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/screener')
+def screener():
+    """Filter and rank stored fundamentals, e.g. ?pe_ratio.lt=15&dividend_yield.gt=2&sort=-dividend_yield"""
+    try:
+        query = parse_screen_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        # Screens never call yfinance; the ETag changes whenever a snapshot file does
+        etag = make_etag(fundamentals.signature(query['as_of']), sorted(request.args.items(multi=True)))
+        return json_response(lambda: fundamentals.screen(**query), etag=etag, cache_control='public, max-age=300')
+    except Exception as e:
+        logger.error(f"Error in screener: {str(e)}")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/backtest')
+def backtest_recommendations():
+    """Score stored recommendations against realized forward returns"""
+    try:
         try:
-            llm_client = LLMClient()
-            analysis = llm_client.get_stock_analysis(company_data, price_data, [])
-        except Exception as e:
-            logger.error(f"LLM analysis failed: {str(e)}")
-            analysis = {
-                'recommendation': 'HOLD',
-                'confidence_score': 0,
-                'rationale': f'LLM analysis unavailable: {str(e)}',
-                'key_factors': [],
-                'risks': [],
-                'price_target': 'N/A',
-                'rag_context': {
-                    'sources': [],
-                    'reasoning': 'Technical error occurred during analysis.'
-                }
-            }
+            horizons = sorted({int(h) for h in request.args.get('horizons', '').split(',') if h.strip()}) or BACKTEST_HORIZONS
+            if not all(0 < h <= 252 for h in horizons):
+                raise ValueError
+        except ValueError:
+            return jsonify({'error': 'horizons must be comma-separated trading day counts between 1 and 252'}), 400
+        tickers = [t.strip().upper() for t in request.args.get('tickers', '').split(',') if t.strip()] or None
+        since = request.args.get('since') or None
+        sources = None if request.args.get('source') == 'all' else ('llm',)
         
-        # Prepare result
-        result = {
-            'success': True,
-            'ticker': ticker,
-            'company_data': company_data,
-            'price_data': price_data,
-            'news_articles': analysis.get('rag_context', {}).get('global_news', [])[:5],  # Global affairs news from RAG
-            'analysis': analysis,
-            'chart_data': price_chart,  # Fixed: was 'price_chart', now 'chart_data'
-            'generated_at': datetime.now().isoformat()
+        recommendations = history.recommendations(tickers=tickers, since=since, sources=sources)
+        if not recommendations:
+            return jsonify({'recommendations': 0, 'horizons': {}, 'message': 'No stored recommendations match.'})
+        
+        # Results change when new recommendations are stored or a new trading day closes
+        cache_key = {
+            'type': 'backtest',
+            'horizons': horizons,
+            'tickers': tickers,
+            'since': since,
+            'sources': sources,
+            'stored': len(recommendations),
+            'date': datetime.now().strftime('%Y-%m-%d')
         }
+        cached_result = cache.get(cache_key)
+        if cached_result:
+            return json_response(cached_result)
+        
+        deadline = Deadline()
+        with admission.slot(max_wait=deadline.remaining() / 2):
+            result, error = run_backtest(recommendations, horizons, deadline)
+            if error:
+                return jsonify({'error': error}), 504 if deadline.expired() else 500
+            cache.set(cache_key, result, expiry_hours=1)
+        return json_response(result)
+        
+    except Overloaded as e:
+        response = jsonify({'error': 'The server is busy with other analyses. Please try again shortly.'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except Exception as e:
+        logger.error(f"Error in backtest: {str(e)}")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/history/<ticker>')
+def analysis_history(ticker):
+    """Recommendation and confidence over time for a ticker, newest first, e.g. ?limit=20&before=<next_before>"""
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), 500)
+            before = int(request.args['before']) if request.args.get('before') else None
+        except ValueError:
+            return jsonify({'error': 'limit and before must be integers'}), 400
+        ticker = ticker.upper().strip()
+        page = history.history(ticker, limit=limit, before=before,
+                               since=request.args.get('since') or None, until=request.args.get('until') or None)
+        # Pages only change when an analysis of this ticker is appended
+        etag = make_etag('history', ticker, page['total'], page['items'][0]['id'] if page['items'] else None,
+                         sorted(request.args.items(multi=True)))
+        return json_response(page, etag=etag)
+    except Exception as e:
+        logger.error(f"Error in history: {str(e)}")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/history/<ticker>/<int:analysis_id>')
+def stored_analysis(ticker, analysis_id):
+    """A stored analysis from the history, rendered like /analyze/<ticker>"""
+    try:
+        profile = request.args.get('profile', DEFAULT_PROFILE).lower()
+        if profile not in PROFILES:
+            return jsonify({'error': f'Invalid profile: {profile}. Use one of: {", ".join(PROFILES)}'}), 400
+        stored = history.get_analysis(ticker.upper().strip(), analysis_id)
+        if not stored:
+            return jsonify({'error': f'No stored analysis {analysis_id} for {ticker.upper()}'}), 404
+        # Stored analyses never change
+        return profile_response(stored['result'], profile, make_etag('history', stored['id'], profile))
+    except Exception as e:
+        logger.error(f"Error in stored_analysis: {str(e)}")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/intraday/<ticker>')
+def intraday_chart(ticker):
+    """Intraday OHLCV bars, e.g. ?range=5d&resolution=5m, sliced from the stored resolution pyramid"""
+    try:
+        ticker = ticker.upper().strip()
+        range_name = request.args.get('range', '1d')
+        if range_name not in RANGES and range_name != 'max':
+            return jsonify({'error': f'Invalid range: {range_name}. Use one of: {", ".join(list(RANGES) + ["max"])}'}), 400
+        sessions, default_resolution = RANGES.get(range_name, (None, '1h'))
+        resolution = request.args.get('resolution', default_resolution)
+        if resolution not in RESOLUTIONS:
+            return jsonify({'error': f'Invalid resolution: {resolution}. Use one of: {", ".join(RESOLUTIONS)}'}), 400
+        
+        # Only the minutes after the last stored bar are fetched, at most once per INTRADAY_REFRESH_SECONDS
+        if intraday.needs_refresh(ticker) and upstream_guard('yfinance').available():
+            deadline = Deadline()
+            ticker_valid = stock_api.validate_ticker(ticker, deadline=deadline)
+            if ticker_valid is None:
+                return market_data_unavailable()
+            if not ticker_valid:
+                return jsonify({'error': f'Invalid ticker symbol: {ticker}'}), 400
+            with admission.slot(max_wait=deadline.remaining() / 2):
+                refresh_intraday(ticker, deadline)
+        
+        version = intraday.version(ticker)
+        if version is None:
+            return jsonify({'error': f'No intraday data available for {ticker}'}), 404
+        etag = make_etag('intraday', ticker, version, range_name, resolution)
+        return json_response(lambda: {**intraday.series(ticker, resolution, sessions), 'range': range_name},
+                             etag=etag, cache_control='private, max-age=30')
+        
+    except Overloaded as e:
+        response = jsonify({'error': 'The server is busy with other analyses. Please try again shortly.'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except Exception as e:
+        logger.error(f"Error in intraday: {str(e)}")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/quotes/stream')
+def quote_stream():
+    """Server-Sent Events stream of live quotes, e.g. ?symbols=AAPL,MSFT"""
+    symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in request.args.get('symbols', '').split(',') if symbol.strip()))
+    if not symbols:
+        return jsonify({'error': 'Please provide symbols, e.g. ?symbols=AAPL,MSFT'}), 400
+    if len(symbols) > QUOTE_MAX_SYMBOLS:
+        return jsonify({'error': f'At most {QUOTE_MAX_SYMBOLS} symbols per stream'}), 400
+    rejected = [symbol for symbol in symbols if len(symbol) > 10 or symbol_index.rejects(symbol)]
+    if rejected:
+        return jsonify({'error': f'Invalid ticker symbol: {", ".join(rejected)}'}), 400
+    try:
+        subscription = quote_hub.subscribe(symbols)
+    except Overloaded as e:
+        response = jsonify({'error': 'Too many live quote streams on this server. Please try again shortly.'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    
+    def events():
+        try:
+            # Browsers reconnect this many milliseconds after the stream ends
+            yield 'retry: 3000\n\n'
+            started = time.monotonic()
+            while time.monotonic() - started < QUOTE_STREAM_MAX_SECONDS:
+                quotes = subscription.drain(QUOTE_HEARTBEAT_SECONDS)
+                if quotes:
+                    yield ''.join(f"event: quote\ndata: {json.dumps(quote)}\n\n" for quote in quotes)
+                else:
+                    yield ': keepalive\n\n'
+        finally:
+            quote_hub.unsubscribe(subscription)
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/watchlists', methods=['POST'])
+def create_watchlist():
+    """Create a watchlist; the returned id is its only credential"""
+    try:
+        payload = request.get_json(silent=True) or {}
+        tickers = []
+        if payload.get('tickers'):
+            tickers, error = validated_tickers(payload['tickers'])
+            if error:
+                return error
+        # Only created once its tickers are known to be valid, so a rejected request leaves nothing behind
+        user = watchlists.create_user()
+        if tickers:
+            watchlists.add_tickers(user, tickers)
+        return jsonify({'id': user, 'tickers': watchlists.tickers(user)}), 201
+    except Exception as e:
+        logger.error(f"Error creating watchlist: {str(e)}")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/watchlists/<user>', methods=['GET'])
+def get_watchlist(user):
+    """Watched tickers with their latest price, change, RSI and P/E, and the alert rules"""
+    if not watchlists.user_exists(user):
+        return jsonify({'error': 'Unknown watchlist'}), 404
+    try:
+        latest = cache.get({'type': 'watchlist_metrics'}) or {}
+        return jsonify({
+            'id': user,
+            'tickers': [{'ticker': ticker, **(latest.get(ticker) or {})} for ticker in watchlists.tickers(user)],
+            'alerts': watchlists.alerts(user)
+        })
+    except Exception as e:
+        logger.error(f"Error reading watchlist: {str(e)}")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/watchlists/<user>/tickers', methods=['POST'])
+def add_watchlist_tickers(user):
+    """Watch more tickers (JSON body {"tickers": [...]})"""
+    if not watchlists.user_exists(user):
+        return jsonify({'error': 'Unknown watchlist'}), 404
+    payload = request.get_json(silent=True) or {}
+    return update_watchlist_tickers(user, payload.get('tickers'))
+
+def validated_tickers(tickers, watched=()):
+    """(normalized tickers, None), or (None, error response) when a ticker not yet watched is invalid.
+    
+    New tickers are validated like /analyze does, so the alert evaluator never
+    polls symbols that do not exist; a 503 is returned when yfinance cannot tell.
+    """
+    if not isinstance(tickers, list) or not tickers:
+        return None, (jsonify({'error': 'tickers must be a non-empty list'}), 400)
+    tickers = list(dict.fromkeys(str(ticker).upper().strip() for ticker in tickers))
+    watched = set(watched)
+    new = [ticker for ticker in tickers if ticker not in watched]
+    if len(watched) + len(new) > WATCHLIST_MAX_TICKERS:
+        return None, (jsonify({'error': f'A watchlist holds at most {WATCHLIST_MAX_TICKERS} tickers'}), 400)
+    rejected = [ticker for ticker in new if not ticker or len(ticker) > 10 or symbol_index.rejects(ticker)]
+    if not rejected:
+        deadline = Deadline()
+        for ticker in new:
+            ticker_valid = stock_api.validate_ticker(ticker, deadline=deadline)
+            if ticker_valid is None:
+                return None, market_data_unavailable()
+            if not ticker_valid:
+                rejected.append(ticker)
+    if rejected:
+        return None, (jsonify({'error': f'Invalid ticker symbol: {", ".join(rejected)}'}), 400)
+    return tickers, None
+
+def update_watchlist_tickers(user, tickers):
+    tickers, error = validated_tickers(tickers, watchlists.tickers(user))
+    if error:
+        return error
+    try:
+        return jsonify({'id': user, 'tickers': watchlists.add_tickers(user, tickers)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/watchlists/<user>/tickers/<ticker>', methods=['DELETE'])
+def remove_watchlist_ticker(user, ticker):
+    """Stop watching a ticker, dropping its alerts"""
+    if not watchlists.user_exists(user):
+        return jsonify({'error': 'Unknown watchlist'}), 404
+    if not watchlists.remove_ticker(user, ticker.upper().strip()):
+        return jsonify({'error': f'{ticker.upper()} is not on this watchlist'}), 404
+    return jsonify({'id': user, 'tickers': watchlists.tickers(user)})
+
+@app.route('/watchlists/<user>/alerts', methods=['POST'])
+def add_watchlist_alert(user):
+    """Add an alert rule, e.g. {"ticker": "AAPL", "metric": "price", "op": "above", "threshold": 200}"""
+    if not watchlists.user_exists(user):
+        return jsonify({'error': 'Unknown watchlist'}), 404
+    payload = request.get_json(silent=True) or {}
+    tickers, error = validated_tickers([payload.get('ticker') or ''], watchlists.tickers(user))
+    if error:
+        return error
+    ticker = tickers[0]
+    try:
+        alert_id = watchlists.add_alert(user, ticker, payload.get('metric'), payload.get('op'), payload.get('threshold'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'id': alert_id, 'alerts': watchlists.alerts(user)}), 201
+
+@app.route('/watchlists/<user>/alerts/<int:alert_id>', methods=['DELETE'])
+def remove_watchlist_alert(user, alert_id):
+    if not watchlists.user_exists(user):
+        return jsonify({'error': 'Unknown watchlist'}), 404
+    if not watchlists.remove_alert(user, alert_id):
+        return jsonify({'error': f'No alert {alert_id} on this watchlist'}), 404
+    return jsonify({'alerts': watchlists.alerts(user)})
+
+@app.route('/watchlists/<user>/notifications')
+def watchlist_notifications(user):
+    """Triggered alerts after a cursor, oldest first: poll with ?since=<next_since> to get only new ones"""
+    if not watchlists.user_exists(user):
+        return jsonify({'error': 'Unknown watchlist'}), 404
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(max(int(request.args.get('limit', NOTIFICATION_PAGE_SIZE)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    return json_response(watchlists.notifications(user, since=since, limit=limit), cache_control='no-store')
+
+def refresh_intraday(ticker, deadline=None):
+    """Fetch the 1-minute bars missing from the ticker's pyramid and rebuild it.
+    
+    Bars newer than the stored ones come first. The retention period of a new
+    ticker is then backfilled newest window first, storing each window as it
+    arrives, so a slow yfinance still leaves the latest bars to serve and the
+    next refresh continues where this one ran out of time.
+    """
+    with intraday.ticker_lock(ticker):
+        if not intraday.needs_refresh(ticker):
+            return True  # Another request just refreshed it
+        retention_start = datetime.now(timezone.utc) - timedelta(days=INTRADAY_RETENTION_DAYS)
+        last = intraday.last_timestamp(ticker)
+        end = None
+        if last is not None:
+            with stage('intraday'):
+                bars = stock_api.get_intraday_bars(ticker, datetime.fromtimestamp(last, timezone.utc),
+                                                   interval=BASE_RESOLUTION, deadline=deadline)
+            if bars is None:
+                return False
+            if len(bars['ts']):
+                intraday.update(ticker, bars)
+            else:
+                intraday.touch(ticker)
+            backfill_before = intraday.backfill_before(ticker)
+            if backfill_before is None:
+                return True
+            end = datetime.fromtimestamp(backfill_before, timezone.utc)
         
-        # Cache the result for 1 hour
-        cache.set(cache_key, result, expiry_hours=1)
+        def store_window(bars, window_start):
+            # The oldest window starts at the retention start; before any other, bars are still missing
+            before = window_start.timestamp() if window_start > retention_start + timedelta(days=1) else 0.0
+            intraday.update(ticker, bars, backfill_before=before)
+        
+        with stage('intraday'):
+            bars = stock_api.get_intraday_bars(ticker, retention_start, end=end, interval=BASE_RESOLUTION,
+                                               deadline=deadline, on_window=store_window)
+        return bars is not None
+
+def analysis_cache_key(ticker):
+    """Cache key for today's full analysis of a ticker"""
+    return {
+        'ticker': ticker,
+        'date': datetime.now().strftime('%Y-%m-%d'),
+        'type': 'full_analysis'
+    }
+
+def market_data_unavailable():
+    """503 for when yfinance's circuit is open or it could not answer in time"""
+    response = jsonify({'error': 'Market data is temporarily unavailable. Please try again shortly.'})
+    response.headers['Retry-After'] = str(int(BREAKER_RESET_SECONDS))
+    return response, 503
+
+def analysis_response(ticker, profile=DEFAULT_PROFILE):
+    """Serve an analysis from cache (with conditional GET support) or compute it"""
+    try:
+        if not ticker:
+            return jsonify({'error': 'Please provide a stock ticker symbol.'}), 400
+        
+        profile = (profile or DEFAULT_PROFILE).lower()
+        if profile not in PROFILES:
+            return jsonify({'error': f'Invalid profile: {profile}. Use one of: {", ".join(PROFILES)}'}), 400
+        
+        cache_key = analysis_cache_key(ticker)
+        deadline = Deadline()  # ANALYSIS_SLO_SECONDS end-to-end budget for this request
+        
+        # Check cache first - a cached entry implies the ticker was already validated
+        with stage('cache_get'):
+            cached_entry = cache.get_entry(cache_key)
+        metrics.record_cache_lookup(bool(cached_entry))
+        if cached_entry:
+            cache.increment_counter('ticker_requests', ticker)
+            logger.info(f"Returning cached analysis for {ticker} ({profile} profile)")
+            return profile_response(cached_entry['value'], profile, entry_etag(cached_entry, profile))
+        
+        # Without market data there is nothing to analyze; fail fast while yfinance's circuit is open
+        if not upstream_guard('yfinance').available():
+            stale = last_analysis_response(ticker, profile, 'market data unavailable')
+            if stale:
+                return stale
+            return market_data_unavailable()
+        
+        # Validate ticker
+        with stage('validation'):
+            ticker_valid = stock_api.validate_ticker(ticker, deadline=deadline)
+        if ticker_valid is None:
+            return last_analysis_response(ticker, profile, 'market data unavailable') or market_data_unavailable()
+        if not ticker_valid:
+            return jsonify({'error': f'Invalid ticker symbol: {ticker}'}), 400
+        cache.increment_counter('ticker_requests', ticker)
+        
+        # Cold analyses are admitted through a bounded queue; waiting there uses up the deadline
+        with admission.slot(max_wait=deadline.remaining() / 2):
+            # Another request may have finished this ticker while we were queued
+            cached_entry = cache.get_entry(cache_key)
+            if cached_entry:
+                return profile_response(cached_entry['value'], profile, entry_etag(cached_entry, profile))
+            
+            result, error = run_analysis(ticker, deadline)
+            if error:
+                stale = last_analysis_response(ticker, profile, error)
+                if stale:
+                    return stale
+                # Company info and price history are required, so running out of time there is a timeout
+                return jsonify({'error': error}), 504 if deadline.expired() else 500
+            
+            # Cache the result for 1 hour (partial results only until a full run can replace them)
+            with stage('cache_set'):
+                cache.set(cache_key, result, expiry_hours=result_expiry_hours(result))
+                cached_entry = cache.get_entry(cache_key)
         
         logger.info(f"Successfully completed analysis for {ticker}")
-        return jsonify(result)
+        return profile_response(result, profile, entry_etag(cached_entry, profile) if cached_entry else None)
         
+    except Overloaded as e:
+        stale = last_analysis_response(ticker, profile, 'server busy')
+        if stale:
+            return stale
+        response = jsonify({'error': 'The server is busy with other analyses. Please try again shortly.'})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
     except Exception as e:
         logger.error(f"Error in analyze_stock: {str(e)}")
+        stale = last_analysis_response(ticker, profile, 'unexpected error')
+        if stale:
+            return stale
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
 
+def last_analysis_response(ticker, profile, reason):
+    """The ticker's last stored analysis, marked stale, or None when there is no recent one.
+    
+    Served instantly from the history index when a fresh analysis cannot be
+    produced (upstreams down, server busy, pipeline errors).
+    """
+    try:
+        stored = history.get_analysis(ticker, max_age_days=HISTORY_FALLBACK_MAX_DAYS)
+        if not stored:
+            return None
+        logger.warning(f"Serving last stored analysis of {ticker} from {stored['generated_at']} ({reason})")
+        result = {**stored['result'], 'stale': {'generated_at': stored['generated_at'], 'reason': reason}}
+        response = profile_response(result, profile, make_etag('history', stored['id'], profile, reason))
+        response.headers['Warning'] = '110 - "Response is Stale"'
+        response.headers['X-Served-From'] = 'history'
+        return response
+    except Exception as e:
+        logger.error(f"Error serving last analysis of {ticker}: {str(e)}")
+        return None
+
+def warm_ticker(ticker):
+    """Recompute and cache the analysis for a ticker (used by the background cache warmer)"""
+    result, error = run_analysis(ticker)
+    if error:
+        logger.warning(f"Cache warmer could not refresh {ticker}: {error}")
+        return False
+    return cache.set(analysis_cache_key(ticker), result, expiry_hours=result_expiry_hours(result))
+
+def result_expiry_hours(result):
+    return DEGRADED_CACHE_MINUTES / 60 if result.get('degraded') else 1
+
+def profile_response(stored_result, profile, etag):
+    """Render a stored analysis for a response profile, reusing encoded bodies per ETag"""
+    # Rendering (and chart building for the full profile) is deferred until the body is encoded
+    return json_response(lambda: render_profile(stored_result, profile, chart_builder=timed_price_chart), etag=etag)
+
+def timed_price_chart(price_data, company_name):
+    with stage('chart'):
+        return create_price_chart(price_data, company_name)
+
+def run_analysis(ticker, deadline=None):
+    """Run the full analysis pipeline for a validated ticker.
+    
+    Returns (result, error_message); exactly one of them is None. The result is
+    in the compact stored form (see utils.response_profiles.compact_result).
+    With a deadline, stages that run out of time are skipped or degraded and
+    named in the result's `degraded` list.
+    """
+    # Get stock data
+    logger.info(f"Fetching stock data for {ticker}")
+    with stage('company_info'):
+        company_data = stock_api.get_company_info(ticker, deadline=deadline)
+    if not company_data:
+        return None, f'Failed to fetch company data for {ticker}'
+    fundamentals.record(company_data)
+    
+    with stage('history'):
+        price_data = stock_api.get_historical_data(ticker, months=6, deadline=deadline)
+    if not price_data:
+        return None, f'Failed to fetch price data for {ticker}'
+    
+    # Note: News and RAG analysis now handled internally by LLM client
+    # The enhanced RAG system will:
+    # 1. Get global affairs news automatically
+    # 2. Generate investment themes from current events  
+    # 3. Search books for relevant investment principles
+    # 4. Use both global context + book wisdom in analysis
+    
+    # The Plotly chart is no longer built here: it is derived from the price series
+    # when a client asks for the full response profile
+    
+    # Get enhanced LLM analysis with global affairs + investment literature
+    logger.info(f"Getting enhanced RAG analysis for {ticker}")
+    try:
+        analysis = get_llm_client().get_stock_analysis(company_data, price_data, [], deadline=deadline)
+    except Exception as e:
+        logger.error(f"LLM analysis failed: {str(e)}")
+        analysis = {
+            'recommendation': 'HOLD',
+            'confidence_score': 0,
+            'rationale': f'LLM analysis unavailable: {str(e)}',
+            'key_factors': [],
+            'risks': [],
+            'price_target': 'N/A',
+            'rag_context': {
+                'sources': [],
+                'reasoning': 'Technical error occurred during analysis.'
+            }
+        }
+    
+    # Prepare result
+    result = {
+        'success': True,
+        'ticker': ticker,
+        'company_data': company_data,
+        'price_series': to_columnar(price_data),  # Single columnar copy of the price history
+        'analysis': analysis,  # Global affairs news lives in analysis.rag_context.global_news
+        'generated_at': datetime.now().isoformat(),
+        'degraded': analysis.pop('degraded', [])
+    }
+    if result['degraded']:
+        logger.warning(f"Partial analysis for {ticker}, degraded stages: {', '.join(result['degraded'])}")
+    history.record_analysis(result)
+    return result, None
+
+def run_portfolio_analysis(holdings, months, deadline=None):
+    """Price matrix, risk metrics and consolidated LLM analysis for [(ticker, weight)] holdings.
+    
+    Returns (result, error_message) like run_analysis.
+    """
+    tickers = [ticker for ticker, _ in holdings]
+    logger.info(f"Fetching {months} months of prices for {len(tickers)} portfolio holdings")
+    with stage('history'):
+        prices = stock_api.get_price_matrix(tickers, months=months, deadline=deadline)
+    if not prices or not prices['tickers']:
+        return None, 'Failed to fetch price data for the portfolio'
+    
+    weights = dict(holdings)
+    try:
+        risk = portfolio_risk(prices['dates'], prices['closes'], prices['tickers'],
+                              [weights[ticker] for ticker in prices['tickers']])
+    except ValueError as e:
+        return None, str(e)
+    
+    # Names and sectors: today's cached analyses first, then company info for the largest remaining holdings
+    company_data = {}
+    for holding in risk['holdings']:
+        cached = cache.get(analysis_cache_key(holding['ticker']))
+        if cached:
+            company_data[holding['ticker']] = cached['company_data']
+    largest = sorted(risk['holdings'], key=lambda holding: -holding['weight_pct'])[:PORTFOLIO_INFO_HOLDINGS]
+    with stage('company_info'):
+        company_data.update(stock_api.get_company_infos(
+            [holding['ticker'] for holding in largest if holding['ticker'] not in company_data], deadline=deadline))
+    for holding in risk['holdings']:
+        info = company_data.get(holding['ticker']) or symbol_index.lookup(holding['ticker']) or {}
+        holding['name'] = info.get('name')
+        holding['sector'] = info.get('sector')
+    sectors = sector_weights(risk['holdings'])
+    
+    analysis = get_llm_client().get_portfolio_analysis(risk, sectors, deadline=deadline)
+    
+    result = {
+        'success': True,
+        'holdings': risk.pop('holdings'),
+        'missing': prices['missing'],  # Holdings without enough price history, left out of the metrics
+        'sectors': sectors,
+        'risk': risk,
+        'analysis': analysis,
+        'generated_at': datetime.now().isoformat(),
+        'degraded': analysis.pop('degraded', [])
+    }
+    if result['degraded']:
+        logger.warning(f"Partial portfolio analysis, degraded stages: {', '.join(result['degraded'])}")
+    return result, None
+
+def run_backtest(recommendations, horizons, deadline=None):
+    """Fetch prices covering the recommendations plus the longest horizon and score them"""
+    tickers = sorted({r['ticker'] for r in recommendations})
+    if BACKTEST_BENCHMARK and BACKTEST_BENCHMARK not in tickers:
+        tickers.append(BACKTEST_BENCHMARK)
+    first = datetime.strptime(recommendations[0]['date'], '%Y-%m-%d')
+    months = (datetime.now() - first).days // 30 + 2
+    
+    with stage('history'):
+        prices = stock_api.get_price_matrix(tickers, months=months, deadline=deadline)
+    if not prices or not prices['tickers']:
+        return None, 'Failed to fetch price data for the backtest'
+    
+    result = backtest(recommendations, prices['dates'], prices['closes'], prices['tickers'],
+                      benchmark=BACKTEST_BENCHMARK or None, horizons=horizons)
+    result['generated_at'] = datetime.now().isoformat()
+    return result, None
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+def get_llm_client():
+    """One LLM client per worker; it keeps no per-request state, so threads share it"""
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = LLMClient(cache=cache, news_api=news_api, news_ranker=news_ranker)
+    return _llm_client
+
 def create_price_chart(price_data, company_name):
     """Create a Plotly chart for stock prices"""
     try:
@@ -183,8 +865,8 @@ def create_price_chart(price_data, company_name):
             hovermode='x unified'
         )
         
-        # Convert to JSON for frontend
-        graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        # Convert to JSON for frontend (plotly uses orjson when it is installed)
+        graphJSON = fig.to_json()
         logger.info("Chart JSON created successfully")
         return graphJSON
         
@@ -219,6 +901,17 @@ def health_check():
             'status': 'healthy',
             'services': services_status,
             'cache_stats': cache_stats,
+            'llm_cache': llm_cache_stats,
+            'cache_warmer': cache_warmer.status(),
+            'upstreams': upstream_status(),
+            'symbol_index': symbol_index.status(),
+            'admission': admission.status(),
+            'history': history.status(),
+            'intraday': intraday.status(),
+            'quotes': quote_hub.status(),
+            'watchlists': {**watchlists.status(), 'evaluator': alert_evaluator.status()},
+            'fundamentals': {**fundamentals.status(), 'snapshotter': fundamentals_snapshotter.status()},
+            'news': {**news_store.status(), 'ingester': news_ingester.status(), 'ranker': news_ranker.status()},
             'timestamp': datetime.now().isoformat()
         })
         
@@ -226,6 +919,36 @@ def health_check():
         logger.error(f"Health check failed: {str(e)}")
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics (stage histograms, cache hit/miss, upstream errors, in-flight requests)"""
+    return metrics.metrics_response()
+
+@app.route('/admin/profiles')
+def list_profiles():
+    """List stored request profiles (requires X-Admin-Token)"""
+    if not profiler.is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({'profiles': profiler.list_profiles()})
+
+@app.route('/admin/profiles/<profile_id>')
+def download_profile(profile_id):
+    """Download a profile as pstats, collapsed stacks (flame graphs) or a text summary"""
+    if not profiler.is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    fmt = request.args.get('format', 'pstats')
+    if fmt not in ('pstats', 'collapsed', 'text'):
+        return jsonify({'error': 'format must be pstats, collapsed or text'}), 400
+    
+    path = profiler.profile_path(profile_id, fmt)
+    if not path:
+        return jsonify({'error': f'No {fmt} profile {profile_id}'}), 404
+    
+    if fmt == 'text':
+        return profiler.pstats_text(path), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+
 @app.route('/clear-cache', methods=['POST'])
 def clear_cache():
     """Clear expired cache entries"""
@@ -244,6 +967,96 @@ def favicon():
     """Serve favicon to prevent 404 errors"""
     return '', 204  # No Content response
 
+# Background warmer for the tickers everyone opens; one leader across gunicorn workers
+warmer_tickers = [t.strip().upper() for t in os.getenv('WARMER_TICKERS', '').split(',') if t.strip()]
+cache_warmer = CacheWarmer(
+    warm_fn=warm_ticker,
+    base_tickers=warmer_tickers or [ticker for ticker, _ in POPULAR_TICKERS],
+    top_tickers_fn=lambda limit: cache.top_counters('ticker_requests', limit=limit),
+    lock_path=os.path.join(cache.cache_dir, 'warmer.lock')
+)
+
+def fundamentals_universe():
+    """Tickers in the daily fundamentals snapshot: FUNDAMENTALS_UNIVERSE=popular, directory or a comma-separated list"""
+    universe = os.getenv('FUNDAMENTALS_UNIVERSE', 'popular').strip()
+    if universe.lower() == 'popular':
+        # Watched tickers too, so P/E alerts have a stored ratio to rescale
+        return list(dict.fromkeys(cache_warmer.tickers() + watchlists.watched_tickers()))
+    if universe.lower() == 'directory':
+        # Every listed common stock; ETFs have no P/E or analyst targets worth screening
+        return symbol_index.listed('Equity')
+    return [ticker.strip().upper() for ticker in universe.split(',') if ticker.strip()]
+
+fundamentals_snapshotter = FundamentalsSnapshotter(
+    fundamentals,
+    fetch_fn=stock_api.get_company_info,
+    tickers_fn=fundamentals_universe,
+    lock_path=os.path.join(cache.cache_dir, 'fundamentals.lock')
+)
+
+def ingest_news():
+    """Fetch new articles, then embed them for per-ticker ranking (run by the news ingester)"""
+    added = news_api.ingest()
+    news_ranker.embed_pending()
+    return added
+
+news_ingester = NewsIngester(
+    ingest_news,
+    news_store,
+    lock_path=os.path.join(cache.cache_dir, 'news.lock')
+)
+
+alert_evaluator = AlertEvaluator(
+    watchlists,
+    prices_fn=stock_api.get_price_matrix,
+    fundamentals=fundamentals,
+    cache=cache,
+    lock_path=os.path.join(cache.cache_dir, 'alerts.lock')
+)
+
+_background_jobs_pid = None
+
+def start_background_jobs():
+    """Start the cache warmer, symbol refresher, fundamentals snapshotter, news ingester and alert evaluator in this process (idempotent).
+    
+    Threads don't survive fork, so with `gunicorn --preload` these must start in
+    each worker after forking (gunicorn.conf.py's post_worker_init), never at
+    import time in the master.
+    """
+    global _background_jobs_pid
+    if _background_jobs_pid == os.getpid():
+        return
+    _background_jobs_pid = os.getpid()
+    
+    if os.getenv('CACHE_WARMER_ENABLED', 'false').lower() == 'true':
+        cache_warmer.start()
+    if os.getenv('SYMBOL_REFRESH_ENABLED', 'true').lower() == 'true':
+        symbol_index.start_refresher()
+    if os.getenv('FUNDAMENTALS_SNAPSHOT_ENABLED', 'true').lower() == 'true':
+        fundamentals_snapshotter.start()
+    if os.getenv('NEWS_INGEST_ENABLED', 'true').lower() == 'true':
+        news_ingester.start()
+    if os.getenv('ALERTS_ENABLED', 'true').lower() == 'true':
+        alert_evaluator.start()
+
+def flush_buffers():
+    """Write out what this process still buffers (fundamentals rows); gunicorn.conf.py's worker_exit calls it"""
+    fundamentals.flush()
+
+# Fallback for servers without the gunicorn hook; a second flush finds nothing to write
+atexit.register(flush_buffers)
+
+@app.before_request
+def _ensure_background_jobs():
+    # Fallback for servers without the gunicorn hook (flask run, other WSGI servers)
+    if _background_jobs_pid != os.getpid():
+        start_background_jobs()
+
+def preload_heavy_modules():
+    """Import the lazily loaded libraries now, so forked workers share them copy-on-write"""
+    from utils import stock_api as stock_api_module, news_api as news_api_module, llm_client_lambda_api
+    preload(go, stock_api_module.yf, news_api_module.requests, llm_client_lambda_api.anthropic)
+
 if __name__ == '__main__':
     # Check for required environment variables
     required_env_vars = ['ANTHROPIC_API_KEY', 'NEWS_API_KEY']
@@ -258,4 +1071,5 @@ if __name__ == '__main__':
     host = os.getenv('FLASK_RUN_HOST', '0.0.0.0')
     debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     
+    start_background_jobs()
     app.run(debug=debug, host=host, port=port) 
\ No newline at end of file
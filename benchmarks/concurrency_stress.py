@@ -0,0 +1,287 @@
+"""Concurrency stress checks for the service layer.
+
+Hammers the shared pieces of utils/ from many threads (and, where state is
+shared through files, from several processes) and checks invariants that a
+race would break: no torn cache reads, exact counter totals, rate limits and
+admission caps that hold under contention, and no 500s from the app when
+cold and warm analyses run concurrently against the local upstream stand-ins.
+
+    python benchmarks/concurrency_stress.py
+    python benchmarks/concurrency_stress.py --threads 64 --processes 4
+    python benchmarks/concurrency_stress.py --gevent     # cooperative workers (needs gevent)
+
+Exits non-zero if any check fails.
+"""
+import sys
+
+if '--gevent' in sys.argv:
+    from gevent import monkey
+    monkey.patch_all()
+
+import argparse  # noqa: E402
+import hashlib  # noqa: E402
+import json  # noqa: E402
+import multiprocessing  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import tempfile  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+import traceback  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import upstream_stubs  # noqa: E402
+
+
+def run_threads(threads, fn, *args):
+    """Run fn(worker_index, *args) on `threads` threads; return the exceptions raised"""
+    errors = []
+
+    def call(i):
+        try:
+            fn(i, *args)
+        except Exception:
+            errors.append(traceback.format_exc())
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, range(threads)))
+    return errors
+
+
+def run_processes(processes, target, *args):
+    """Run target(*args) in `processes` forked processes; return their exit codes"""
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=target, args=args) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [worker.exitcode for worker in workers]
+
+
+def _payload(writer, iteration):
+    data = f'{writer}-{iteration}-' + 'x' * random.randint(10, 20000)
+    return {'data': data, 'check': hashlib.sha1(data.encode()).hexdigest()}
+
+
+def cache_worker(cache_dir, threads, iterations):
+    from utils.cache import SimpleCache
+    cache = SimpleCache(cache_dir)
+    torn = []
+
+    def hammer(i):
+        for n in range(iterations):
+            key = {'key': n % 8}
+            if random.random() < 0.5:
+                cache.set(key, _payload(i, n), expiry_hours=1)
+            else:
+                value = cache.get(key)
+                if value is not None and hashlib.sha1(value['data'].encode()).hexdigest() != value['check']:
+                    torn.append(key)
+            cache.increment_counter('stress', 'hits')
+
+    errors = run_threads(threads, hammer)
+    if errors or torn:
+        print(f'cache worker {os.getpid()}: {len(errors)} errors, {len(torn)} torn reads', file=sys.stderr)
+        sys.exit(1)
+
+
+def check_cache(args, work_dir):
+    """Concurrent set/get never returns a torn entry and shared counters are exact"""
+    cache_dir = os.path.join(work_dir, 'cache')
+    exit_codes = run_processes(args.processes, cache_worker, cache_dir, args.threads, args.iterations)
+    from utils.cache import SimpleCache
+    total = dict(SimpleCache(cache_dir).top_counters('stress')).get('hits', 0)
+    expected = args.processes * args.threads * args.iterations
+    ok = all(code == 0 for code in exit_codes) and total == expected
+    return ok, f'exit codes {exit_codes}, counter {total}/{expected}'
+
+
+def guard_worker(state_dir, threads, duration, allowed_file):
+    from utils.circuit_breaker import UpstreamGuard
+    guard = UpstreamGuard('stress', state_dir=state_dir, rate=50, burst=10)
+    allowed = []
+
+    def hammer(i):
+        ends = time.monotonic() + duration
+        while time.monotonic() < ends:
+            if guard.allow(max_wait=0):
+                allowed.append(1)
+                guard.record_success()
+
+    errors = run_threads(threads, hammer)
+    with open(allowed_file, 'a') as f:
+        f.write(f'{len(allowed)}\n')
+    sys.exit(1 if errors else 0)
+
+
+def check_rate_limiter(args, work_dir):
+    """The shared token bucket never hands out more than burst + rate x time across processes"""
+    state_dir = os.path.join(work_dir, 'upstreams')
+    allowed_file = os.path.join(work_dir, 'allowed.txt')
+    duration = 2.0
+    started = time.monotonic()
+    exit_codes = run_processes(args.processes, guard_worker, state_dir, min(args.threads, 16), duration, allowed_file)
+    elapsed = time.monotonic() - started
+    with open(allowed_file) as f:
+        allowed = sum(int(line) for line in f if line.strip())
+    limit = 10 + 50 * elapsed
+    ok = all(code == 0 for code in exit_codes) and allowed <= limit
+    return ok, f'{allowed} calls allowed, limit {limit:.0f}'
+
+
+def check_admission(args, work_dir):
+    """Admission slots never admit more than max_concurrent and shed the overflow"""
+    from utils.admission import AdmissionController, Overloaded
+    controller = AdmissionController(os.path.join(work_dir, 'admission'), max_concurrent=3, max_queue=5, queue_timeout=0.5)
+    state = {'active': 0, 'peak': 0, 'shed': 0, 'done': 0}
+    lock = threading.Lock()
+
+    def hammer(i):
+        try:
+            with controller.slot():
+                with lock:
+                    state['active'] += 1
+                    state['peak'] = max(state['peak'], state['active'])
+                time.sleep(0.02)
+                with lock:
+                    state['active'] -= 1
+                    state['done'] += 1
+        except Overloaded:
+            with lock:
+                state['shed'] += 1
+
+    errors = run_threads(args.threads, hammer)
+    ok = not errors and state['peak'] <= 3 and state['done'] + state['shed'] == args.threads
+    return ok, f"peak {state['peak']}/3, {state['done']} admitted, {state['shed']} shed"
+
+
+def check_symbol_index(args, work_dir):
+    """Searches stay consistent while another thread reloads the directory"""
+    from utils.symbol_index import SymbolIndex
+    path = os.path.join(work_dir, 'symbols.tsv')
+    rows = [(f'S{i:05d}', f'Stress Company {i}', 'NYSE', 'Equity') for i in range(5000)]
+    index = SymbolIndex(path, seed=[('AAPL', 'Apple Inc.')])
+    stop = threading.Event()
+    bad = []
+
+    def reloader():
+        while not stop.is_set():
+            index._build(index.seed + random.sample(rows, 2500))
+
+    def hammer(i):
+        for n in range(args.iterations):
+            for match in index.search(f'S{n % 50:02d}', limit=5):
+                if not match['symbol'].startswith(f'S{n % 50:02d}'):
+                    bad.append(match)
+            if not index.is_known('AAPL'):
+                bad.append('AAPL')
+
+    thread = threading.Thread(target=reloader, daemon=True)
+    thread.start()
+    errors = run_threads(args.threads, hammer)
+    stop.set()
+    thread.join()
+    return not errors and not bad, f'{len(errors)} errors, {len(bad)} inconsistent results'
+
+
+def check_encoded_bodies(args, work_dir):
+    """The per-ETag encoded body LRU survives concurrent inserts, hits and evictions"""
+    from utils import responses
+    responses.ENCODED_BODY_CACHE_SIZE = 8
+    wrong = []
+
+    def hammer(i):
+        for n in range(args.iterations):
+            etag = f'etag-{n % 20}'
+            payload = {'etag': etag, 'padding': 'y' * 2000}
+            body, encoding = responses._encoded_body(payload, etag, 'gzip' if n % 2 else None)
+            if encoding is None and json.loads(body)['etag'] != etag:
+                wrong.append(etag)
+
+    errors = run_threads(args.threads, hammer)
+    return not errors and not wrong, f'{len(errors)} errors, {len(wrong)} wrong bodies'
+
+
+def check_llm_stats(args, work_dir):
+    """Fingerprint cache statistics are exact under concurrent updates"""
+    from utils import llm_client_lambda_api as llm
+    before = llm.llm_cache_stats['hits']
+
+    def hammer(i):
+        for _ in range(args.iterations):
+            llm._count(hits=1)
+
+    errors = run_threads(args.threads, hammer)
+    counted = llm.llm_cache_stats['hits'] - before
+    return not errors and counted == args.threads * args.iterations, f'{counted}/{args.threads * args.iterations} hits'
+
+
+def check_app(args, work_dir):
+    """Concurrent cold and warm analyses through the Flask app never return a 500"""
+    os.environ.update({'ADMISSION_MAX_CONCURRENT': '8', 'ADMISSION_MAX_QUEUE': '64'})
+    from run_benchmarks import load_app
+    app_module = load_app(work_dir)
+    statuses = {}
+    lock = threading.Lock()
+
+    def hammer(i):
+        client = app_module.app.test_client()
+        for n in range(max(1, args.iterations // 20)):
+            ticker = f'STRESS{(i * 7 + n) % 12}'
+            response = client.get(f'/analyze/{ticker}?profile={random.choice(["full", "slim", "minimal"])}')
+            if response.status_code == 200:
+                response.get_json()
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    errors = run_threads(args.threads, hammer)
+    ok = not errors and set(statuses) <= {200, 429}
+    return ok, f'statuses {statuses}'
+
+
+CHECKS = [
+    ('cache', check_cache),
+    ('rate_limiter', check_rate_limiter),
+    ('admission', check_admission),
+    ('symbol_index', check_symbol_index),
+    ('encoded_bodies', check_encoded_bodies),
+    ('llm_stats', check_llm_stats),
+    ('app', check_app)
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--processes', type=int, default=2, help='Processes for the file-shared state checks')
+    parser.add_argument('--iterations', type=int, default=200, help='Operations per thread')
+    parser.add_argument('--only', help='Comma-separated subset of checks')
+    parser.add_argument('--gevent', action='store_true', help='Monkey-patch with gevent before running')
+    args = parser.parse_args()
+
+    upstream_stubs.install({name: (5, 2) for name in upstream_stubs.DEFAULT_LATENCY_MS})
+    work_dir = tempfile.mkdtemp(prefix='stockwellness-stress-')
+    selected = set(args.only.split(',')) if args.only else None
+
+    failed = 0
+    for name, check in CHECKS:
+        if selected and name not in selected:
+            continue
+        started = time.perf_counter()
+        try:
+            ok, detail = check(args, work_dir)
+        except Exception:
+            ok, detail = False, traceback.format_exc()
+        failed += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<16} {time.perf_counter() - started:6.2f}s  {detail}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
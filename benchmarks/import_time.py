@@ -0,0 +1,88 @@
+"""Startup cost of the app: import time, memory and which heavy modules load.
+
+Each run imports the app in a fresh interpreter (`python -X importtime`) and
+reports wall time, peak RSS, the slowest imports and whether the heavy
+libraries (yfinance/pandas, anthropic, plotly, boto3) were loaded. With
+--preload the heavy modules are loaded afterwards too, the way the gunicorn
+master does before forking workers.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 5 --top 15 --preload
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['yfinance', 'pandas', 'numpy', 'anthropic', 'httpx', 'plotly', 'requests', 'boto3']
+
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import app
+imported = time.perf_counter() - started
+if {preload!r}:
+    app.preload_heavy_modules()
+print(json.dumps({{
+    'import_seconds': imported,
+    'total_seconds': time.perf_counter() - started,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'loaded': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+
+def run_once(preload):
+    env = dict(os.environ, CACHE_WARMER_ENABLED='false', SYMBOL_REFRESH_ENABLED='false')
+    code = PROBE.format(root=ROOT, preload=preload, heavy=HEAVY_MODULES)
+    with tempfile.TemporaryDirectory(prefix='stockwellness-import-') as work_dir:
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                cwd=work_dir, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(importtime_log, top):
+    """(cumulative microseconds, module) of the slowest imports made by the app module itself"""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented two spaces per level; app's own imports are one level down
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1 and name.strip() != 'app':
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    parser.add_argument('--preload', action='store_true', help='Also load the heavy modules, as the gunicorn master does')
+    args = parser.parse_args()
+
+    results, log = [], ''
+    for _ in range(args.runs):
+        result, log = run_once(args.preload)
+        results.append(result)
+
+    print(f"import app       median {statistics.median(r['import_seconds'] for r in results):.3f}s "
+          f"over {args.runs} runs")
+    if args.preload:
+        print(f"+ preload        median {statistics.median(r['total_seconds'] for r in results):.3f}s")
+    print(f"peak RSS         {max(r['max_rss_mb'] for r in results):.0f} MB")
+    print(f"heavy modules    {', '.join(results[-1]['loaded']) or 'none'}")
+    print('slowest imports (cumulative):')
+    for micros, name in slowest_imports(log, args.top):
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
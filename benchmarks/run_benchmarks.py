@@ -0,0 +1,314 @@
+"""Offline benchmark suite for the StockWellness app.
+
+Drives the Flask app in-process at several concurrency levels with every
+upstream replaced by a local stand-in (see upstream_stubs.py), reports
+p50/p95/p99 latency and throughput per endpoint and per pipeline stage, and
+micro-benchmarks SimpleCache, create_price_chart, get_historical_data
+formatting, the portfolio risk metrics and the recommendation backtest. Results are written to benchmarks/results/ and can be compared
+against an earlier run:
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --concurrency 1,8 --requests 64 \\
+        --latency anthropic=50,lambda=20 --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import upstream_stubs  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+stage_samples = defaultdict(list)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(samples_ms, wall_seconds=None):
+    summary = {
+        'count': len(samples_ms),
+        'mean_ms': round(statistics.fmean(samples_ms), 3) if samples_ms else 0.0,
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3)
+    }
+    if wall_seconds:
+        summary['throughput_rps'] = round(len(samples_ms) / wall_seconds, 2)
+    return summary
+
+
+def timed_stage(name, fn):
+    """Wrap a callable so each call records its duration under a stage name"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stage_samples[name].append((time.perf_counter() - started) * 1000)
+    return wrapper
+
+
+def instrument(app_module):
+    """Attach stage timers to the pipeline without changing its behaviour"""
+    from utils.stock_api import StockAPI
+    from utils.news_api import NewsAPI
+    from utils.news_summarizer import NewsSummarizer
+    from utils.llm_client_lambda_api import LambdaAPILLMClient
+    from utils.cache import SimpleCache
+
+    methods = [
+        (StockAPI, 'validate_ticker', 'validation'),
+        (StockAPI, 'get_company_info', 'company_info'),
+        (StockAPI, 'get_historical_data', 'history'),
+        (NewsAPI, 'get_global_affairs_news', 'news'),
+        (NewsSummarizer, 'summarize_market_impact', 'summarizer'),
+        (LambdaAPILLMClient, 'search_investment_books', 'rag'),
+        (LambdaAPILLMClient, '_run_claude_analysis', 'llm'),
+        (SimpleCache, 'get_entry', 'cache_get'),
+        (SimpleCache, 'set', 'cache_set')
+    ]
+    for cls, method, stage in methods:
+        setattr(cls, method, timed_stage(stage, getattr(cls, method)))
+    app_module.create_price_chart = timed_stage('chart', app_module.create_price_chart)
+
+
+def load_app(cache_dir):
+    os.environ['CACHE_WARMER_ENABLED'] = 'false'
+    os.environ['SYMBOL_REFRESH_ENABLED'] = 'false'
+    os.environ['FUNDAMENTALS_SNAPSHOT_ENABLED'] = 'false'
+    os.environ['NEWS_INGEST_ENABLED'] = 'false'
+    os.environ['ALERTS_ENABLED'] = 'false'
+    cwd = os.getcwd()
+    os.chdir(cache_dir)
+    try:
+        import app as app_module
+    finally:
+        os.chdir(cwd)
+    from utils.cache import SimpleCache
+    app_module.cache = SimpleCache(os.path.join(cache_dir, 'cache'))
+    return app_module
+
+
+def drive(app_module, requests_list, concurrency):
+    """Issue (method, path, kwargs) requests with `concurrency` threads; return latencies"""
+    latencies = []
+    statuses = defaultdict(int)
+    local = threading.local()
+
+    def issue(spec):
+        method, path, kwargs = spec
+        if not hasattr(local, 'client'):
+            local.client = app_module.app.test_client()
+        started = time.perf_counter()
+        response = local.client.open(path, method=method, **kwargs)
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(issue, requests_list))
+    return latencies, time.perf_counter() - started, dict(statuses)
+
+
+def run_endpoint_benchmarks(app_module, concurrency_levels, request_count, profile):
+    results = {}
+    for concurrency in concurrency_levels:
+        run_id = f'C{concurrency}X{int(time.time() * 1000) % 100000}'
+        tickers = [f'{run_id}{i:04d}' for i in range(request_count)]
+        scenarios = [
+            ('cold_analyze', [('GET', f'/analyze/{t}?profile={profile}', {}) for t in tickers]),
+            ('warm_analyze', [('GET', f'/analyze/{t}?profile={profile}', {}) for t in tickers]),
+            ('full_profile', [('GET', f'/analyze/{t}?profile=full', {}) for t in tickers]),
+            ('health', [('GET', '/health', {}) for _ in tickers])
+        ]
+
+        for name, requests_list in scenarios:
+            stage_samples.clear()
+            latencies, wall, statuses = drive(app_module, requests_list, concurrency)
+            results[f'{name}@c{concurrency}'] = {
+                'endpoint': summarize(latencies, wall),
+                'statuses': statuses,
+                'stages': {stage: summarize(samples) for stage, samples in sorted(stage_samples.items())}
+            }
+            if name == 'warm_analyze':
+                # Revalidate every ticker with the ETag it was just served with
+                client = app_module.app.test_client()
+                conditional = [('GET', f'/analyze/{t}?profile={profile}',
+                                {'headers': {'If-None-Match': client.get(f'/analyze/{t}?profile={profile}').headers.get('ETag', '*')}})
+                               for t in tickers]
+                latencies, wall, statuses = drive(app_module, conditional, concurrency)
+                results[f'conditional_get@c{concurrency}'] = {
+                    'endpoint': summarize(latencies, wall),
+                    'statuses': statuses,
+                    'stages': {}
+                }
+    return results
+
+
+def time_calls(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def run_micro_benchmarks(app_module, cache_dir, iterations):
+    from utils.cache import SimpleCache
+    from utils.stock_api import StockAPI
+    from utils.portfolio import portfolio_risk
+    from utils.backtest import backtest
+    from utils.news_store import NewsStore
+    from utils.news_ranker import NewsRanker, ArticleEmbedder
+    from utils.intraday_store import IntradayStore
+    from utils.watchlists import compute_metrics, evaluate
+
+    saved_latency = dict(upstream_stubs.latency_ms)
+    upstream_stubs.latency_ms.update({name: (0, 0) for name in saved_latency})
+    try:
+        stock_api = StockAPI()
+        price_data = stock_api.get_historical_data('MICRO', months=6)
+        cache = SimpleCache(os.path.join(cache_dir, 'micro-cache'))
+        payload = {'price_data': price_data, 'summary': 'x' * 4000}
+        cache.set('micro', payload)
+        tickers = [f'MICRO{i:03d}' for i in range(100)]
+        prices = stock_api.get_price_matrix(tickers, months=12)
+        # One recommendation per ticker and trading day: ~25,000 ticker-days
+        recommendations = [{'ticker': ticker, 'date': date, 'recommendation': ('BUY', 'HOLD', 'SELL')[(i + j) % 3],
+                            'confidence': float((i * 7 + j) % 100), 'price_target': 100.0, 'reference_price': None}
+                           for j, date in enumerate(prices['dates']) for i, ticker in enumerate(prices['tickers'])]
+        # A week of ingested news: 2,000 embedded articles (768 dimensions, like all-mpnet-base-v2)
+        news_store = NewsStore(os.path.join(cache_dir, 'micro-news.sqlite3'))
+        news_store.add([{'title': article['title'], 'description': article['description'], 'url': article['url'],
+                         'published_at': article['publishedAt']} for article in upstream_stubs._news_payload(2000)['articles']])
+        news_ranker = NewsRanker(news_store, ArticleEmbedder('https://micro.lambda-url.local/', backend='lambda'))
+        news_ranker.embed_pending()
+        company = {'symbol': 'MICRO', 'name': 'Micro Energy Corp', 'sector': 'Energy', 'industry': 'Oil & Gas E&P'}
+        news_ranker.rank(company)
+        # 30 days of 1-minute bars (~8,000) and their pyramid
+        intraday = IntradayStore(os.path.join(cache_dir, 'micro-intraday'))
+        intraday.update('MICRO', stock_api.get_intraday_bars('MICRO', datetime.now(timezone.utc) - timedelta(days=30)))
+        # 100,000 alert rules over the 100 tickers' latest metrics
+        rng = np.random.default_rng(0)
+        alert_values = compute_metrics(prices['closes'], np.full(len(prices['tickers']), 20.0), prices['closes'][-1])
+        alert_rules = (rng.integers(0, len(prices['tickers']), 100_000), rng.integers(0, 4, 100_000).astype(np.int8),
+                       rng.integers(0, 2, 100_000).astype(np.int8), rng.uniform(0, 200, 100_000),
+                       np.ones(100_000, dtype=bool))
+
+        return {
+            'simplecache_set': time_calls(lambda: cache.set('micro', payload), iterations),
+            'simplecache_get': time_calls(lambda: cache.get('micro'), iterations),
+            'create_price_chart': time_calls(lambda: app_module.create_price_chart(price_data, 'Micro Corp'), iterations),
+            'get_historical_data_format': time_calls(lambda: stock_api.get_historical_data('MICRO', months=6), iterations),
+            'portfolio_risk_100': time_calls(lambda: portfolio_risk(prices['dates'], prices['closes'], prices['tickers'],
+                                                                    [1.0] * len(prices['tickers'])), iterations),
+            'backtest_25k_ticker_days': time_calls(lambda: backtest(recommendations, prices['dates'], prices['closes'],
+                                                                    prices['tickers']), max(1, iterations // 10)),
+            'news_rank_2000_articles': time_calls(lambda: news_ranker.rank(company), iterations),
+            'intraday_series_5d_5m': time_calls(lambda: intraday.series('MICRO', '5m', 5), iterations),
+            'intraday_series_1mo_1h': time_calls(lambda: intraday.series('MICRO', '1h', 21), iterations),
+            'alerts_evaluate_100k_rules': time_calls(lambda: evaluate(alert_values, *alert_rules), iterations)
+        }
+    finally:
+        upstream_stubs.latency_ms.update(saved_latency)
+
+
+def print_table(title, rows):
+    print(f'\n{title}')
+    print(f"{'name':<40}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}")
+    for name, summary in rows:
+        print(f"{name:<40}{summary['count']:>7}{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}"
+              f"{summary['p99_ms']:>10.2f}{summary.get('throughput_rps', 0):>10.2f}")
+
+
+def compare(current, baseline_path):
+    """Print p50/p95 deltas against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f'\nComparison with {baseline_path} (positive = slower)')
+    for section in ('endpoints', 'micro'):
+        for name, entry in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            now_summary = entry['endpoint'] if section == 'endpoints' else entry
+            old_summary = before['endpoint'] if section == 'endpoints' else before
+            for key in ('p50_ms', 'p95_ms'):
+                if old_summary.get(key):
+                    delta = (now_summary[key] - old_summary[key]) / old_summary[key] * 100
+                    print(f'{section}/{name:<36} {key}: {old_summary[key]:>9.2f} -> {now_summary[key]:>9.2f} ({delta:+.1f}%)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=32, help='Requests per scenario and level')
+    parser.add_argument('--profile', default='slim', help='Response profile for /analyze scenarios')
+    parser.add_argument('--latency', default='', help="Upstream latency overrides, e.g. 'anthropic=50:10,lambda=20'")
+    parser.add_argument('--micro-iterations', type=int, default=200)
+    parser.add_argument('--skip-endpoints', action='store_true')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    upstream_stubs.install(upstream_stubs.parse_latency(args.latency))
+    work_dir = tempfile.mkdtemp(prefix='stockwellness-bench-')
+    app_module = load_app(work_dir)
+    instrument(app_module)
+
+    results = {
+        'generated_at': datetime.now().isoformat(),
+        'config': {
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'profile': args.profile,
+            'latency_ms': upstream_stubs.latency_ms
+        },
+        'endpoints': {},
+        'micro': run_micro_benchmarks(app_module, work_dir, args.micro_iterations)
+    }
+
+    if not args.skip_endpoints:
+        levels = [int(level) for level in args.concurrency.split(',') if level]
+        results['endpoints'] = run_endpoint_benchmarks(app_module, levels, args.requests, args.profile)
+        for name, entry in results['endpoints'].items():
+            print_table(f'{name}  statuses={entry["statuses"]}',
+                        [('endpoint', entry['endpoint'])] + [(f'  stage:{s}', v) for s, v in entry['stages'].items()])
+
+    print_table('Micro-benchmarks', list(results['micro'].items()))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'\nResults written to {output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
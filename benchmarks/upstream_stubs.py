@@ -0,0 +1,305 @@
+"""Local stand-ins for every upstream the analysis pipeline talks to.
+
+yfinance, newsapi.org, the RAG Lambda URL and the Anthropic client are replaced
+by synthetic, deterministic fakes with configurable injected latency, so the
+app can be benchmarked without network access, quota or tokens.
+"""
+import hashlib
+import json
+import random
+import re
+import time
+import types
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Injected latency per upstream in milliseconds (mean, jitter)
+DEFAULT_LATENCY_MS = {
+    'yfinance': (40, 10),
+    'newsapi': (60, 15),
+    'lambda': (120, 30),
+    'anthropic': (400, 100)
+}
+
+latency_ms = dict(DEFAULT_LATENCY_MS)
+
+
+def parse_latency(spec):
+    """Parse 'yfinance=40,anthropic=400:100' into {name: (mean, jitter)}"""
+    parsed = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, value = item.split('=', 1)
+        mean, _, jitter = value.partition(':')
+        parsed[name.strip()] = (float(mean), float(jitter or 0))
+    return parsed
+
+
+def _sleep(upstream):
+    mean, jitter = latency_ms.get(upstream, (0, 0))
+    delay = max(0.0, random.gauss(mean, jitter)) if jitter else mean
+    if delay:
+        time.sleep(delay / 1000.0)
+
+
+def _seed(ticker):
+    return sum(ord(c) * 31 ** i for i, c in enumerate(ticker)) % (2 ** 32)
+
+
+def synthetic_history(ticker, start=None, end=None, days=180):
+    """Deterministic random-walk OHLCV frame shaped like yfinance's history()"""
+    end = pd.Timestamp(end or datetime.now()).normalize()
+    start = pd.Timestamp(start or end - timedelta(days=days)).normalize()
+    # Callers may mutate the frame (reset_index(inplace=True)), so hand out copies
+    return _synthetic_history(ticker, start, end).copy()
+
+
+def synthetic_intraday(ticker, start, end=None):
+    """Deterministic 1-minute regular-session bars (9:30-16:00 New York time) between start and end"""
+    end = pd.Timestamp(end or datetime.now(timezone.utc))
+    start = pd.Timestamp(start)
+    end, start = (moment.tz_localize('UTC') if moment.tzinfo is None else moment for moment in (end, start))
+    days = pd.bdate_range(start.tz_convert('America/New_York').normalize().tz_localize(None),
+                          end.tz_convert('America/New_York').normalize().tz_localize(None))
+    minutes = pd.DatetimeIndex([day + timedelta(hours=9, minutes=30 + m) for day in days for m in range(390)])
+    index = minutes.tz_localize('America/New_York')
+    index = index[(index >= start) & (index < end)]
+    index.name = 'Datetime'
+    # Seeded by minute so overlapping fetches return the same bars
+    epoch = index.asi8 // 60_000_000_000
+    noise = np.sin(epoch * 12.9898 + _seed(ticker)) * 43758.5453 % 1
+    close = (50 + _seed(ticker) % 400) * (1 + 0.05 * np.sin(epoch / 2000.0) + 0.001 * noise)
+    open_ = close * (1 - 0.0005 * noise)
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * 1.0005,
+        'Low': np.minimum(open_, close) * 0.9995,
+        'Close': close,
+        'Volume': (1000 + (epoch % 997) * 37).astype(np.int64),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0
+    }, index=index)
+
+
+@lru_cache(maxsize=1024)
+def _synthetic_history(ticker, start, end):
+    index = pd.bdate_range(start, end, name='Date', tz='America/New_York')
+    rng = np.random.default_rng(_seed(ticker))
+    base = 50 + _seed(ticker) % 400
+    close = base * np.exp(np.cumsum(rng.normal(0, 0.015, len(index))))
+    open_ = close * (1 + rng.normal(0, 0.004, len(index)))
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, len(index)))),
+        'Low': np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, len(index)))),
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 50_000_000, len(index)),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0
+    }, index=index)
+
+
+class FakeTicker:
+    """Stand-in for yfinance.Ticker"""
+
+    def __init__(self, ticker, *args, **kwargs):
+        self.ticker = ticker.upper()
+
+    @property
+    def info(self):
+        _sleep('yfinance')
+        if self.ticker.startswith('INVALID'):
+            return {'trailingPegRatio': None}
+        price = float(synthetic_history(self.ticker, days=7)['Close'].iloc[-1])
+        return {
+            'symbol': self.ticker,
+            'longName': f'{self.ticker} Synthetic Corp.',
+            'sector': 'Technology',
+            'industry': 'Software',
+            'marketCap': int(price * 1_000_000_000),
+            'trailingPE': 25.0,
+            'forwardPE': 22.0,
+            'priceToBook': 8.0,
+            'dividendYield': 0.5,
+            'currentPrice': round(price, 2),
+            'targetHighPrice': round(price * 1.3, 2),
+            'targetLowPrice': round(price * 0.8, 2),
+            'targetMeanPrice': round(price * 1.1, 2),
+            'recommendationKey': 'buy',
+            'longBusinessSummary': f'{self.ticker} makes synthetic products. ' * 60
+        }
+
+    def history(self, start=None, end=None, period=None, interval='1d', **kwargs):
+        _sleep('yfinance')
+        if interval != '1d':
+            return synthetic_intraday(self.ticker, start, end)
+        return synthetic_history(self.ticker, start, end)
+
+
+def fake_download(tickers, start=None, end=None, **kwargs):
+    """Stand-in for yfinance.download: one call, a (Price, Ticker) column MultiIndex"""
+    _sleep('yfinance')
+    tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+    frames = {ticker: synthetic_history(ticker, start, end) for ticker in tickers if not ticker.startswith('INVALID')}
+    index = next(iter(frames.values())).index if frames else pd.DatetimeIndex([], name='Date')
+    columns = {}
+    for field in ('Close', 'High', 'Low', 'Open', 'Volume'):
+        for ticker in tickers:
+            columns[(field, ticker)] = frames[ticker][field] if ticker in frames else np.nan
+    frame = pd.DataFrame(columns, index=index)
+    frame.columns.names = ['Price', 'Ticker']
+    return frame
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise FakeRequests.exceptions.RequestException(f'HTTP {self.status_code}')
+
+
+NEWS_SUBJECTS = ['semiconductor export controls hit technology hardware makers',
+                 'oil supply disruption lifts energy producers', 'central bank rate path weighs on banks',
+                 'tariffs squeeze consumer retail margins', 'drug pricing rules pressure healthcare companies']
+
+
+def _news_payload(page_size):
+    now = datetime.utcnow()
+    articles = []
+    for i in range(page_size):
+        subject = NEWS_SUBJECTS[i % len(NEWS_SUBJECTS)]
+        articles.append({
+            'title': f'Synthetic global affairs headline {i}: {subject}',
+            'description': f'Markets react to synthetic event {i} as {subject}. ' * 3,
+            'content': f'Full synthetic article body {i}. ' * 20 + '[+1200 chars]',
+            'url': f'https://news.example.com/article-{i}',
+            'source': {'name': 'Synthetic Wire'},
+            'publishedAt': (now - timedelta(minutes=15 * i)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'author': 'Benchmark Desk'
+        })
+    return {'status': 'ok', 'totalResults': page_size, 'articles': articles}
+
+
+def _embedding_payload(texts, dim=768):
+    """Deterministic stand-in embeddings: hashed bag of words, so overlapping texts score higher"""
+    embeddings = []
+    for text in texts:
+        vector = np.zeros(dim)
+        for word in re.findall(r'[a-z]+', text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % dim] += 1
+        embeddings.append((vector / (np.linalg.norm(vector) or 1)).tolist())
+    return {'model': 'stub-hashed-bag-of-words', 'embeddings': embeddings}
+
+
+def _lambda_payload(query):
+    return {
+        'query': query,
+        'results': [{
+            'rank': i + 1,
+            'similarity': 0.9 - i * 0.05,
+            'book_name': ['The Intelligent Investor', 'Common Stocks and Uncommon Profits',
+                          'A Random Walk Down Wall Street'][i % 3],
+            'page': 100 + i,
+            'text': 'Synthetic investment principle about margin of safety and diversification. ' * 8
+        } for i in range(5)]
+    }
+
+
+class FakeRequests:
+    """Stand-in for the `requests` module as used by NewsAPI and the Lambda client"""
+
+    class exceptions:
+        class RequestException(Exception):
+            pass
+
+        class Timeout(RequestException):
+            pass
+
+    @staticmethod
+    def get(url, params=None, timeout=None, **kwargs):
+        if 'newsapi.org' in url:
+            _sleep('newsapi')
+            return FakeResponse(_news_payload((params or {}).get('pageSize', 15)))
+        raise FakeRequests.exceptions.RequestException(f'No stub for GET {url}')
+
+    @staticmethod
+    def post(url, json=None, timeout=None, **kwargs):
+        if 'lambda-url' in url:
+            _sleep('lambda')
+            if (json or {}).get('texts'):
+                return FakeResponse(_embedding_payload(json['texts']))
+            return FakeResponse(_lambda_payload((json or {}).get('query', '')))
+        raise FakeRequests.exceptions.RequestException(f'No stub for POST {url}')
+
+
+class _FakeMessages:
+    def create(self, model=None, max_tokens=None, system=None, messages=None, **kwargs):
+        _sleep('anthropic')
+        prompt = json.dumps(messages)
+        if max_tokens and max_tokens <= 200:
+            text = 'Elevated geopolitical risk suggests defensive investing, diversification and inflation hedging.'
+        elif 'portfolio analyst' in json.dumps(system or ''):
+            text = json.dumps({
+                'risk_level': 'MODERATE',
+                'confidence_score': 68,
+                'rationale': 'Synthetic portfolio rationale referencing diversification. ' * 5,
+                'key_factors': ['Synthetic factor one', 'Synthetic factor two'],
+                'risks': ['Synthetic concentration risk'],
+                'suggestions': ['Synthetic rebalancing suggestion']
+            })
+        else:
+            text = json.dumps({
+                'recommendation': 'BUY',
+                'confidence_score': 72,
+                'rationale': 'Synthetic rationale referencing margin of safety. ' * 5,
+                'key_factors': ['Synthetic factor one', 'Synthetic factor two'],
+                'risks': ['Synthetic risk one', 'Synthetic risk two'],
+                'price_target': '$123.45'
+            })
+        usage = types.SimpleNamespace(
+            input_tokens=len(prompt) // 4 + len(json.dumps(system or '')) // 4,
+            output_tokens=len(text) // 4,
+            cache_creation_input_tokens=0,
+            cache_read_input_tokens=0
+        )
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=text)], usage=usage)
+
+
+class FakeAnthropicClient:
+    def __init__(self, *args, **kwargs):
+        self.messages = _FakeMessages()
+
+
+fake_yfinance = types.SimpleNamespace(Ticker=FakeTicker, download=fake_download)
+fake_anthropic = types.SimpleNamespace(Anthropic=FakeAnthropicClient)
+
+
+def install(latency_overrides=None):
+    """Patch the app's upstream clients with the local stand-ins"""
+    import os
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-key')
+    os.environ.setdefault('NEWS_API_KEY', 'benchmark-key')
+    # The stand-ins never throttle, so measure the pipeline rather than the rate limiters
+    for name in ('YFINANCE', 'NEWSAPI', 'LAMBDA', 'ANTHROPIC'):
+        os.environ.setdefault(f'RATE_LIMIT_{name}', '0')
+    if 'UPSTREAM_STATE_DIR' not in os.environ:
+        import tempfile
+        os.environ['UPSTREAM_STATE_DIR'] = tempfile.mkdtemp(prefix='stockwellness-upstreams-')
+    latency_ms.update(latency_overrides or {})
+
+    from utils import stock_api, news_api, news_ranker, news_summarizer, llm_client_lambda_api
+    stock_api.yf = fake_yfinance
+    news_api.requests = FakeRequests
+    news_ranker.requests = FakeRequests
+    llm_client_lambda_api.requests = FakeRequests
+    news_summarizer.anthropic = fake_anthropic
+    llm_client_lambda_api.anthropic = fake_anthropic
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Complete fix: Create matching chunks.json and embeddings.npy from clean local data
+Complete fix: Create matching chunks (chunks.json and the chunks.jsonl/chunks.idx store) and embeddings.npy from clean local data
 This fixes both the metadata AND the index mismatch
 """
 
@@ -9,6 +9,10 @@ import numpy as np
 import boto3
 from sentence_transformers import SentenceTransformer
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lambda_deploy'))
+from chunk_store import write_chunk_store
 
 def main():
     print("🔧 COMPLETE FIX: Creating matching chunks + embeddings...")
@@ -53,6 +57,9 @@ def main():
     with open('chunks_complete.json', 'w') as f:
         json.dump(chunks_for_lambda, f, indent=2)
     
+    # Lazily read chunk store used by the Lambda (chunks.json is kept for older deployments)
+    write_chunk_store(chunks_for_lambda, 'chunks_complete.jsonl', 'chunks_complete.idx')
+    
     np.save('embeddings_complete.npy', embeddings)
     
     # Upload to S3
@@ -62,6 +69,9 @@ def main():
     # Upload chunks
     s3.upload_file('chunks_complete.json', 'stockwellness-models', 'rag/chunks.json')
     print("✅ Uploaded chunks.json")
+    s3.upload_file('chunks_complete.jsonl', 'stockwellness-models', 'rag/chunks.jsonl')
+    s3.upload_file('chunks_complete.idx', 'stockwellness-models', 'rag/chunks.idx')
+    print("✅ Uploaded chunks.jsonl and chunks.idx")
     
     # Upload embeddings  
     s3.upload_file('embeddings_complete.npy', 'stockwellness-models', 'rag/embeddings.npy')
@@ -69,6 +79,8 @@ def main():
     
     # Cleanup
     os.remove('chunks_complete.json')
+    os.remove('chunks_complete.jsonl')
+    os.remove('chunks_complete.idx')
     os.remove('embeddings_complete.npy')
     
     print("🎉 COMPLETE FIX DONE!")
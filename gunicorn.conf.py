@@ -0,0 +1,73 @@
+# Gunicorn configuration for StockWellness
+# Command-line flags (bind, workers, timeout, ...) are set in the Dockerfile CMD.
+#
+# Worker settings: an analysis spends nearly all its time waiting on yfinance,
+# NewsAPI, the RAG Lambda and Anthropic, and the service layer in utils/ is
+# thread-safe, so I/O-bound workers serve many requests per process:
+#
+#   --worker-class gthread --threads 8      (default in the Dockerfile)
+#   --worker-class gevent --worker-connections 100   (pip install gevent)
+#
+# Admitted and queued cold analyses (ADMISSION_MAX_CONCURRENT +
+# ADMISSION_MAX_QUEUE, across all workers) and open live quote streams
+# (QUOTE_MAX_STREAMS per worker) each hold a thread; keep their sum below
+# workers x threads so cache hits always find a free thread. when_ready warns
+# when it doesn't. Under gevent, PROFILE_MODE=sampling is not supported
+# (greenlets share one OS thread); cProfile mode works.
+#
+# Startup: heavy libraries (yfinance/pandas, anthropic, plotly) are imported
+# lazily on first use. With --preload (the Dockerfile default) the master
+# imports the app once, loads those libraries in when_ready, and forks workers
+# that share them copy-on-write, so a new or recycled worker starts in
+# milliseconds. Background threads are started per worker in post_worker_init.
+# Don't combine --preload with gevent: monkey-patching must happen before the
+# app is imported, in each worker.
+import os
+import shutil
+
+
+def on_starting(server):
+    """Start every deployment with an empty Prometheus multiprocess directory"""
+    prom_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if prom_dir:
+        shutil.rmtree(prom_dir, ignore_errors=True)
+        os.makedirs(prom_dir, exist_ok=True)
+
+
+def when_ready(server):
+    """With --preload, import the lazily loaded libraries once in the master before forking"""
+    if server.cfg.preload_app:
+        import app
+        app.preload_heavy_modules()
+    check_thread_budget(server)
+
+
+def check_thread_budget(server):
+    """Warn when cold analyses and quote streams can hold every gthread thread"""
+    cfg = server.cfg
+    if cfg.worker_class_str not in ('sync', 'gthread'):
+        return  # gevent/eventlet streams and queued requests hold greenlets, not threads
+    from utils.admission import ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE
+    from utils.quote_stream import QUOTE_MAX_STREAMS
+    held = ADMISSION_MAX_CONCURRENT + ADMISSION_MAX_QUEUE + cfg.workers * QUOTE_MAX_STREAMS
+    if held >= cfg.workers * cfg.threads:
+        server.log.warning(f"Cold analyses and quote streams can hold {held} of {cfg.workers * cfg.threads} threads; "
+                           "raise --threads or lower ADMISSION_MAX_* / QUOTE_MAX_STREAMS so cache hits find a thread")
+
+
+def post_worker_init(worker):
+    """Start the background jobs (cache warmer, refreshers) in each worker; threads don't survive fork"""
+    import app
+    app.start_background_jobs()
+
+
+def worker_exit(server, worker):
+    """Write out the fundamentals rows this worker still buffers before it goes away"""
+    import app
+    app.flush_buffers()
+
+
+def child_exit(server, worker):
+    """Drop the live metrics (in-flight gauge) of a worker that exited or was recycled"""
+    from utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
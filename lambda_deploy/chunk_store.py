@@ -0,0 +1,38 @@
+import json
+import mmap
+
+import numpy as np
+
+
+class ChunkStore:
+    """Book chunks read lazily from a JSONL file through a fixed-width offset index.
+
+    chunks.jsonl holds one JSON chunk ({book, page, text}) per line and
+    chunks.idx the little-endian uint64 byte offset of every line plus the
+    end of the file. Both are memory-mapped, so opening the store parses
+    nothing and a query reads just its top-k lines; memory stays flat as the
+    corpus grows.
+    """
+
+    def __init__(self, jsonl_path, index_path):
+        self.offsets = np.memmap(index_path, dtype='<u8', mode='r')
+        with open(jsonl_path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return json.loads(self.data[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+
+def write_chunk_store(chunks, jsonl_path, index_path):
+    """Write chunks as chunks.jsonl plus its offset index (see ChunkStore)"""
+    offsets = [0]
+    with open(jsonl_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False).encode('utf-8') + b'\n')
+            offsets.append(f.tell())
+    np.asarray(offsets, dtype='<u8').tofile(index_path)
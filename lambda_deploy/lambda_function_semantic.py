@@ -1,11 +1,16 @@
 import json
 import boto3
 import numpy as np
+from botocore.exceptions import ClientError
 from sentence_transformers import SentenceTransformer
 import tempfile
 import os
 import shutil
 from sklearn.metrics.pairwise import cosine_similarity
+from chunk_store import ChunkStore, write_chunk_store
+
+# Downloaded corpus files; kept across warm invocations (cleanup_tmp skips it)
+RAG_DIR = os.environ.get('RAG_DIR', '/tmp/rag')
 
 # Global variables for caching
 model = None
@@ -22,7 +27,7 @@ def get_model():
     return model
 
 def load_precomputed_data():
-    """Load precomputed embeddings and chunks from S3 (cached globally)"""
+    """Load precomputed embeddings and the lazy chunk store from S3 (cached globally)"""
     global book_embeddings, book_chunks
     
     if book_embeddings is not None and book_chunks is not None:
@@ -34,34 +39,39 @@ def load_precomputed_data():
     # Get bucket name from environment variable
     bucket_name = os.environ.get('S3_BUCKET_NAME', 'stockwellness-models')
     s3 = boto3.client('s3')
+    os.makedirs(RAG_DIR, exist_ok=True)
+    embeddings_path = os.path.join(RAG_DIR, 'embeddings.npy')
+    jsonl_path = os.path.join(RAG_DIR, 'chunks.jsonl')
+    index_path = os.path.join(RAG_DIR, 'chunks.idx')
     
-    # Create temporary files
-    embeddings_temp = tempfile.NamedTemporaryFile(delete=False, suffix='.npy')
-    chunks_temp = tempfile.NamedTemporaryFile(delete=False, suffix='.json')
+    # Download precomputed embeddings
+    print("📦 Downloading embeddings.npy...")
+    s3.download_file(bucket_name, 'rag/embeddings.npy', embeddings_path)
+    book_embeddings = np.load(embeddings_path)
+    print(f"✅ Loaded embeddings with shape: {book_embeddings.shape}")
     
+    # Download the chunk store; nothing is parsed until a query needs its top-k texts
     try:
-        # Download precomputed embeddings
-        print("📦 Downloading embeddings.npy...")
-        s3.download_file(bucket_name, 'rag/embeddings.npy', embeddings_temp.name)
-        book_embeddings = np.load(embeddings_temp.name)
-        print(f"✅ Loaded embeddings with shape: {book_embeddings.shape}")
-        
-        # Download chunks data
-        print("📚 Downloading chunks.json...")
-        s3.download_file(bucket_name, 'rag/chunks.json', chunks_temp.name)
-        with open(chunks_temp.name, 'r') as f:
-            book_chunks = json.load(f)
-        print(f"✅ Loaded {len(book_chunks)} book chunks")
-        
-        return book_embeddings, book_chunks
-        
-    finally:
-        # Clean up temporary files
+        print("📚 Downloading chunks.jsonl and chunks.idx...")
+        s3.download_file(bucket_name, 'rag/chunks.jsonl', jsonl_path)
+        s3.download_file(bucket_name, 'rag/chunks.idx', index_path)
+    except ClientError as e:
+        # Buckets written before the chunk store only have chunks.json: convert it once per cold start
+        print(f"⚠️ No chunk store in S3 ({e}), converting chunks.json...")
+        chunks_temp = tempfile.NamedTemporaryFile(delete=False, suffix='.json', dir=RAG_DIR)
         try:
-            os.unlink(embeddings_temp.name)
+            s3.download_file(bucket_name, 'rag/chunks.json', chunks_temp.name)
+            with open(chunks_temp.name, 'r') as f:
+                write_chunk_store(json.load(f), jsonl_path, index_path)
+        finally:
             os.unlink(chunks_temp.name)
-        except:
-            pass
+    
+    book_chunks = ChunkStore(jsonl_path, index_path)
+    print(f"✅ Opened {len(book_chunks)} book chunks")
+    if len(book_chunks) != len(book_embeddings):
+        print(f"⚠️ {len(book_chunks)} chunks but {len(book_embeddings)} embeddings - run complete_fix_s3.py")
+    
+    return book_embeddings, book_chunks
 
 def cleanup_tmp():
     """Clean up /tmp directory to avoid space issues"""
@@ -69,6 +79,8 @@ def cleanup_tmp():
         tmp_dir = '/tmp'
         for item in os.listdir(tmp_dir):
             item_path = os.path.join(tmp_dir, item)
+            if os.path.abspath(item_path) == os.path.abspath(RAG_DIR):
+                continue  # The open chunk store of this container
             try:
                 if os.path.isfile(item_path):
                     os.unlink(item_path)
@@ -80,6 +92,25 @@ def cleanup_tmp():
     except Exception as e:
         print(f"⚠️ Cleanup warning: {e}")
 
+def embed_texts(texts):
+    """Normalized embeddings for a batch of texts (news articles, ticker profiles)"""
+    texts = [str(text)[:2000] for text in texts[:128]]
+    print(f"🧠 Encoding {len(texts)} texts...")
+    embeddings = get_model().encode(texts, convert_to_tensor=False, normalize_embeddings=True)
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'POST, GET, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type'
+        },
+        'body': json.dumps({
+            'model': 'all-mpnet-base-v2',
+            'embeddings': np.round(np.asarray(embeddings, dtype=np.float32), 6).tolist()
+        })
+    }
+
 def lambda_handler(event, context):
     """
     AWS Lambda handler for semantic search using precomputed embeddings
@@ -93,9 +124,13 @@ def lambda_handler(event, context):
         # Get query from event
         if 'body' in event:
             body = json.loads(event['body'])
-            query = body.get('query', '')
         else:
-            query = event.get('query', '')
+            body = event
+        query = body.get('query', '')
+        
+        # Embedding mode: the app embeds news articles with the same model as the books
+        if body.get('texts'):
+            return embed_texts(body['texts'])
         
         if not query:
             return {
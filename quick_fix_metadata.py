@@ -5,8 +5,13 @@ This fixes the missing book names and page numbers issue
 """
 
 import json
+import os
+import sys
 import boto3
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lambda_deploy'))
+from chunk_store import write_chunk_store
+
 def main():
     print("🔧 Quick fix for metadata structure...")
     
@@ -41,12 +46,18 @@ def main():
     s3 = boto3.client('s3')
     s3.upload_file('chunks_metadata_fixed.json', 'stockwellness-models', 'rag/chunks.json')
     
-    print("✅ Uploaded fixed chunks.json with proper book names and page numbers!")
+    # The Lambda reads the chunk store first, so it must be replaced too
+    write_chunk_store(chunks_for_lambda, 'chunks_metadata_fixed.jsonl', 'chunks_metadata_fixed.idx')
+    s3.upload_file('chunks_metadata_fixed.jsonl', 'stockwellness-models', 'rag/chunks.jsonl')
+    s3.upload_file('chunks_metadata_fixed.idx', 'stockwellness-models', 'rag/chunks.idx')
+    
+    print("✅ Uploaded fixed chunks.json and chunk store with proper book names and page numbers!")
     print("🧪 Test your Lambda now - the metadata should appear!")
     
     # Cleanup
-    import os
     os.remove('chunks_metadata_fixed.json')
+    os.remove('chunks_metadata_fixed.jsonl')
+    os.remove('chunks_metadata_fixed.idx')
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -28,248 +28,118 @@ const appState = {
         'Crafting your investment story...'
     ],
     currentStep: 0,
-    cachingEnabled: false, // Toggle this to enable/disable caching - DISABLED FOR PRODUCTION
+    cachingEnabled: true, // Persistent browser cache of analyses (see analysisCache)
+    quoteStream: null, // EventSource with live quotes for the displayed ticker
     currentNewsIndex: 0 // For news carousel
 };
 
-// Cached results for popular tickers (for frontend testing)
-const cachedResults = {
-    'AAPL': {
-        "success": true,
-        "company_data": {
-            "name": "Apple Inc.",
-            "current_price": 185.50,
-            "market_cap": 2850000000000,
-            "pe_ratio": 28.5,
-            "forward_pe": 24.8,
-            "price_to_book": 8.2,
-            "dividend_yield": "0.52%"
-        },
-        "analysis": {
-            "recommendation": "BUY",
-            "rationale": "Apple demonstrates strong fundamentals with consistent revenue growth, robust ecosystem expansion, and innovative product pipeline. The company's services segment continues to show remarkable growth, providing recurring revenue streams. Strategic AI investments position Apple well for future growth.",
-            "price_target": "$210.00",
-            "key_factors": [
-                "Strong Q4 2024 earnings with 8% revenue growth year-over-year",
-                "iPhone 15 series showing strong adoption with Pro models leading sales",
-                "Services revenue reached record highs with 16% growth",
-                "AI chip developments putting Apple ahead in mobile AI capabilities",
-                "Strong cash position enabling continued shareholder returns"
-            ],
-            "risks": [
-                "China market dependency remains a geopolitical risk",
-                "Increasing competition in the smartphone market",
-                "Regulatory scrutiny around App Store policies",
-                "Supply chain constraints affecting production timelines"
-            ],
-            "rag_context": {
-                "global_news": [
-                    {
-                        "title": "Apple's AI Strategy Gains Momentum with New Chip Developments",
-                        "description": "Apple is reportedly developing advanced AI chips that could revolutionize mobile computing, positioning the company as a leader in artificial intelligence hardware.",
-                        "source": "TechCrunch",
-                        "url": "https://techcrunch.com/apple-ai-chips",
-                        "published_at": "2024-12-12T10:30:00Z"
-                    },
-                    {
-                        "title": "iPhone Sales Surge in Holiday Season Despite Market Headwinds",
-                        "description": "Apple's iPhone sales have shown remarkable resilience during the holiday shopping season, with Pro models driving premium segment growth.",
-                        "source": "Reuters",
-                        "url": "https://reuters.com/apple-iphone-sales",
-                        "published_at": "2024-12-11T15:45:00Z"
-                    },
-                    {
-                        "title": "Apple Services Revenue Hits New Record High",
-                        "description": "The company's services division, including App Store, iCloud, and Apple Music, generated record revenue in Q4 2024, showcasing the strength of Apple's ecosystem.",
-                        "source": "Bloomberg",
-                        "url": "https://bloomberg.com/apple-services-revenue",
-                        "published_at": "2024-12-10T09:20:00Z"
-                    },
-                    {
-                        "title": "China Market Shows Signs of Recovery for Apple",
-                        "description": "Apple's China operations are showing signs of improvement after several challenging quarters, with local partnerships driving growth.",
-                        "source": "Financial Times",
-                        "url": "https://ft.com/apple-china-recovery",
-                        "published_at": "2024-12-09T14:15:00Z"
-                    },
-                    {
-                        "title": "Apple's Sustainability Initiative Gains Investor Attention",
-                        "description": "Apple's commitment to carbon neutrality by 2030 is attracting ESG-focused investors and setting industry standards.",
-                        "source": "Wall Street Journal",
-                        "url": "https://wsj.com/apple-sustainability",
-                        "published_at": "2024-12-08T11:30:00Z"
-                    },
-                    {
-                        "title": "Mixed Reality Headset Vision Pro Shows Promise",
-                        "description": "Early adoption metrics for Apple's Vision Pro mixed reality headset indicate strong potential in enterprise applications.",
-                        "source": "The Verge",
-                        "url": "https://theverge.com/apple-vision-pro",
-                        "published_at": "2024-12-07T16:45:00Z"
-                    }
-                ],
-                "sources": [
-                    {
-                        "book": "The Intelligent Investor",
-                        "chapter": "Chapter 8: The Investor and Market Fluctuations",
-                        "page": "203",
-                        "text_preview": "The intelligent investor should recognize that market prices fluctuate much more widely than underlying business values. Apple exemplifies how a quality company with strong fundamentals can weather market volatility through consistent execution and innovation.",
-                        "relevance_score": 0.92
-                    },
-                    {
-                        "book": "Common Stocks and Uncommon Profits",
-                        "chapter": "Chapter 3: What to Buy - The Fifteen Points to Look for in a Common Stock",
-                        "page": "48",
-                        "text_preview": "Companies with strong research and development programs, like Apple's continuous innovation in technology, tend to maintain competitive advantages that translate into superior long-term returns for shareholders.",
-                        "relevance_score": 0.89
-                    }
-                ]
-            }
-        },
-        "chart_data": "{\"data\":[{\"x\":[\"2024-06-12\",\"2024-07-12\",\"2024-08-12\",\"2024-09-12\",\"2024-10-12\",\"2024-11-12\",\"2024-12-12\"],\"y\":[175.84,183.27,189.45,178.92,185.50,182.33,185.50],\"type\":\"scatter\",\"mode\":\"lines+markers\",\"name\":\"AAPL Price\",\"line\":{\"color\":\"#667eea\",\"width\":3}}],\"layout\":{\"title\":\"AAPL 6-Month Price Performance\",\"xaxis\":{\"title\":\"Date\"},\"yaxis\":{\"title\":\"Price ($)\"}}}",
-        "generated_at": "2024-12-12T10:30:00Z"
+// Persistent browser cache of analyses (IndexedDB), revalidated against the server's version
+const analysisCache = {
+    dbName: 'stockwellness',
+    storeName: 'analyses',
+    maxEntries: 50,
+    maxAgeMs: 7 * 24 * 60 * 60 * 1000,
+    dbPromise: null,
+
+    open() {
+        if (!this.dbPromise) {
+            this.dbPromise = new Promise((resolve, reject) => {
+                if (typeof indexedDB === 'undefined') {
+                    reject(new Error('IndexedDB not available'));
+                    return;
+                }
+                const request = indexedDB.open(this.dbName, 1);
+                request.onupgradeneeded = () => {
+                    const store = request.result.createObjectStore(this.storeName, { keyPath: 'key' });
+                    store.createIndex('savedAt', 'savedAt');
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return this.dbPromise;
     },
-    'QQQ': {
-        "success": true,
-        "company_data": {
-            "name": "Invesco QQQ Trust ETF",
-            "current_price": 408.25,
-            "market_cap": 185000000000,
-            "pe_ratio": 28.1,
-            "forward_pe": 25.3,
-            "price_to_book": 7.8,
-            "dividend_yield": "0.51%"
-        },
-        "analysis": {
-            "recommendation": "BUY",
-            "rationale": "QQQ provides excellent exposure to technology sector growth with top-tier companies driving innovation. The ETF benefits from AI revolution, cloud computing expansion, and digital transformation trends. Strong diversification across NASDAQ's best performers makes it an attractive growth investment.",
-            "price_target": "$450.00",
-            "key_factors": [
-                "Technology sector leading market performance with AI-driven growth",
-                "Strong performance from top holdings including Apple, Microsoft, NVIDIA",
-                "Cloud computing and digital services showing accelerated adoption",
-                "Low expense ratio of 0.20% making it cost-effective for investors",
-                "Consistent inflows indicating strong investor confidence"
-            ],
-            "risks": [
-                "High concentration in technology sector creates volatility risk",
-                "Interest rate sensitivity affecting growth valuations",
-                "Geopolitical tensions impacting global technology companies",
-                "Market concentration in top 10 holdings creates single-stock risk"
-            ],
-            "rag_context": {
-                "global_news": [
-                    {
-                        "title": "NASDAQ 100 Reaches New All-Time Highs on AI Optimism",
-                        "description": "The NASDAQ 100 index, tracked by QQQ, has surged to record levels as investors bet on artificial intelligence and technology sector growth.",
-                        "source": "CNBC",
-                        "url": "https://cnbc.com/nasdaq-100-highs",
-                        "published_at": "2024-12-12T09:15:00Z"
-                    },
-                    {
-                        "title": "Technology ETFs See Record Inflows as AI Revolution Accelerates",
-                        "description": "ETFs like QQQ are experiencing unprecedented inflows as investors seek exposure to the AI and technology revolution sweeping global markets.",
-                        "source": "MarketWatch",
-                        "url": "https://marketwatch.com/tech-etf-inflows",
-                        "published_at": "2024-12-11T14:30:00Z"
-                    },
-                    {
-                        "title": "Cloud Computing Giants Drive QQQ Performance Higher",
-                        "description": "Major cloud computing companies in the QQQ portfolio are reporting strong earnings, driving the ETF's outperformance.",
-                        "source": "Barron's",
-                        "url": "https://barrons.com/qqq-cloud-performance",
-                        "published_at": "2024-12-10T16:45:00Z"
-                    },
-                    {
-                        "title": "Semiconductor Stocks Boost NASDAQ 100 Momentum",
-                        "description": "Semiconductor companies within QQQ's holdings are seeing strong demand, particularly from AI and data center applications.",
-                        "source": "Seeking Alpha",
-                        "url": "https://seekingalpha.com/semiconductor-nasdaq",
-                        "published_at": "2024-12-09T11:20:00Z"
-                    }
-                ],
-                "sources": [
-                    {
-                        "book": "A Random Walk Down Wall Street",
-                        "chapter": "Chapter 14: A Practical Guide for Random Walkers",
-                        "page": "385",
-                        "text_preview": "Index funds like QQQ offer investors broad diversification at low cost. The NASDAQ 100's focus on growth companies provides exposure to innovation leaders while maintaining reasonable diversification across the technology sector.",
-                        "relevance_score": 0.95
-                    }
-                ]
-            }
-        },
-        "chart_data": "{\"data\":[{\"x\":[\"2024-06-12\",\"2024-07-12\",\"2024-08-12\",\"2024-09-12\",\"2024-10-12\",\"2024-11-12\",\"2024-12-12\"],\"y\":[398.45,402.30,385.67,391.28,408.25,405.12,408.25],\"type\":\"scatter\",\"mode\":\"lines+markers\",\"name\":\"QQQ Price\",\"line\":{\"color\":\"#667eea\",\"width\":3}}],\"layout\":{\"title\":\"QQQ 6-Month Price Performance\",\"xaxis\":{\"title\":\"Date\"},\"yaxis\":{\"title\":\"Price ($)\"}}}",
-        "generated_at": "2024-12-12T10:30:00Z"
+
+    async transaction(mode, work) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(this.storeName, mode);
+            const result = work(tx.objectStore(this.storeName));
+            tx.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+            tx.onerror = () => reject(tx.error);
+        });
     },
-    'TSLA': {
-        "success": true,
-        "company_data": {
-            "name": "Tesla Inc.",
-            "current_price": 245.67,
-            "market_cap": 780000000000,
-            "pe_ratio": 85.4,
-            "forward_pe": 58.2,
-            "price_to_book": 12.8,
-            "dividend_yield": "0.00%"
-        },
-        "analysis": {
-            "recommendation": "HOLD",
-            "rationale": "Tesla continues to lead electric vehicle innovation but faces increasing competition. Strong autonomous driving progress and energy business growth offset concerns about automotive margin pressure. Execution of robotaxi vision will be crucial for future valuation.",
-            "price_target": "$280.00",
-            "key_factors": [
-                "Leading position in electric vehicle market with strong brand",
-                "Full Self-Driving capabilities showing significant progress",
-                "Energy storage and solar business growing rapidly",
-                "Gigafactory expansion increasing production capacity globally",
-                "Strong cash generation and improving operational efficiency"
-            ],
-            "risks": [
-                "Increasing competition from traditional automakers in EV space",
-                "Regulatory challenges affecting autonomous driving rollout", 
-                "Economic slowdown impacting luxury vehicle demand",
-                "Key person risk associated with leadership changes"
-            ],
-            "rag_context": {
-                "global_news": [
-                    {
-                        "title": "Tesla's Full Self-Driving Makes Major Breakthrough",
-                        "description": "Tesla's latest FSD update shows remarkable improvement in autonomous driving capabilities, bringing the company closer to full autonomy.",
-                        "source": "Electrek",
-                        "url": "https://electrek.co/tesla-fsd-breakthrough",
-                        "published_at": "2024-12-12T08:45:00Z"
-                    },
-                    {
-                        "title": "Electric Vehicle Market Competition Intensifies",
-                        "description": "Traditional automakers are launching competitive EV models, creating pressure on Tesla's market share and pricing power.",
-                        "source": "Automotive News",
-                        "url": "https://autonews.com/ev-competition",
-                        "published_at": "2024-12-11T13:20:00Z"
-                    }
-                ],
-                "sources": [
-                    {
-                        "book": "One Up On Wall Street",
-                        "chapter": "Chapter 11: Stalking the Tenbagger",
-                        "page": "142",
-                        "text_preview": "Companies like Tesla that revolutionize entire industries can provide exceptional returns, but investors must carefully evaluate whether the innovation can sustain competitive advantages as the market matures.",
-                        "relevance_score": 0.87
-                    }
-                ]
-            }
-        },
-        "chart_data": "{\"data\":[{\"x\":[\"2024-06-12\",\"2024-07-12\",\"2024-08-12\",\"2024-09-12\",\"2024-10-12\",\"2024-11-12\",\"2024-12-12\"],\"y\":[195.32,218.45,201.89,238.77,245.67,240.12,245.67],\"type\":\"scatter\",\"mode\":\"lines+markers\",\"name\":\"TSLA Price\",\"line\":{\"color\":\"#667eea\",\"width\":3}}],\"layout\":{\"title\":\"TSLA 6-Month Price Performance\",\"xaxis\":{\"title\":\"Date\"},\"yaxis\":{\"title\":\"Price ($)\"}}}",
-        "generated_at": "2024-12-12T10:30:00Z"
+
+    async get(ticker, profile) {
+        try {
+            const entry = await this.transaction('readonly', store => store.get(`${profile}:${ticker}`));
+            if (!entry || Date.now() - entry.savedAt > this.maxAgeMs) return null;
+            return entry;
+        } catch (e) {
+            console.warn('Analysis cache unavailable:', e);
+            return null;
+        }
+    },
+
+    async put(ticker, profile, version, data) {
+        try {
+            await this.transaction('readwrite', store => store.put({
+                key: `${profile}:${ticker}`, ticker, profile, version, data, savedAt: Date.now()
+            }));
+            await this.prune();
+        } catch (e) {
+            console.warn('Could not store analysis:', e);
+        }
+    },
+
+    async prune() {
+        // Keep only the most recently saved entries
+        await this.transaction('readwrite', store => {
+            let seen = 0;
+            store.index('savedAt').openCursor(null, 'prev').onsuccess = event => {
+                const cursor = event.target.result;
+                if (!cursor) return;
+                if (++seen > this.maxEntries) cursor.delete();
+                cursor.continue();
+            };
+        });
+    },
+
+    async tickers() {
+        try {
+            const keys = await this.transaction('readonly', store => store.getAllKeys());
+            return (keys || []).map(key => key.split(':')[1]);
+        } catch (e) {
+            return [];
+        }
+    },
+
+    async clear() {
+        try {
+            await this.transaction('readwrite', store => store.clear());
+        } catch (e) {
+            console.warn('Could not clear analysis cache:', e);
+        }
     }
 };
 
+// Identity part of an ETag header ("<hex>-gzip" -> <hex>)
+function etagVersion(etag) {
+    return etag ? etag.replace(/^W\//, '').replace(/"/g, '').split('-')[0] : null;
+}
+
 // Initialize Application
 function initializeApp() {
     console.log('🚀 StockWellness initialized successfully');
-    console.log('📡 PRODUCTION MODE: Cache disabled - using live API calls');
+    console.log('📡 Analyses are stored in the browser and revalidated with the server');
     setupFormHandlers();
     setupTickerChips();
     setupInteractiveElements();
     setupScrollAnimations();
+    // A hidden tab doesn't need live prices, and every open stream holds a server thread
+    document.addEventListener('visibilitychange', () => {
+        if (document.hidden) stopLiveQuote();
+    });
 }
 
 // Setup Form Handlers
@@ -297,7 +167,7 @@ function setupFormHandlers() {
     
     // Real-time validation
     tickerInput.addEventListener('input', function(e) {
-        let value = e.target.value.toUpperCase().replace(/[^A-Z]/g, '');
+        let value = e.target.value.toUpperCase().replace(/[^A-Z.\-]/g, '');
         e.target.value = value;
         
         // Add visual feedback
@@ -306,6 +176,8 @@ function setupFormHandlers() {
         } else {
             e.target.classList.remove('has-value');
         }
+        
+        scheduleSymbolSuggestions(value);
     });
     
     // Focus animations
@@ -318,6 +190,42 @@ function setupFormHandlers() {
     });
 }
 
+// Symbol autocomplete from the server's local symbol directory
+let suggestionTimer = null;
+let lastSuggestionQuery = '';
+
+function scheduleSymbolSuggestions(query) {
+    clearTimeout(suggestionTimer);
+    if (!query || query === lastSuggestionQuery) {
+        return;
+    }
+    suggestionTimer = setTimeout(() => loadSymbolSuggestions(query), 120);
+}
+
+async function loadSymbolSuggestions(query) {
+    lastSuggestionQuery = query;
+    try {
+        const response = await fetch(`/symbols/search?q=${encodeURIComponent(query)}&limit=8`);
+        if (!response.ok) {
+            return;
+        }
+        const data = await response.json();
+        const datalist = document.getElementById('tickerSuggestions');
+        if (!datalist || query !== lastSuggestionQuery) {
+            return;
+        }
+        datalist.innerHTML = '';
+        data.results.forEach(match => {
+            const option = document.createElement('option');
+            option.value = match.symbol;
+            option.label = match.exchange ? `${match.name} (${match.exchange})` : match.name;
+            datalist.appendChild(option);
+        });
+    } catch (error) {
+        console.warn('Symbol suggestions unavailable:', error);
+    }
+}
+
 // Setup Ticker Chips
 function setupTickerChips() {
     const tickerChips = document.querySelectorAll('.ticker-chip');
@@ -433,27 +341,37 @@ function typeWriterEffect(element, text) {
 
 // Perform Analysis API Call
 async function performAnalysis(ticker) {
+    const profile = 'slim';
+    let stored = null;
     try {
-        // Check if caching is enabled and we have cached data
-        if (appState.cachingEnabled && cachedResults[ticker]) {
-            console.log(`Using cached results for ${ticker}`);
-            
-            // Simulate API delay for realistic UX
-            await new Promise(resolve => setTimeout(resolve, 2000));
+        // Render a stored analysis at once, then check with the server that it is still current
+        stored = appState.cachingEnabled ? await analysisCache.get(ticker, profile) : null;
+        if (stored) {
+            console.log(`Showing stored analysis for ${ticker}`);
+            displayResults(stored.data);
+            resetLoadingState();
             
-            displayResults(cachedResults[ticker]);
-            return;
+            const version = await fetchAnalysisVersion(ticker, profile);
+            if (version && version === stored.version) {
+                return;
+            }
+            showNotification(`Refreshing the analysis for ${ticker}...`, 'info');
         }
         
-        // Make actual API call
-        const formData = new FormData();
-        formData.append('ticker', ticker);
-        
-        const response = await fetch('/analyze', {
-            method: 'POST',
-            body: formData
+        // GET lets the server answer 304 Not Modified while the stored copy is current
+        const headers = { 'Accept': 'application/json' };
+        if (stored && stored.version) {
+            headers['If-None-Match'] = `"${stored.version}"`;
+        }
+        const response = await fetch(`/analyze/${encodeURIComponent(ticker)}?profile=${profile}`, {
+            method: 'GET',
+            headers
         });
         
+        if (response.status === 304) {
+            return;
+        }
+        
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
@@ -464,20 +382,40 @@ async function performAnalysis(ticker) {
             throw new Error(data.error);
         }
         
-        // Simulate minimum loading time for better UX
-        await new Promise(resolve => setTimeout(resolve, 1000));
-        
         displayResults(data);
         
+        // Stale fallbacks (served from history while upstreams are down) are not kept
+        if (appState.cachingEnabled && !data.stale) {
+            analysisCache.put(ticker, profile, etagVersion(response.headers.get('ETag')), data);
+        }
+        
     } catch (error) {
         console.error('Analysis error:', error);
-        showError(error.message);
+        if (stored) {
+            showNotification(`Showing the saved analysis for ${ticker}; it could not be refreshed.`, 'warning');
+        } else {
+            showError(error.message);
+        }
     } finally {
         appState.isLoading = false;
         resetLoadingState();
     }
 }
 
+// Lightweight freshness check: the version the server would serve, without running an analysis
+async function fetchAnalysisVersion(ticker, profile) {
+    try {
+        const response = await fetch(`/analyze/${encodeURIComponent(ticker)}/version?profile=${profile}`, {
+            headers: { 'Accept': 'application/json' },
+            cache: 'no-store'
+        });
+        if (!response.ok) return null;
+        return (await response.json()).version;
+    } catch (e) {
+        return null;
+    }
+}
+
 // Display Results
 function displayResults(data) {
     console.log('Displaying results:', data);
@@ -506,9 +444,12 @@ function displayResults(data) {
         try { displayStoryHeader(data); } catch (e) { console.error('Error in displayStoryHeader:', e); }
         try { displayRecommendation(data.analysis); } catch (e) { console.error('Error in displayRecommendation:', e); }
         try { displayDetailedAnalysis(data); } catch (e) { console.error('Error in displayDetailedAnalysis:', e); }
+        try { stopLiveQuote(); } catch (e) { console.error('Error in stopLiveQuote:', e); }
         try { 
-            console.log('Chart data being passed:', data.chart_data); 
-            displayPriceChart(data.chart_data); 
+            // Slim responses carry the columnar price series instead of Plotly chart JSON
+            const chartData = data.chart_data || buildChartFromSeries(data.price_series, data.company_data.name);
+            console.log('Chart data being passed:', chartData); 
+            displayPriceChart(chartData); 
         } catch (e) { console.error('Error in displayPriceChart:', e); }
         try { displayGlobalContext(data.analysis.rag_context); } catch (e) { console.error('Error in displayGlobalContext:', e); }
         try { displayLiteratureContext(data.analysis.rag_context); } catch (e) { console.error('Error in displayLiteratureContext:', e); }
@@ -529,6 +470,46 @@ function displayResults(data) {
     }
 }
 
+// Live price of the displayed ticker over Server-Sent Events (one shared upstream poll per symbol).
+// Opt-in from the Live button: each open stream holds a server thread, so results don't open one by themselves.
+function toggleLiveQuote(ticker) {
+    if (appState.quoteStream) stopLiveQuote();
+    else subscribeLiveQuote(ticker);
+}
+
+function stopLiveQuote() {
+    if (appState.quoteStream) appState.quoteStream.close();
+    appState.quoteStream = null;
+    setLiveButton(false);
+}
+
+function setLiveButton(live) {
+    const button = document.querySelector('[data-live-price] .live-toggle');
+    if (!button) return;
+    button.setAttribute('aria-pressed', String(live));
+    button.textContent = live ? 'Stop live' : 'Live';
+}
+
+function subscribeLiveQuote(ticker) {
+    stopLiveQuote();
+    if (!ticker || typeof EventSource === 'undefined') return;
+    
+    const stream = new EventSource(`/quotes/stream?symbols=${encodeURIComponent(ticker)}`);
+    stream.addEventListener('quote', (event) => {
+        const quote = JSON.parse(event.data);
+        const value = document.querySelector('[data-live-price] .fundamental-value');
+        if (!value || quote.symbol !== ticker) return;
+        const change = quote.change_percent !== null ? ` (${quote.change_percent >= 0 ? '+' : ''}${quote.change_percent}%)` : '';
+        value.textContent = `$${quote.price.toFixed(2)}${change}`;
+    });
+    // The server ends streams periodically and EventSource reconnects; give up only if it refuses
+    stream.onerror = () => {
+        if (stream.readyState === EventSource.CLOSED && appState.quoteStream === stream) stopLiveQuote();
+    };
+    appState.quoteStream = stream;
+    setLiveButton(true);
+}
+
 // Display Story Header
 function displayStoryHeader(data) {
     document.getElementById('companyName').textContent = data.company_data.name;
@@ -645,16 +626,21 @@ function displayDetailedAnalysis(data) {
                 { label: 'Forward P/E', value: data.company_data.forward_pe || 'N/A' },
                 { label: 'Price to Book', value: data.company_data.price_to_book || 'N/A' },
                 { label: 'Dividend Yield', value: data.company_data.dividend_yield || 'N/A' },
-                { label: 'Current Price', value: data.company_data.current_price ? `$${data.company_data.current_price}` : 'N/A' }
+                { label: 'Current Price', value: data.company_data.current_price ? `$${data.company_data.current_price}` : 'N/A', live: true }
             ];
             
             fundamentals.forEach((fundamental, index) => {
                 const item = document.createElement('div');
                 item.className = 'fundamental-item';
+                if (fundamental.live) item.dataset.livePrice = '';
                 item.innerHTML = `
                     <div class="fundamental-value">${fundamental.value}</div>
                     <div class="fundamental-label">${fundamental.label}</div>
+                    ${fundamental.live ? '<button type="button" class="live-toggle" aria-pressed="false">Live</button>' : ''}
                 `;
+                if (fundamental.live) {
+                    item.querySelector('.live-toggle').addEventListener('click', () => toggleLiveQuote(data.ticker));
+                }
                 item.style.animationDelay = `${index * 0.1}s`;
                 fundamentalsGrid.appendChild(item);
             });
@@ -727,6 +713,33 @@ function displayPriceChart(chartData) {
     }
 }
 
+// Build Plotly chart data from a columnar price series (slim response profile)
+function buildChartFromSeries(priceSeries, companyName) {
+    if (!priceSeries || !priceSeries.date || priceSeries.date.length === 0) {
+        return null;
+    }
+    
+    return {
+        data: [{
+            x: priceSeries.date,
+            y: priceSeries.close,
+            type: 'scatter',
+            mode: 'lines',
+            name: 'Close Price',
+            line: { color: '#1f77b4', width: 2 },
+            hovertemplate: '<b>Date:</b> %{x}<br><b>Price:</b> $%{y:.2f}<extra></extra>'
+        }],
+        layout: {
+            title: `${companyName} - 6 Month Price History`,
+            xaxis: { title: 'Date' },
+            yaxis: { title: 'Price ($)' },
+            height: 400,
+            showlegend: true,
+            hovermode: 'x unified'
+        }
+    };
+}
+
 // Display Global Context with Carousel
 function displayGlobalContext(ragContext) {
     console.log('displayGlobalContext called with:', ragContext);
@@ -1407,7 +1420,7 @@ function toggleCaching(enabled) {
     
     // Show temporary notification
     showNotification(
-        `Caching ${enabled ? 'enabled' : 'disabled'}. ${enabled ? 'Using cached data for popular tickers.' : 'Making live API calls.'}`,
+        `Caching ${enabled ? 'enabled' : 'disabled'}. ${enabled ? 'Stored analyses are shown at once and revalidated.' : 'Making live API calls.'}`,
         enabled ? 'success' : 'warning'
     );
 }
@@ -1440,9 +1453,11 @@ window.StockWellness = {
     toggleCaching: (enabled) => toggleCaching(enabled),
     enableCaching: () => toggleCaching(true),
     disableCaching: () => toggleCaching(false),
-    showCachedTickers: () => {
-        console.log('Available cached tickers:', Object.keys(cachedResults));
-        return Object.keys(cachedResults);
+    showCachedTickers: async () => {
+        const tickers = await analysisCache.tickers();
+        console.log('Stored tickers:', tickers);
+        return tickers;
     },
+    clearCache: () => analysisCache.clear(),
     currentState: () => appState
 }; 
\ No newline at end of file
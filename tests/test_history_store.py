@@ -0,0 +1,15 @@
+from utils.history_store import parse_price
+
+
+def test_parse_price_ignores_the_horizon_in_12_month_targets():
+    assert parse_price("$185 (12-month target)") == 185.0
+    assert parse_price("12-month target: $180") == 180.0
+    assert parse_price("12-month target: $150-$160") == 155.0
+
+
+def test_parse_price_ranges_and_plain_values():
+    assert parse_price("$150 to $160") == 155.0
+    assert parse_price("150-160") == 155.0
+    assert parse_price("$1,234.50") == 1234.5
+    assert parse_price(85) == 85.0
+    assert parse_price("N/A") is None
@@ -0,0 +1,147 @@
+import os
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from .metrics import stage, record_admission, record_shed
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cold analyses allowed to run at once across all gunicorn workers, and how many may wait
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', 2))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 4))
+
+# Longest a queued request waits for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 10))
+
+POLL_SECONDS = 0.05
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; `retry_after` is a hint in whole seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server busy ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded queue with a concurrency cap in front of expensive requests.
+
+    Running and queued requests each hold one of a fixed set of lock files, so
+    the limits apply across all gunicorn workers (and threads) and a crashed
+    worker releases its slot automatically. When every queue position is taken
+    the request is rejected at once; a queued request that does not get a slot
+    within its wait budget is rejected too. Cheap requests (cache hits, static
+    pages) never enter the controller.
+    """
+
+    def __init__(self, lock_dir, max_concurrent=None, max_queue=None, queue_timeout=None):
+        self.lock_dir = os.path.abspath(lock_dir)
+        self.max_concurrent = max_concurrent if max_concurrent is not None else ADMISSION_MAX_CONCURRENT
+        self.max_queue = max_queue if max_queue is not None else ADMISSION_MAX_QUEUE
+        self.queue_timeout = queue_timeout if queue_timeout is not None else ADMISSION_QUEUE_TIMEOUT
+        self.avg_seconds = 10.0  # moving average of admitted request durations, for Retry-After
+        self.shed_counts = {'queue_full': 0, 'queue_timeout': 0}
+        self.stats_lock = threading.Lock()
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _try_lock(self, kind, count):
+        """Open file of the first free `kind` slot (held locked), or None"""
+        for i in range(count):
+            f = open(os.path.join(self.lock_dir, f"{kind}-{i}.lock"), 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return f
+            except OSError:
+                f.close()
+        return None
+
+    @staticmethod
+    def _unlock(f):
+        if f is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            finally:
+                f.close()
+
+    def _count_held(self, kind, count):
+        held = 0
+        for i in range(count):
+            with open(os.path.join(self.lock_dir, f"{kind}-{i}.lock"), 'a') as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                except OSError:
+                    held += 1
+        return held
+
+    def retry_after(self):
+        queued = self._count_held('queue', self.max_queue) if fcntl else 0
+        return max(1, math.ceil(self.avg_seconds * (queued + 1) / max(1, self.max_concurrent)))
+
+    def _shed(self, reason):
+        with self.stats_lock:
+            self.shed_counts[reason] += 1
+        record_shed(reason)
+        retry_after = self.retry_after()
+        logger.warning(f"Shedding request ({reason}), retry after {retry_after}s")
+        raise Overloaded(reason, retry_after)
+
+    @contextmanager
+    def slot(self, max_wait=None):
+        """Run the body in an admission slot, waiting in the queue up to `max_wait` seconds"""
+        if fcntl is None or self.max_concurrent <= 0:
+            yield
+            return
+
+        running = self._try_lock('slot', self.max_concurrent)
+        if running is None:
+            queued = self._try_lock('queue', self.max_queue)
+            if queued is None:
+                self._shed('queue_full')
+            record_admission(queued=1)
+            try:
+                give_up_at = time.monotonic() + min(self.queue_timeout, max_wait if max_wait is not None else self.queue_timeout)
+                with stage('queue'):
+                    while running is None and time.monotonic() < give_up_at:
+                        time.sleep(POLL_SECONDS)
+                        running = self._try_lock('slot', self.max_concurrent)
+            finally:
+                self._unlock(queued)
+                record_admission(queued=-1)
+            if running is None:
+                self._shed('queue_timeout')
+
+        record_admission(active=1)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._unlock(running)
+            record_admission(active=-1)
+            with self.stats_lock:
+                self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * (time.monotonic() - started)
+
+    def status(self):
+        """Current slot usage across all workers plus this worker's shed counts"""
+        if fcntl is None:
+            return {'enabled': False}
+        return {
+            'enabled': self.max_concurrent > 0,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'active': self._count_held('slot', self.max_concurrent),
+            'queued': self._count_held('queue', self.max_queue),
+            'shed': dict(self.shed_counts),
+            'avg_seconds': round(self.avg_seconds, 2)
+        }
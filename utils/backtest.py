@@ -0,0 +1,138 @@
+import os
+import logging
+
+from .lazy_import import LazyModule
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+np = LazyModule('numpy')
+
+# Forward horizons in trading days (1 week, 1 month, 1 quarter)
+BACKTEST_HORIZONS = [int(h) for h in os.getenv('BACKTEST_HORIZONS', '5,21,63').split(',') if h.strip()]
+
+# Returns are measured against this ticker; empty for absolute returns
+BACKTEST_BENCHMARK = os.getenv('BACKTEST_BENCHMARK', 'SPY').strip().upper()
+
+# A HOLD counts as correct while the (excess) return stays within this band
+HOLD_BAND_PCT = float(os.getenv('BACKTEST_HOLD_BAND_PCT', 5))
+
+CONFIDENCE_BUCKETS = [0, 40, 60, 80, 101]
+CONFIDENCE_LABELS = ['0-39', '40-59', '60-79', '80-100']
+
+DIRECTIONS = {'BUY': 1, 'HOLD': 0, 'SELL': -1}
+
+
+def _pct(value):
+    value = float(value)
+    return round(value * 100, 2) if np.isfinite(value) else None
+
+
+def _group_stats(groups, group_count, hit, returns, excess, signal):
+    """Per-group count, hit rate and mean returns with bincount instead of a loop over rows"""
+    counts = np.bincount(groups, minlength=group_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        def mean(values):
+            return np.bincount(groups, weights=values, minlength=group_count) / counts
+        hit_rate, mean_return, mean_excess, mean_signal = mean(hit), mean(returns), mean(excess), mean(signal)
+    return [{
+        'count': int(counts[g]),
+        'hit_rate_pct': _pct(hit_rate[g]),
+        'mean_return_pct': _pct(mean_return[g]),
+        'mean_excess_pct': _pct(mean_excess[g]),
+        'signal_return_pct': _pct(mean_signal[g])
+    } for g in range(group_count)]
+
+
+def backtest(recommendations, dates, closes, tickers, benchmark=None, horizons=None):
+    """Score stored recommendations against realized forward returns.
+
+    `recommendations` are HistoryStore.recommendations() rows; `dates`,
+    `closes` and `tickers` form an aligned (days x tickers) price matrix such
+    as StockAPI.get_price_matrix returns. Every recommendation is entered at
+    the close of its day (or the next trading day) and measured `h` trading
+    days later, for all recommendations and horizons at once with array
+    indexing. With a benchmark column, hits and signal returns use the excess
+    return over the benchmark: a BUY is right when the stock beat it, a SELL
+    when it lagged, a HOLD when it stayed within HOLD_BAND_PCT.
+    """
+    horizons = horizons or BACKTEST_HORIZONS
+    dates = np.asarray(dates)
+    closes = np.asarray(closes, dtype=float)
+    count = len(recommendations)
+
+    # Column of every recommendation's ticker in the price matrix (`known` is False when it isn't there)
+    ticker_order = np.argsort(tickers)
+    sorted_tickers = np.asarray(tickers)[ticker_order]
+    rec_tickers = np.array([r['ticker'] for r in recommendations], dtype=str)
+    position = np.clip(np.searchsorted(sorted_tickers, rec_tickers), 0, max(len(tickers) - 1, 0))
+    known = sorted_tickers[position] == rec_tickers if len(tickers) else np.zeros(count, dtype=bool)
+    column = np.where(known, ticker_order[position], 0)
+
+    day = np.searchsorted(dates, np.array([r['date'] for r in recommendations], dtype=str), side='left')
+    valid = known & (day < len(dates))
+    day = np.where(valid, day, 0)
+
+    direction = np.array([DIRECTIONS.get(r['recommendation'], 0) for r in recommendations])
+    confidence = np.array([r['confidence'] if r['confidence'] is not None else np.nan for r in recommendations], dtype=float)
+    target = np.array([r['price_target'] if r['price_target'] is not None else np.nan for r in recommendations], dtype=float)
+    entry = closes[day, column]
+
+    bench_column = list(tickers).index(benchmark) if benchmark in tickers else None
+    buckets = np.clip(np.digitize(np.nan_to_num(confidence), CONFIDENCE_BUCKETS) - 1, 0, len(CONFIDENCE_BUCKETS) - 2)
+    labels = list(DIRECTIONS)
+    label_index = np.array([labels.index(r['recommendation']) if r['recommendation'] in DIRECTIONS else 1
+                            for r in recommendations], dtype=int)
+
+    report = {
+        'recommendations': count,
+        'evaluated': int(valid.sum()),
+        'unpriced_tickers': sorted(set(rec_tickers[~known].tolist())),
+        'benchmark': benchmark if bench_column is not None else None,
+        'price_period': {'start': str(dates[0]), 'end': str(dates[-1])} if len(dates) else None,
+        'horizons': {}
+    }
+
+    for h in horizons:
+        exit_day = day + h
+        ok = valid & (exit_day < len(dates))
+        if not ok.any():
+            report['horizons'][f'{h}d'] = {'evaluated': 0}
+            continue
+        exit_price = closes[exit_day[ok], column[ok]]
+        returns = exit_price / entry[ok] - 1
+        if bench_column is not None:
+            excess = returns - (closes[exit_day[ok], bench_column] / closes[day[ok], bench_column] - 1)
+        else:
+            excess = returns
+        d = direction[ok]
+        hit = np.where(d > 0, excess > 0, np.where(d < 0, excess < 0, np.abs(excess) * 100 < HOLD_BAND_PCT)).astype(float)
+        signal = d * excess
+
+        overall = _group_stats(np.zeros(int(ok.sum()), dtype=int), 1, hit, returns, excess, signal)[0]
+        by_recommendation = _group_stats(label_index[ok], len(labels), hit, returns, excess, signal)
+        by_confidence = _group_stats(buckets[ok], len(CONFIDENCE_BUCKETS) - 1, hit, returns, excess, signal)
+
+        # Price targets: error against the realized price, and whether they pointed the right way
+        t = target[ok]
+        has_target = np.isfinite(t) & (t > 0)
+        entry_ok = entry[ok]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            abs_error = np.abs(t[has_target] / exit_price[has_target] - 1)
+            agreement = np.sign(t[has_target] - entry_ok[has_target]) == np.sign(exit_price[has_target] - entry_ok[has_target])
+
+        report['horizons'][f'{h}d'] = {
+            'evaluated': overall['count'],
+            **{key: value for key, value in overall.items() if key != 'count'},
+            'by_recommendation': {label: stats for label, stats in zip(labels, by_recommendation) if stats['count']},
+            'by_confidence': [
+                {'range': label, **stats} for label, stats in zip(CONFIDENCE_LABELS, by_confidence) if stats['count']
+            ],
+            'price_target': {
+                'count': int(has_target.sum()),
+                'median_abs_error_pct': _pct(np.median(abs_error)) if len(abs_error) else None,
+                'mean_abs_error_pct': _pct(abs_error.mean()) if len(abs_error) else None,
+                'direction_agreement_pct': _pct(agreement.mean()) if len(agreement) else None
+            }
+        }
+    return report
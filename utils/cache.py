@@ -1,20 +1,46 @@
 import json
 import os
+import time
 import hashlib
+import threading
 from datetime import datetime, timedelta
 import logging
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Temp files older than this were left behind by a crashed writer
+STALE_TEMP_SECONDS = 3600
+
+def _remove_quietly(path, expected_inode=None):
+    """Remove a file another thread or worker may already have removed or replaced"""
+    try:
+        if expected_inode is not None and os.stat(path).st_ino != expected_inode:
+            return False  # replaced by a fresh write since we read it
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
 class SimpleCache:
+    """File-backed JSON cache shared by all threads and gunicorn workers.
+    
+    Writes go to a temp file that is atomically renamed into place, so readers
+    in any thread or process see either the old entry or the new one, never a
+    partial file.
+    """
+
     def __init__(self, cache_dir="cache", default_expiry_hours=1):
         self.cache_dir = cache_dir
         self.default_expiry_hours = default_expiry_hours
         
-        # Create cache directory if it doesn't exist
-        if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir)
+        # Create cache directory if it doesn't exist (workers may race to create it)
+        os.makedirs(cache_dir, exist_ok=True)
     
     def _get_cache_key(self, key_data):
         """Generate a hash-based cache key"""
@@ -44,8 +70,10 @@ class SimpleCache:
                 'created': datetime.now().isoformat()
             }
             
-            with open(cache_file, 'w') as f:
-                json.dump(cache_data, f, indent=2)
+            tmp_file = f"{cache_file}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(cache_data, f, separators=(',', ':'))
+            os.replace(tmp_file, cache_file)
             
             logger.debug(f"Cached data with key {cache_key}")
             return True
@@ -56,27 +84,34 @@ class SimpleCache:
     
     def get(self, key_data):
         """Retrieve a value from cache if not expired"""
+        entry = self.get_entry(key_data)
+        return entry['value'] if entry else None
+
+    def get_entry(self, key_data):
+        """Retrieve the full cache entry (value, key, created, expiry) if not expired"""
         try:
             cache_key = self._get_cache_key(key_data)
             cache_file = self._get_cache_file_path(cache_key)
-            
-            if not os.path.exists(cache_file):
+
+            try:
+                with open(cache_file, 'r') as f:
+                    inode = os.fstat(f.fileno()).st_ino
+                    cache_data = json.load(f)
+            except FileNotFoundError:
                 return None
-            
-            with open(cache_file, 'r') as f:
-                cache_data = json.load(f)
-            
+
             # Check if cache has expired
             expiry_time = datetime.fromisoformat(cache_data['expiry'])
             if datetime.now() > expiry_time:
-                # Clean up expired cache
-                os.remove(cache_file)
+                # Clean up expired cache (unless another request just refreshed it)
+                _remove_quietly(cache_file, inode)
                 logger.debug(f"Cache expired for key {cache_key}")
                 return None
-            
+
             logger.debug(f"Cache hit for key {cache_key}")
-            return cache_data['value']
-            
+            cache_data['key'] = cache_key
+            return cache_data
+
         except Exception as e:
             logger.error(f"Error getting cache: {str(e)}")
             return None
@@ -87,8 +122,7 @@ class SimpleCache:
             cache_key = self._get_cache_key(key_data)
             cache_file = self._get_cache_file_path(cache_key)
             
-            if os.path.exists(cache_file):
-                os.remove(cache_file)
+            if _remove_quietly(cache_file):
                 logger.debug(f"Invalidated cache for key {cache_key}")
                 return True
             
@@ -108,17 +142,27 @@ class SimpleCache:
                     
                     try:
                         with open(cache_file, 'r') as f:
+                            inode = os.fstat(f.fileno()).st_ino
                             cache_data = json.load(f)
                         
                         expiry_time = datetime.fromisoformat(cache_data['expiry'])
-                        if datetime.now() > expiry_time:
-                            os.remove(cache_file)
+                        if datetime.now() > expiry_time and _remove_quietly(cache_file, inode):
                             cleared_count += 1
                     
+                    except FileNotFoundError:
+                        continue
                     except Exception:
                         # If we can't read the cache file, remove it
-                        os.remove(cache_file)
-                        cleared_count += 1
+                        if _remove_quietly(cache_file):
+                            cleared_count += 1
+                
+                elif filename.endswith('.tmp'):
+                    tmp_file = os.path.join(self.cache_dir, filename)
+                    try:
+                        if time.time() - os.path.getmtime(tmp_file) > STALE_TEMP_SECONDS:
+                            _remove_quietly(tmp_file)
+                    except FileNotFoundError:
+                        continue
             
             logger.info(f"Cleared {cleared_count} expired cache entries")
             return cleared_count
@@ -127,6 +171,48 @@ class SimpleCache:
             logger.error(f"Error clearing expired cache: {str(e)}")
             return 0
     
+    def increment_counter(self, name, member, amount=1):
+        """Increment a named counter for one member (e.g. requests per ticker).
+        
+        Counters live in a single JSON file guarded by an exclusive file lock, so
+        all gunicorn workers sharing the cache directory see the same totals.
+        """
+        try:
+            counter_file = os.path.join(self.cache_dir, f"{name}.counter")
+            with open(counter_file, 'a+') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                content = f.read()
+                counts = json.loads(content) if content else {}
+                counts[member] = counts.get(member, 0) + amount
+                f.seek(0)
+                f.truncate()
+                json.dump(counts, f)
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error incrementing counter {name}: {str(e)}")
+            return False
+    
+    def top_counters(self, name, limit=10):
+        """Return the `limit` highest (member, count) pairs of a named counter"""
+        try:
+            counter_file = os.path.join(self.cache_dir, f"{name}.counter")
+            if not os.path.exists(counter_file):
+                return []
+            with open(counter_file, 'r') as f:
+                # Shared lock: increment_counter truncates and rewrites the file under LOCK_EX
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                content = f.read()
+            counts = json.loads(content) if content else {}
+            return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+        
+        except Exception as e:
+            logger.error(f"Error reading counter {name}: {str(e)}")
+            return []
+    
     def get_cache_stats(self):
         """Get statistics about the cache"""
         try:
@@ -137,10 +223,10 @@ class SimpleCache:
             for filename in os.listdir(self.cache_dir):
                 if filename.endswith('.json'):
                     cache_file = os.path.join(self.cache_dir, filename)
-                    total_files += 1
-                    total_size += os.path.getsize(cache_file)
                     
                     try:
+                        total_size += os.path.getsize(cache_file)
+                        total_files += 1
                         with open(cache_file, 'r') as f:
                             cache_data = json.load(f)
                         
@@ -148,6 +234,8 @@ class SimpleCache:
                         if datetime.now() > expiry_time:
                             expired_files += 1
                     
+                    except FileNotFoundError:
+                        continue
                     except Exception:
                         expired_files += 1
             
@@ -155,7 +243,8 @@ class SimpleCache:
                 'total_files': total_files,
                 'expired_files': expired_files,
                 'active_files': total_files - expired_files,
-                'total_size_mb': round(total_size / (1024 * 1024), 2)
+                'total_size_mb': round(total_size / (1024 * 1024), 2),
+                'top_tickers': self.top_counters('ticker_requests', limit=10)
             }
             
         except Exception as e:
@@ -0,0 +1,195 @@
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (16, 0)
+
+
+def market_open(now=None):
+    """True during the regular session, and for a quarter hour after it so closing prices are picked up"""
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= (now.hour, now.minute) < (MARKET_CLOSE[0], MARKET_CLOSE[1] + 15)
+
+
+def next_market_event(now):
+    """Next weekday market open or close after `now` (an aware datetime)"""
+    local = now.astimezone(MARKET_TZ)
+    for day_offset in range(8):
+        day = local + timedelta(days=day_offset)
+        if day.weekday() >= 5:
+            continue
+        for hour, minute in (MARKET_OPEN, MARKET_CLOSE):
+            event = day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if event > local:
+                return event
+    return None
+
+
+class RateLimiter:
+    """Global rate limit: at most `per_minute` acquisitions per minute, evenly spaced"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, stop_event):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        wait = slot - time.monotonic()
+        if wait > 0:
+            stop_event.wait(wait)
+        return not stop_event.is_set()
+
+
+class CacheWarmer:
+    """Pre-computes analyses for popular tickers before users ask for them.
+
+    Runs at market open, market close and every `interval_minutes` in between;
+    prices don't move outside the session, so re-running then would only churn
+    ETags and history rows. Only the
+    process holding the lock file runs the schedule, so a single warmer is
+    active across all gunicorn workers; the others keep retrying the lock and
+    take over if the leader exits.
+    """
+
+    def __init__(self, warm_fn, base_tickers, top_tickers_fn=None, lock_path='cache/warmer.lock',
+                 interval_minutes=None, concurrency=None, max_per_minute=None, extra_tickers=None):
+        self.warm_fn = warm_fn
+        self.base_tickers = list(base_tickers)
+        self.top_tickers_fn = top_tickers_fn
+        self.lock_path = lock_path
+        self.interval = timedelta(minutes=interval_minutes or float(os.getenv('WARMER_INTERVAL_MINUTES', 30)))
+        self.concurrency = concurrency or int(os.getenv('WARMER_CONCURRENCY', 2))
+        self.rate_limiter = RateLimiter(max_per_minute or float(os.getenv('WARMER_MAX_PER_MINUTE', 10)))
+        self.extra_tickers = extra_tickers if extra_tickers is not None else int(os.getenv('WARMER_TOP_TICKERS', 10))
+
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.lock_file = None
+        self.last_run = None
+        self.last_results = {}
+
+    def tickers(self):
+        """Configured ticker set plus the most requested tickers, without duplicates"""
+        tickers = list(self.base_tickers)
+        if self.top_tickers_fn and self.extra_tickers:
+            try:
+                tickers.extend(ticker for ticker, _ in self.top_tickers_fn(self.extra_tickers))
+            except Exception as e:
+                logger.error(f"Could not read most-requested tickers: {str(e)}")
+        return list(dict.fromkeys(tickers))
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self._release_lock()
+
+    def status(self):
+        return {
+            'leader': self.lock_file is not None,
+            'last_run': self.last_run,
+            'last_results': self.last_results
+        }
+
+    def _acquire_lock(self):
+        if self.lock_file is not None:
+            return True
+        if fcntl is None:
+            logger.warning("fcntl unavailable - cache warmer cannot elect a single leader, not running")
+            return False
+        lock_dir = os.path.dirname(self.lock_path)
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        logger.info(f"Cache warmer leader elected (pid {os.getpid()})")
+        return True
+
+    def _release_lock(self):
+        if self.lock_file is not None:
+            try:
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+                self.lock_file.close()
+            finally:
+                self.lock_file = None
+
+    def _run(self):
+        next_interval_run = datetime.now(MARKET_TZ)
+        while not self.stop_event.is_set():
+            if not self._acquire_lock():
+                # Another worker is the leader; check again later in case it exits
+                self.stop_event.wait(60)
+                continue
+
+            if market_open() and datetime.now(MARKET_TZ) >= next_interval_run:
+                self.warm_all()
+                next_interval_run = datetime.now(MARKET_TZ) + self.interval
+
+            market_event = next_market_event(datetime.now(MARKET_TZ))
+            if not market_open():
+                # Sleep through the closed market until the next open
+                next_run = market_event or datetime.now(MARKET_TZ) + self.interval
+            else:
+                next_run = min(next_interval_run, market_event) if market_event else next_interval_run
+            wait = (next_run - datetime.now(MARKET_TZ)).total_seconds()
+            if wait > 0 and self.stop_event.wait(wait):
+                break
+            if market_event and next_run == market_event:
+                # Market opened or closed - refresh now and restart the interval
+                next_interval_run = datetime.now(MARKET_TZ)
+
+        self._release_lock()
+
+    def warm_all(self):
+        """Refresh every ticker with bounded concurrency and the global rate limit"""
+        tickers = self.tickers()
+        logger.info(f"Cache warmer refreshing {len(tickers)} tickers")
+        started = time.monotonic()
+        results = {}
+
+        def warm(ticker):
+            if not self.rate_limiter.acquire(self.stop_event):
+                return
+            try:
+                results[ticker] = 'ok' if self.warm_fn(ticker) else 'failed'
+            except Exception as e:
+                logger.error(f"Cache warmer failed for {ticker}: {str(e)}")
+                results[ticker] = 'error'
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='cache-warm') as executor:
+            list(executor.map(warm, tickers))
+
+        self.last_run = datetime.now().isoformat()
+        self.last_results = results
+        logger.info(f"Cache warmer finished {len(results)} tickers in {time.monotonic() - started:.1f}s")
+        return results
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Breaker and rate limiter state is shared by all gunicorn workers through this directory
+UPSTREAM_STATE_DIR = os.getenv('UPSTREAM_STATE_DIR', os.path.join('cache', 'upstreams'))
+
+# Consecutive failures that open a circuit, and how long it stays open before a probe
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', 30))
+
+# Longest a call waits for a rate limiter token before falling back
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv('RATE_LIMIT_MAX_WAIT_SECONDS', 1.0))
+
+# Default requests per second and burst size per upstream (RATE_LIMIT_<NAME>=0 disables limiting)
+DEFAULT_RATE_LIMITS = {
+    'yfinance': (5.0, 10),
+    'newsapi': (1.0, 5),
+    'lambda': (5.0, 10),
+    'anthropic': (2.0, 5)
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# HTTP statuses that mean "slow down" rather than "broken"
+THROTTLE_STATUSES = (429, 503, 529)
+
+
+def status_code_of(error):
+    """HTTP status carried by a requests / anthropic exception, if any"""
+    status = getattr(error, 'status_code', None)
+    response = getattr(error, 'response', None)
+    if status is None and response is not None:
+        status = getattr(response, 'status_code', None)
+    return status
+
+
+def is_throttled(error=None, status=None):
+    """True for 429/503/529 responses and rate-limit exceptions (e.g. yfinance's YFRateLimitError)"""
+    if status is None and error is not None:
+        status = status_code_of(error)
+    if status in THROTTLE_STATUSES:
+        return True
+    return error is not None and ('RateLimit' in type(error).__name__ or 'Too Many Requests' in str(error))
+
+
+class UpstreamGuard:
+    """Circuit breaker plus adaptive token-bucket rate limiter for one upstream.
+
+    State lives in a small JSON file under an exclusive file lock so every
+    gunicorn worker sees the same breaker state and shares one token bucket.
+    After BREAKER_FAILURE_THRESHOLD consecutive failures the circuit opens and
+    calls fast-fail to the caller's fallback; after BREAKER_RESET_SECONDS a
+    single probe is let through (half-open) and its outcome closes or reopens
+    the circuit. Throttling responses halve the refill rate, successes slowly
+    restore it (AIMD).
+    """
+
+    def __init__(self, name, state_dir=None, rate=None, burst=None,
+                 failure_threshold=None, reset_seconds=None):
+        default_rate, default_burst = DEFAULT_RATE_LIMITS.get(name, (0.0, 1))
+        self.name = name
+        self.state_file = os.path.abspath(os.path.join(state_dir or UPSTREAM_STATE_DIR, f"{name}.breaker"))
+        self.max_rate = rate if rate is not None else float(os.getenv(f'RATE_LIMIT_{name.upper()}', default_rate))
+        self.burst = burst or int(os.getenv(f'RATE_LIMIT_{name.upper()}_BURST', default_burst))
+        self.min_rate = self.max_rate / 16
+        self.failure_threshold = failure_threshold or BREAKER_FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds or BREAKER_RESET_SECONDS
+        self._local_lock = threading.Lock()
+
+    def _initial_state(self):
+        return {
+            'state': CLOSED,
+            'failures': 0,
+            'opened_at': None,
+            'probe_started': None,
+            'rate': self.max_rate,
+            'tokens': float(self.burst),
+            'updated': time.time()
+        }
+
+    def _update(self, fn):
+        """Apply fn(state) -> result under the cross-process lock and persist the state"""
+        with self._local_lock:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            with open(self.state_file, 'a+') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                content = f.read()
+                try:
+                    state = json.loads(content) if content else self._initial_state()
+                except ValueError:
+                    state = self._initial_state()
+                result = fn(state)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                return result
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state['updated'])
+        state['tokens'] = min(float(self.burst), state['tokens'] + elapsed * state['rate'])
+        state['updated'] = now
+
+    def _try_acquire(self, state):
+        """Returns (allowed, seconds_until_token); None wait means fast-fail"""
+        now = time.time()
+        if state['state'] == OPEN:
+            if now - state['opened_at'] < self.reset_seconds:
+                return False, None
+            state['state'] = HALF_OPEN
+            state['probe_started'] = None
+        if state['state'] == HALF_OPEN:
+            # One probe at a time; a probe that never reported back is retried after reset_seconds
+            if state['probe_started'] and now - state['probe_started'] < self.reset_seconds:
+                return False, None
+            state['probe_started'] = now
+            return True, 0
+
+        if self.max_rate <= 0:
+            return True, 0
+        self._refill(state, now)
+        if state['tokens'] >= 1:
+            state['tokens'] -= 1
+            return True, 0
+        return False, (1 - state['tokens']) / state['rate']
+
+    def allow(self, max_wait=None):
+        """True if a call may go upstream now; waits up to max_wait seconds for a rate limiter token"""
+        max_wait = RATE_LIMIT_MAX_WAIT_SECONDS if max_wait is None else max_wait
+        give_up_at = time.monotonic() + max_wait
+        try:
+            while True:
+                allowed, wait = self._update(self._try_acquire)
+                if allowed:
+                    return True
+                if wait is None:
+                    logger.warning(f"{self.name} circuit open, using fallback")
+                    return False
+                if time.monotonic() + wait > give_up_at:
+                    logger.warning(f"{self.name} rate limit reached, using fallback")
+                    return False
+                time.sleep(wait)
+        except Exception as e:
+            # A broken state file must never take the upstream down with it
+            logger.error(f"Error checking {self.name} circuit breaker: {str(e)}")
+            return True
+
+    def available(self):
+        """True unless the circuit is open (does not consume a token)"""
+        state = self.status()
+        return not (state['state'] == OPEN and time.time() - state['opened_at'] < self.reset_seconds)
+
+    def record_success(self):
+        def apply(state):
+            if state['state'] != CLOSED:
+                logger.info(f"{self.name} circuit closed")
+            state.update(state=CLOSED, failures=0, opened_at=None, probe_started=None)
+            # Additive increase back towards the configured rate
+            state['rate'] = min(self.max_rate, state['rate'] + self.max_rate / 10)
+        self._safe_update(apply)
+
+    def record_failure(self, throttled=False):
+        def apply(state):
+            state['failures'] += 1
+            if throttled and self.max_rate > 0:
+                # Multiplicative decrease while the upstream asks us to slow down
+                state['rate'] = max(self.min_rate, state['rate'] / 2)
+                state['tokens'] = min(state['tokens'], 0.0)
+            if state['state'] == HALF_OPEN or state['failures'] >= self.failure_threshold:
+                if state['state'] != OPEN:
+                    logger.warning(f"{self.name} circuit opened after {state['failures']} consecutive failures")
+                state.update(state=OPEN, opened_at=time.time(), probe_started=None)
+        self._safe_update(apply)
+
+    def record_error(self, error):
+        self.record_failure(throttled=is_throttled(error))
+
+    def record_status(self, status):
+        """Record the outcome of an HTTP response by status code"""
+        if status in THROTTLE_STATUSES or status >= 500:
+            self.record_failure(throttled=is_throttled(status=status))
+        else:
+            self.record_success()
+
+    def _safe_update(self, fn):
+        try:
+            self._update(fn)
+        except Exception as e:
+            logger.error(f"Error updating {self.name} circuit breaker: {str(e)}")
+
+    def status(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                # Shared lock: _update truncates and rewrites the file under LOCK_EX
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                content = f.read()
+            state = json.loads(content) if content else self._initial_state()
+        except (OSError, ValueError):
+            state = self._initial_state()
+        return {
+            'state': state['state'],
+            'failures': state['failures'],
+            'opened_at': state['opened_at'],
+            'rate_per_second': round(state['rate'], 3),
+            'max_rate_per_second': self.max_rate
+        }
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def upstream_guard(name):
+    """Process-wide guard for an upstream (state itself is shared across processes)"""
+    guard = _guards.get(name)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.setdefault(name, UpstreamGuard(name))
+    return guard
+
+
+def upstream_status():
+    """Breaker and rate limiter state of every known upstream, for /health"""
+    return {name: upstream_guard(name).status() for name in DEFAULT_RATE_LIMITS}
@@ -0,0 +1,81 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# End-to-end latency target for a cold /analyze request
+ANALYSIS_SLO_SECONDS = float(os.getenv('ANALYSIS_SLO_SECONDS', 25))
+
+# Calls for libraries without a timeout parameter (yfinance) run here so we can stop waiting
+_blocking_executor = ThreadPoolExecutor(max_workers=int(os.getenv('DEADLINE_EXECUTOR_WORKERS', 8)),
+                                        thread_name_prefix='deadline-call')
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage has no time left in the request budget"""
+
+
+class UpstreamTimeout(DeadlineExceeded):
+    """Raised when an upstream call was started but did not return within the budget"""
+
+
+class Deadline:
+    """Per-request time budget passed down the analysis pipeline.
+
+    Each stage asks for `timeout(cap)` - the smaller of its own cap and what is
+    left of the request budget - and degrades instead of calling upstream when
+    less than `minimum` seconds remain.
+    """
+
+    def __init__(self, seconds=None):
+        self.budget = seconds if seconds is not None else ANALYSIS_SLO_SECONDS
+        self.expires_at = time.monotonic() + self.budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap=None, minimum=0.5):
+        """Timeout for the next upstream call, or DeadlineExceeded if not enough budget is left"""
+        remaining = self.remaining()
+        if remaining < minimum:
+            raise DeadlineExceeded(f"{remaining:.2f}s left, stage needs at least {minimum:.2f}s")
+        return min(cap, remaining) if cap is not None else remaining
+
+    def reserve(self, seconds):
+        """Earlier deadline for the stages before one that needs `seconds` of the budget"""
+        child = Deadline(0)
+        child.budget = max(0.0, self.budget - seconds)
+        child.expires_at = self.expires_at - seconds
+        return child
+
+
+def timeout_for(deadline, cap, minimum=0.5):
+    """Upstream timeout for an optional deadline; falls back to the stage's own cap"""
+    return deadline.timeout(cap, minimum) if deadline is not None else cap
+
+
+def out_of_time(deadline, minimum=0.5):
+    """True when an optional deadline has less than `minimum` seconds left"""
+    return deadline is not None and deadline.remaining() < minimum
+
+
+def call_with_deadline(deadline, fn, *args, cap=None, minimum=0.5, **kwargs):
+    """Run a blocking call that has no timeout parameter, giving up when the budget runs out.
+
+    The abandoned call keeps running on the executor thread until it returns,
+    but the request no longer waits for it.
+    """
+    if deadline is None:
+        return fn(*args, **kwargs)
+    timeout = deadline.timeout(cap, minimum)
+    future = _blocking_executor.submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        raise UpstreamTimeout(f"{getattr(fn, '__name__', 'call')} did not finish within {timeout:.2f}s")
@@ -0,0 +1,453 @@
+import os
+import math
+import time
+import json
+import logging
+import operator
+import threading
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from .lazy_import import LazyModule
+from .cache_warmer import RateLimiter, MARKET_TZ
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+np = LazyModule('numpy')
+
+# Numeric fundamentals kept per ticker (dividend_yield as reported by yfinance, in percent)
+NUMERIC_FIELDS = [
+    'market_cap', 'pe_ratio', 'forward_pe', 'price_to_book', 'dividend_yield', 'current_price',
+    'target_high_price', 'target_low_price', 'target_mean_price'
+]
+TEXT_FIELDS = ['name', 'sector', 'industry', 'recommendation']
+
+# Computed when a snapshot is loaded, so they can be filtered and sorted on like stored fields
+DERIVED_FIELDS = ['upside_pct', 'earnings_yield_pct']
+
+SCREEN_FIELDS = NUMERIC_FIELDS + DERIVED_FIELDS
+
+OPERATORS = {
+    'lt': operator.lt,
+    'lte': operator.le,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'eq': operator.eq,
+    'ne': operator.ne
+}
+
+# A ticker is only rewritten when a value changes at this many significant digits
+FUNDAMENTALS_CHANGE_DIGITS = int(os.getenv('FUNDAMENTALS_CHANGE_DIGITS', 4))
+
+# Buffered rows are written once there are this many, or by a timer once the oldest is this old
+FLUSH_ROWS = 100
+FLUSH_SECONDS = 60
+
+# Daily files older than this are folded into one base snapshot
+FUNDAMENTALS_HISTORY_DAYS = int(os.getenv('FUNDAMENTALS_HISTORY_DAYS', 90))
+
+
+def _comparable(value):
+    """Value rounded for change detection; NaN for missing numbers"""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return float(f"{value:.{FUNDAMENTALS_CHANGE_DIGITS}g}") if isinstance(value, float) else value
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+    return value if math.isfinite(value) else float('nan')
+
+
+def parse_screen_query(args):
+    """Turn query parameters like pe_ratio.lt=15 and sector=Technology,Energy into screen() arguments.
+
+    Raises ValueError with a user-facing message for unknown fields, operators or values.
+    """
+    predicates, text_filters = [], {}
+    sort, descending, limit, as_of = None, False, 50, None
+    for key, value in args.items():
+        if key == 'sort':
+            descending = value.startswith('-')
+            sort = value.lstrip('-+')
+            if sort not in SCREEN_FIELDS:
+                raise ValueError(f"Cannot sort by {sort}. Use one of: {', '.join(SCREEN_FIELDS)}")
+        elif key == 'limit':
+            if not value.isdigit():
+                raise ValueError('limit must be a positive integer')
+            limit = min(max(int(value), 1), 500)
+        elif key == 'as_of':
+            as_of = datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+        elif key in TEXT_FIELDS:
+            text_filters[key] = [part.strip().lower() for part in value.split(',') if part.strip()]
+        else:
+            field, _, op = key.partition('.')
+            if field not in SCREEN_FIELDS:
+                raise ValueError(f"Unknown field: {field}. Use one of: {', '.join(SCREEN_FIELDS + TEXT_FIELDS)}")
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator for {field}: {op or '(none)'}. Use one of: {', '.join(OPERATORS)}")
+            try:
+                predicates.append((field, op, float(value)))
+            except ValueError:
+                raise ValueError(f"{key} must be a number")
+    return {'predicates': predicates, 'text_filters': text_filters, 'sort': sort,
+            'descending': descending, 'limit': limit, 'as_of': as_of}
+
+
+class FundamentalsStore:
+    """Daily columnar snapshots of company fundamentals with change detection.
+
+    Each day has one .npz file holding, column by column, only the tickers whose
+    fundamentals changed that day. The snapshot as of any date is the latest
+    row per ticker across the files up to that date, merged with NumPy, and is
+    kept in memory until a file changes. Writes are buffered and merged into
+    today's file under a file lock, so every gunicorn worker can record; the
+    buffer is flushed by a timer, so rows never wait for the next record().
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = os.path.abspath(store_dir)
+        self.lock = threading.Lock()
+        self.pending = {}  # date -> {symbol: row}
+        self.flush_timer = None
+        self.files = {}   # file name -> (mtime, columns)
+        self.views = {}   # as_of -> (signature, view)
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    # Writing
+
+    def record(self, company_data, as_of=None):
+        """Buffer a get_company_info result; returns True if it differs from the stored row"""
+        as_of = as_of or datetime.now(MARKET_TZ).strftime('%Y-%m-%d')
+        symbol = str(company_data.get('symbol') or '').upper()
+        if not symbol:
+            return False
+        row = {'symbol': symbol}
+        row.update({field: _number(company_data.get(field)) for field in NUMERIC_FIELDS})
+        row.update({field: str(company_data.get(field) or 'N/A') for field in TEXT_FIELDS})
+
+        try:
+            if not self._changed(row, as_of):
+                return False
+        except Exception as e:
+            # A damaged snapshot must not break the analysis that is recording into it
+            logger.error(f"Error checking stored fundamentals for {symbol}: {str(e)}")
+            return False
+        with self.lock:
+            self.pending.setdefault(as_of, {})[symbol] = row
+            # A timer inherited across fork never runs in the child, hence is_alive
+            if self.flush_timer is None or not self.flush_timer.is_alive():
+                self.flush_timer = threading.Timer(FLUSH_SECONDS, self.flush)
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+            due = sum(len(rows) for rows in self.pending.values()) >= FLUSH_ROWS
+        if due:
+            self.flush()
+        return True
+
+    def _changed(self, row, as_of):
+        with self.lock:
+            previous = self.pending.get(as_of, {}).get(row['symbol'])
+        if previous is None:
+            view = self.view(as_of)
+            i = self._position(view, row['symbol'])
+            if i is None:
+                return True
+            previous = {field: view[field][i].item() for field in NUMERIC_FIELDS + TEXT_FIELDS}
+        return any(_comparable(row[field]) != _comparable(previous[field])
+                   for field in NUMERIC_FIELDS + TEXT_FIELDS)
+
+    def flush(self):
+        """Merge buffered rows into their days' files; returns the number of rows written"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            timer, self.flush_timer = self.flush_timer, None
+        if timer is not None:
+            timer.cancel()
+        return sum(self._merge(list(rows.values()), as_of) for as_of, rows in sorted(pending.items()))
+
+    def _merge(self, rows, as_of):
+        path = os.path.join(self.store_dir, f"{as_of}.npz")
+        try:
+            with open(os.path.join(self.store_dir, '.lock'), 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                existing = self._read(path) if os.path.exists(path) else None
+                new = self._columns(rows, as_of)
+                if existing is not None:
+                    keep = ~np.isin(existing['symbol'], new['symbol'])
+                    new = {name: np.concatenate([existing[name][keep], new[name]]) for name in new}
+                self._write(path, new)
+            logger.info(f"Stored fundamentals for {len(rows)} changed tickers in {as_of}.npz")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error storing fundamentals snapshot: {str(e)}")
+            return 0
+
+    @staticmethod
+    def _columns(rows, as_of):
+        columns = {'symbol': np.array([row['symbol'] for row in rows], dtype=str),
+                   'as_of': np.array([as_of] * len(rows), dtype=str)}
+        for field in NUMERIC_FIELDS:
+            columns[field] = np.array([row[field] for row in rows], dtype=float)
+        for field in TEXT_FIELDS:
+            columns[field] = np.array([row[field] for row in rows], dtype=str)
+        return columns
+
+    @staticmethod
+    def _read(path):
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    @staticmethod
+    def _write(path, columns):
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, **columns)
+        os.replace(tmp_path, path)
+
+    # Reading
+
+    def _snapshot_files(self, as_of=None):
+        names = sorted(name for name in os.listdir(self.store_dir)
+                       if name.endswith('.npz') and '.tmp' not in name and (as_of is None or name[:10] <= as_of))
+        return [(name, os.path.getmtime(os.path.join(self.store_dir, name))) for name in names]
+
+    def view(self, as_of=None):
+        """Latest row per ticker as of a date: {column: array}, sorted by symbol"""
+        signature = tuple(self._snapshot_files(as_of))
+        cached = self.views.get(as_of)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        parts = []
+        for name, mtime in signature:
+            loaded = self.files.get(name)
+            if loaded is None or loaded[0] != mtime:
+                loaded = (mtime, self._read(os.path.join(self.store_dir, name)))
+                self.files[name] = loaded
+            parts.append(loaded[1])
+
+        if parts:
+            columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[-1]}
+            # Files are in date order, so the last occurrence of a symbol is its latest row
+            reversed_symbols = columns['symbol'][::-1]
+            _, first = np.unique(reversed_symbols, return_index=True)
+            latest = len(reversed_symbols) - 1 - first
+            view = {name: column[latest] for name, column in columns.items()}
+        else:
+            view = self._columns([], as_of)
+        view['_date'] = signature[-1][0][:10] if signature else None
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            view['upside_pct'] = (view['target_mean_price'] / view['current_price'] - 1) * 100
+            view['earnings_yield_pct'] = np.where(view['pe_ratio'] > 0, 100 / view['pe_ratio'], np.nan)
+        for field in TEXT_FIELDS:
+            view[f'_{field}_lower'] = np.char.lower(view[field].astype(str))
+
+        with self.lock:
+            self.views[as_of] = (signature, view)
+            while len(self.views) > 4:
+                self.views.pop(next(iter(self.views)))
+        return view
+
+    @staticmethod
+    def _position(view, symbol):
+        i = int(np.searchsorted(view['symbol'], symbol))
+        return i if i < len(view['symbol']) and view['symbol'][i] == symbol else None
+
+    def lookup(self, symbol, as_of=None):
+        """Stored fundamentals of one ticker, or None"""
+        view = self.view(as_of)
+        i = self._position(view, symbol.upper())
+        return self._row(view, i) if i is not None else None
+
+    @staticmethod
+    def _row(view, i):
+        row = {'symbol': str(view['symbol'][i]), 'as_of': str(view['as_of'][i])}
+        for field in SCREEN_FIELDS:
+            value = float(view[field][i])
+            row[field] = round(value, 4) if math.isfinite(value) else None
+        row.update({field: str(view[field][i]) for field in TEXT_FIELDS})
+        return row
+
+    def screen(self, predicates=(), text_filters=None, sort=None, descending=False, limit=50, as_of=None):
+        """Filter and rank the snapshot with vectorized predicates.
+
+        `predicates` are (field, operator name, number) triples that must all
+        hold; tickers missing a filtered value never match. `text_filters` maps
+        a text field to accepted lower-case values. Missing sort values go last.
+        """
+        started = time.perf_counter()
+        view = self.view(as_of)
+        mask = np.ones(len(view['symbol']), dtype=bool)
+        for field, op, value in predicates:
+            column = view[field]
+            with np.errstate(invalid='ignore'):
+                mask &= ~np.isnan(column) & OPERATORS[op](column, value)
+        for field, values in (text_filters or {}).items():
+            mask &= np.isin(view[f'_{field}_lower'], values)
+
+        matches = np.flatnonzero(mask)
+        if sort:
+            keys = view[sort][matches]
+            order = np.argsort(-keys if descending else keys, kind='stable')  # NaN sorts last either way
+            matches = matches[order]
+
+        return {
+            'as_of': view['_date'],
+            'universe': int(len(view['symbol'])),
+            'matched': int(len(matches)),
+            'results': [self._row(view, i) for i in matches[:limit]],
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def signature(self, as_of=None):
+        """Identifies the stored snapshot files, for ETags"""
+        return tuple(self._snapshot_files(as_of))
+
+    # Maintenance
+
+    def compact(self, keep_days=None):
+        """Fold daily files older than keep_days into one base file carrying the latest row per ticker"""
+        keep_days = keep_days or FUNDAMENTALS_HISTORY_DAYS
+        cutoff = (datetime.now(MARKET_TZ) - timedelta(days=keep_days)).strftime('%Y-%m-%d')
+        old = [name for name, _ in self._snapshot_files() if name[:10] < cutoff]
+        if len(old) < 2:
+            return 0
+        with open(os.path.join(self.store_dir, '.lock'), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            base = {name: column for name, column in self.view(old[-1][:10]).items()
+                    if name in ['symbol', 'as_of'] + NUMERIC_FIELDS + TEXT_FIELDS}
+            self._write(os.path.join(self.store_dir, old[-1]), base)
+            for name in old[:-1]:
+                os.remove(os.path.join(self.store_dir, name))
+                self.files.pop(name, None)
+        logger.info(f"Compacted {len(old)} fundamentals snapshots into {old[-1]}")
+        return len(old)
+
+    def status(self):
+        files = self._snapshot_files()
+        return {
+            'snapshots': len(files),
+            'latest': files[-1][0][:10] if files else None,
+            'tickers': int(len(self.view()['symbol'])) if files else 0,
+            'pending': sum(len(rows) for rows in self.pending.values())
+        }
+
+
+class FundamentalsSnapshotter:
+    """Records fundamentals for a whole ticker universe once per trading day.
+
+    Like the cache warmer, only the process holding the lock file runs, so the
+    universe is fetched once across all gunicorn workers. Progress is saved
+    after every batch, so a restarted worker resumes where the last one
+    stopped. Requests are paced by max_per_minute, leaving yfinance's shared
+    rate limit to user traffic.
+    """
+
+    def __init__(self, store, fetch_fn, tickers_fn, lock_path, snapshot_hour=None, max_per_minute=None):
+        self.store = store
+        self.fetch_fn = fetch_fn
+        self.tickers_fn = tickers_fn
+        self.lock_path = lock_path
+        self.snapshot_hour = snapshot_hour if snapshot_hour is not None else int(os.getenv('FUNDAMENTALS_SNAPSHOT_HOUR', 17))
+        self.rate_limiter = RateLimiter(max_per_minute or float(os.getenv('FUNDAMENTALS_MAX_PER_MINUTE', 120)))
+        self.progress_path = os.path.join(store.store_dir, 'progress.json')
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.lock_file = None
+        self.last_run = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='fundamentals-snapshotter', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _acquire_lock(self):
+        if self.lock_file is not None:
+            return True
+        if fcntl is None:
+            return False
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def _snapshot_date(self):
+        """Today after snapshot_hour on trading days (or at once for an empty store), else None"""
+        now = datetime.now(MARKET_TZ)
+        if (now.weekday() < 5 and now.hour >= self.snapshot_hour) or not self.store.signature():
+            return now.strftime('%Y-%m-%d')
+        return None
+
+    def _load_progress(self):
+        try:
+            with open(self.progress_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_progress(self, progress):
+        tmp_path = f"{self.progress_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, self.progress_path)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            if self._acquire_lock():
+                try:
+                    self.snapshot()
+                    self.store.compact()
+                except Exception as e:
+                    logger.error(f"Fundamentals snapshot failed: {str(e)}")
+            self.stop_event.wait(600)
+
+    def snapshot(self):
+        """Fetch the rest of today's universe; returns the number of changed tickers"""
+        date = self._snapshot_date()
+        if date is None:
+            return 0
+        progress = self._load_progress()
+        position = progress.get('position', 0) if progress.get('date') == date else 0
+        tickers = self.tickers_fn()
+        if position >= len(tickers):
+            return 0
+
+        logger.info(f"Fundamentals snapshot {date}: {len(tickers) - position} tickers left")
+        changed = 0
+        for i in range(position, len(tickers)):
+            if not self.rate_limiter.acquire(self.stop_event):
+                break
+            company_data = self.fetch_fn(tickers[i])
+            if company_data:
+                changed += self.store.record(company_data, as_of=date)
+            if (i + 1) % FLUSH_ROWS == 0 or i + 1 == len(tickers):
+                self.store.flush()
+                self._save_progress({'date': date, 'position': i + 1})
+        self.store.flush()
+        self.last_run = datetime.now().isoformat()
+        return changed
+
+    def status(self):
+        return {'leader': self.lock_file is not None, 'last_run': self.last_run, **self._load_progress()}
@@ -0,0 +1,204 @@
+import os
+import re
+import zlib
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS recommendations (
+        id INTEGER PRIMARY KEY,
+        ticker TEXT NOT NULL,
+        date TEXT NOT NULL,
+        generated_at TEXT NOT NULL,
+        recommendation TEXT NOT NULL,
+        confidence REAL,
+        price_target REAL,
+        reference_price REAL,
+        source TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS recommendations_ticker_date ON recommendations (ticker, date)",
+    "CREATE INDEX IF NOT EXISTS recommendations_date ON recommendations (date)",
+    # Full stored result of each analysis, sharing the id of its recommendations row
+    """CREATE TABLE IF NOT EXISTS analyses (
+        id INTEGER PRIMARY KEY,
+        ticker TEXT NOT NULL,
+        generated_at TEXT NOT NULL,
+        payload BLOB NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS analyses_ticker_id ON analyses (ticker, id)"
+]
+
+# History rows returned per page by /history/<ticker>
+HISTORY_PAGE_SIZE = 50
+
+
+# An amount, and two amounts joined by '-' or 'to'
+NUMBER = r'(\d[\d,]*(?:\.\d+)?)'
+PRICE_RANGE = re.compile(r'\$?\s*' + NUMBER + r'\s*(?:-|\u2013|to)\s*\$?\s*' + NUMBER)
+
+
+def parse_price(value):
+    """Number from a price or price target like '$123.45', '$150-160' (midpoint) or 'N/A'.
+
+    Only a $ amount, a range or a bare number counts, so the 12 in
+    "$185 (12-month target)" is not taken for a price.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or '').strip()
+    has_dollar = '$' in text
+    for match in PRICE_RANGE.finditer(text):
+        if '$' in match.group(0) or not has_dollar:
+            low, high = (float(number.replace(',', '')) for number in match.groups())
+            return (low + high) / 2
+    amount = re.search(r'\$\s*' + NUMBER, text)
+    if amount:
+        return float(amount.group(1).replace(',', ''))
+    bare = re.fullmatch(NUMBER + r'\s*%?', text)
+    return float(bare.group(1).replace(',', '')) if bare else None
+
+
+class HistoryStore:
+    """Append-only SQLite store of the analyses the app has produced.
+
+    Rows are only ever inserted: a small `recommendations` row per analysis
+    (indexed by ticker and date, used for history pages and backtests) and the
+    zlib-compressed stored result under the same id in `analyses`, so the last
+    analysis of a ticker is one index lookup away. SQLite in WAL mode lets
+    every gunicorn worker append while others read, and each thread uses its
+    own connection.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @property
+    def connection(self):
+        # Connections must not cross threads or a fork (gunicorn --preload)
+        if getattr(self.local, 'pid', None) != os.getpid():
+            self.local.connection = self._connect()
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def record_analysis(self, result):
+        """Append a completed analysis (run_analysis result); returns its id or None"""
+        try:
+            analysis = result.get('analysis', {})
+            company_data = result.get('company_data', {})
+            reference_price = parse_price(company_data.get('current_price'))
+            if reference_price is None and result.get('price_series'):
+                reference_price = parse_price(result['price_series']['close'][-1])
+            # Every fallback that did not come from Claude (no client, error, unparseable reply) lists 'llm'
+            source = 'heuristic' if 'llm' in (result.get('degraded') or []) else 'llm'
+            payload = zlib.compress(json.dumps(result, default=str, separators=(',', ':')).encode('utf-8'))
+            with self.connection as connection:
+                cursor = connection.execute(
+                    "INSERT INTO recommendations (ticker, date, generated_at, recommendation, confidence,"
+                    " price_target, reference_price, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (result['ticker'], result['generated_at'][:10], result['generated_at'],
+                     str(analysis.get('recommendation', 'HOLD')).upper(), parse_price(analysis.get('confidence_score')),
+                     parse_price(analysis.get('price_target')), reference_price, source)
+                )
+                connection.execute("INSERT INTO analyses (id, ticker, generated_at, payload) VALUES (?, ?, ?, ?)",
+                                   (cursor.lastrowid, result['ticker'], result['generated_at'], payload))
+            return cursor.lastrowid
+        except Exception as e:
+            logger.error(f"Error recording analysis for {result.get('ticker')}: {str(e)}")
+            return None
+
+    def recommendations(self, tickers=None, since=None, until=None, sources=('llm',)):
+        """Latest recommendation per ticker and day, oldest first, as a list of row dicts"""
+        conditions, params = [], []
+        if tickers:
+            conditions.append(f"ticker IN ({','.join('?' * len(tickers))})")
+            params.extend(tickers)
+        if since:
+            conditions.append("date >= ?")
+            params.append(since)
+        if until:
+            conditions.append("date <= ?")
+            params.append(until)
+        if sources:
+            conditions.append(f"source IN ({','.join('?' * len(sources))})")
+            params.extend(sources)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self.connection.execute(
+            "SELECT ticker, date, recommendation, confidence, price_target, reference_price FROM recommendations"
+            f" WHERE id IN (SELECT MAX(id) FROM recommendations {where} GROUP BY ticker, date)"
+            " ORDER BY date, ticker", params
+        ).fetchall()
+        keys = ('ticker', 'date', 'recommendation', 'confidence', 'price_target', 'reference_price')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def history(self, ticker, limit=None, before=None, since=None, until=None):
+        """One page of a ticker's recommendations, newest first.
+
+        Pages are keyed by id (`before` is the `next_before` of the previous
+        page), so paging stays cheap and stable while new analyses are appended.
+        """
+        limit = limit or HISTORY_PAGE_SIZE
+        conditions, params = ["ticker = ?"], [ticker]
+        if since:
+            conditions.append("date >= ?")
+            params.append(since)
+        if until:
+            conditions.append("date <= ?")
+            params.append(until)
+        where = ' AND '.join(conditions)
+        total = self.connection.execute(f"SELECT COUNT(*) FROM recommendations WHERE {where}", params).fetchone()[0]
+        if before:
+            where += " AND id < ?"
+            params.append(before)
+        rows = self.connection.execute(
+            "SELECT id, generated_at, recommendation, confidence, price_target, reference_price, source"
+            f" FROM recommendations WHERE {where} ORDER BY id DESC LIMIT ?", params + [limit + 1]
+        ).fetchall()
+        keys = ('id', 'generated_at', 'recommendation', 'confidence', 'price_target', 'reference_price', 'source')
+        items = [dict(zip(keys, row)) for row in rows[:limit]]
+        return {
+            'ticker': ticker,
+            'total': total,
+            'items': items,
+            'next_before': items[-1]['id'] if len(rows) > limit else None
+        }
+
+    def get_analysis(self, ticker, analysis_id=None, max_age_days=None):
+        """A stored analysis by id, or the ticker's latest one (no older than max_age_days)"""
+        if analysis_id is not None:
+            row = self.connection.execute(
+                "SELECT id, generated_at, payload FROM analyses WHERE ticker = ? AND id = ?", (ticker, analysis_id)).fetchone()
+        else:
+            row = self.connection.execute(
+                "SELECT id, generated_at, payload FROM analyses WHERE ticker = ? ORDER BY id DESC LIMIT 1", (ticker,)).fetchone()
+        if row is None:
+            return None
+        if max_age_days is not None and row[1] < (datetime.now() - timedelta(days=max_age_days)).isoformat():
+            return None
+        return {'id': row[0], 'generated_at': row[1], 'result': json.loads(zlib.decompress(row[2]))}
+
+    def status(self):
+        try:
+            count, tickers, first, last = self.connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT ticker), MIN(date), MAX(date) FROM recommendations").fetchone()
+            return {'recommendations': count, 'tickers': tickers, 'first': first, 'last': last}
+        except Exception as e:
+            logger.error(f"Error reading history status: {str(e)}")
+            return {'error': str(e)}
@@ -0,0 +1,228 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from .lazy_import import LazyModule
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+np = LazyModule('numpy')
+
+# Pyramid levels in seconds; the finest is fetched, the others are resampled from it
+RESOLUTIONS = OrderedDict([('1m', 60), ('5m', 300), ('15m', 900), ('1h', 3600), ('1d', 86400)])
+BASE_RESOLUTION = '1m'
+
+# Chart ranges in trading sessions, with the resolution used when none is requested
+RANGES = {
+    '1d': (1, '1m'),
+    '5d': (5, '5m'),
+    '1mo': (21, '1h')
+}
+
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# 1-minute bars are kept this long (yfinance serves 30 days of them)
+INTRADAY_RETENTION_DAYS = int(os.getenv('INTRADAY_RETENTION_DAYS', 30))
+
+# Stored bars are topped up when they were last fetched longer ago than this
+INTRADAY_REFRESH_SECONDS = int(os.getenv('INTRADAY_REFRESH_SECONDS', 60))
+
+# Pyramids kept in memory per worker
+INTRADAY_MEMORY_TICKERS = int(os.getenv('INTRADAY_MEMORY_TICKERS', 32))
+
+# Sub-daily buckets start at the 9:30 open (exchange time), like Yahoo's hourly bars
+SESSION_OPEN_SECONDS = 9 * 3600 + 30 * 60
+
+
+def resample(bars, seconds):
+    """Coarser OHLCV bars from time-sorted finer ones.
+
+    Bucket ids are computed for every bar at once; bucket boundaries are
+    where the id changes, and each column is reduced over those segments
+    with a single ufunc.reduceat call - no Python loop over bars or buckets.
+    Buckets are aligned in exchange time: to the session open below a day,
+    to midnight for daily bars.
+    """
+    if len(bars['ts']) == 0:
+        return {name: values[:0] for name, values in bars.items()}
+    local = bars['ts'] + bars['offset']
+    anchor = 0 if seconds >= 86400 else SESSION_OPEN_SECONDS
+    bucket = (local - anchor) // seconds
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)] - 1
+    offset = bars['offset'][starts]
+    return {
+        'ts': bucket[starts] * seconds + anchor - offset,
+        'offset': offset,
+        'open': bars['open'][starts],
+        'high': np.maximum.reduceat(bars['high'], starts),
+        'low': np.minimum.reduceat(bars['low'], starts),
+        'close': bars['close'][ends],
+        'volume': np.add.reduceat(bars['volume'], starts)
+    }
+
+
+class IntradayStore:
+    """Per-ticker multi-resolution OHLCV pyramids, one .npz file per ticker.
+
+    Only 1-minute bars are fetched; every coarser level is resampled once
+    when new bars arrive and stored next to them. A chart request for any
+    (range, resolution) is then two binary searches and a slice.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self.memory = OrderedDict()  # ticker -> (mtime, pyramid)
+        self.lock = threading.Lock()
+        self.ticker_locks = {}
+
+    def _path(self, ticker):
+        return os.path.join(self.store_dir, f"{ticker}.npz")
+
+    def ticker_lock(self, ticker):
+        """Serializes refreshes of one ticker within this process"""
+        with self.lock:
+            return self.ticker_locks.setdefault(ticker, threading.Lock())
+
+    def load(self, ticker):
+        """{'levels': {resolution: columns}, 'fetched_at': epoch seconds, 'backfill_before': epoch seconds} or None if nothing is stored"""
+        path = self._path(ticker)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        with self.lock:
+            cached = self.memory.get(ticker)
+            if cached and cached[0] == mtime:
+                self.memory.move_to_end(ticker)
+                return cached[1]
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                pyramid = {
+                    'levels': {resolution: {name: data[f"{resolution}_{name}"] for name in ('ts', 'offset') + BAR_COLUMNS}
+                               for resolution in RESOLUTIONS},
+                    'fetched_at': float(data['fetched_at']),
+                    # Bars before this have not been fetched yet (0 once the retention period is covered)
+                    'backfill_before': float(data['backfill_before']) if 'backfill_before' in data.files else 0.0
+                }
+        except Exception as e:
+            logger.error(f"Error reading intraday bars for {ticker}: {str(e)}")
+            return None
+        with self.lock:
+            self.memory[ticker] = (mtime, pyramid)
+            self.memory.move_to_end(ticker)
+            while len(self.memory) > INTRADAY_MEMORY_TICKERS:
+                self.memory.popitem(last=False)
+        return pyramid
+
+    def last_timestamp(self, ticker):
+        pyramid = self.load(ticker)
+        if pyramid is None or not len(pyramid['levels'][BASE_RESOLUTION]['ts']):
+            return None
+        return int(pyramid['levels'][BASE_RESOLUTION]['ts'][-1])
+
+    def needs_refresh(self, ticker):
+        pyramid = self.load(ticker)
+        return pyramid is None or time.time() - pyramid['fetched_at'] > INTRADAY_REFRESH_SECONDS
+
+    def backfill_before(self, ticker):
+        """Epoch seconds before which bars still have to be fetched, or None when the retention period is covered"""
+        pyramid = self.load(ticker)
+        if pyramid is None or pyramid['backfill_before'] <= time.time() - INTRADAY_RETENTION_DAYS * 86400:
+            return None
+        return pyramid['backfill_before']
+
+    def update(self, ticker, bars, backfill_before=None):
+        """Merge newly fetched 1-minute bars, trim to the retention period and rebuild the pyramid.
+
+        `backfill_before` records how far back the bars have been fetched;
+        None keeps the stored value.
+        """
+        pyramid = self.load(ticker)
+        if pyramid is None and not len(bars['ts']):
+            return False
+        base = bars
+        if pyramid is not None:
+            old = pyramid['levels'][BASE_RESOLUTION]
+            merged = {name: np.concatenate([old[name], bars[name]]) for name in old}
+            # The last stored minute is re-fetched while it is still forming; keep the newest copy
+            order = np.argsort(merged['ts'], kind='stable')
+            merged = {name: values[order] for name, values in merged.items()}
+            last = np.r_[merged['ts'][1:] != merged['ts'][:-1], True]
+            base = {name: values[last] for name, values in merged.items()}
+        cutoff = time.time() - INTRADAY_RETENTION_DAYS * 86400
+        start = np.searchsorted(base['ts'], cutoff)
+        base = {name: values[start:] for name, values in base.items()}
+
+        levels = {BASE_RESOLUTION: base}
+        for resolution, seconds in RESOLUTIONS.items():
+            if resolution != BASE_RESOLUTION:
+                levels[resolution] = resample(base, seconds)
+        columns = {f"{resolution}_{name}": values for resolution, level in levels.items() for name, values in level.items()}
+        columns['fetched_at'] = np.array(time.time())
+        if backfill_before is None:
+            backfill_before = pyramid['backfill_before'] if pyramid is not None else 0.0
+        columns['backfill_before'] = np.array(backfill_before)
+
+        path = self._path(ticker)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, **columns)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.memory.pop(ticker, None)
+        return True
+
+    def touch(self, ticker):
+        """Record a fetch that returned no new bars, so the next refresh waits INTRADAY_REFRESH_SECONDS"""
+        pyramid = self.load(ticker)
+        if pyramid is not None:
+            self.update(ticker, {name: values[:0] for name, values in pyramid['levels'][BASE_RESOLUTION].items()})
+
+    def version(self, ticker):
+        """Changes whenever the stored bars do"""
+        pyramid = self.load(ticker)
+        if pyramid is None:
+            return None
+        base = pyramid['levels'][BASE_RESOLUTION]
+        return f"{len(base['ts'])}-{int(base['ts'][-1]) if len(base['ts']) else 0}-{base['close'][-1] if len(base['ts']) else 0}"
+
+    def series(self, ticker, resolution, sessions=None):
+        """Bars of the last `sessions` trading sessions (all stored ones if None) at a resolution, as columns"""
+        pyramid = self.load(ticker)
+        if pyramid is None:
+            return None
+        level = pyramid['levels'][resolution]
+        start = 0
+        if sessions:
+            days = pyramid['levels']['1d']['ts']
+            if len(days) > sessions:
+                start = np.searchsorted(level['ts'], days[-sessions])
+        ts = level['ts'][start:]
+        local = (ts + level['offset'][start:]).astype('datetime64[s]')
+        return {
+            'ticker': ticker,
+            'resolution': resolution,
+            'bars': len(ts),
+            'series': {
+                'date': np.datetime_as_string(local, unit='D' if resolution == '1d' else 'm').tolist(),
+                'open': np.round(level['open'][start:], 2).tolist(),
+                'high': np.round(level['high'][start:], 2).tolist(),
+                'low': np.round(level['low'][start:], 2).tolist(),
+                'close': np.round(level['close'][start:], 2).tolist(),
+                'volume': level['volume'][start:].tolist()
+            },
+            'updated_at': datetime.fromtimestamp(pyramid['fetched_at']).isoformat()
+        }
+
+    def status(self):
+        try:
+            tickers = [name[:-4] for name in os.listdir(self.store_dir) if name.endswith('.npz') and '.tmp' not in name]
+            return {'tickers': len(tickers), 'in_memory': len(self.memory)}
+        except Exception as e:
+            logger.error(f"Error reading intraday store status: {str(e)}")
+            return {'error': str(e)}
@@ -0,0 +1,41 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a heavy module that is imported on first attribute access.
+
+    `yf = LazyModule('yfinance')` keeps call sites like `yf.Ticker(...)` unchanged
+    while moving the import cost from app startup to the first request that
+    needs it. Tests and benchmarks can still replace the module attribute.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def preload(*modules):
+    """Import lazy modules now (e.g. in the gunicorn master before forking workers)"""
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._load()
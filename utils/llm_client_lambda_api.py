@@ -1,19 +1,181 @@
-import anthropic
 import os
 import json
+import time
+import hashlib
 import logging
-import requests
+import threading
 from typing import Dict, Any
 
 # Import news components (keep these local)
-from .news_api import NewsAPI
+from .lazy_import import LazyModule
+from .news_api import NewsAPI, GLOBAL_AFFAIRS_TOPICS
 from .news_summarizer import NewsSummarizer
+from .cache import SimpleCache
+from .prompt_builder import build_analysis_request, build_portfolio_request, log_usage
+from .metrics import stage, record_upstream_error
+from .deadline import timeout_for, out_of_time, DeadlineExceeded
+from .circuit_breaker import upstream_guard
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Imported when the first client is created, not when the app starts
+anthropic = LazyModule('anthropic')
+requests = LazyModule('requests')
+
+# Reuse a cached LLM analysis while the price stays within this % of the price it was made at
+LLM_CACHE_PRICE_MOVE_PCT = float(os.getenv('LLM_CACHE_PRICE_MOVE_PCT', 2.0))
+
+# How long fingerprinted LLM analyses are kept (independent of the 1-hour response cache)
+LLM_CACHE_TTL_HOURS = float(os.getenv('LLM_CACHE_TTL_HOURS', 72))
+
+# Lambda API endpoint for RAG (fast semantic search over the book corpus; also embeds news articles)
+LAMBDA_API_ENDPOINT = "https://7dg4etgob2uxmrv23yv5tawslu0dnhvj.lambda-url.us-east-2.on.aws/"
+
+# Budget kept back for the Claude call while news, themes and RAG run under a deadline
+LLM_MIN_SECONDS = float(os.getenv('ANALYSIS_LLM_MIN_SECONDS', 8))
+
+# Process-wide counters for fingerprint cache effectiveness
+llm_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'tokens_saved': 0,
+    'latency_saved_ms': 0
+}
+_stats_lock = threading.Lock()
+
+def _count(**increments):
+    """Update llm_cache_stats atomically (requests run concurrently on threaded workers)"""
+    with _stats_lock:
+        for name, amount in increments.items():
+            llm_cache_stats[name] += amount
+
+def _significant(value, digits=3):
+    """Round a number to a few significant digits so noise doesn't change fingerprints"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value == 0:
+        return 0.0
+    return float(f"{value:.{digits}g}")
+
+def _normalize_text(text):
+    return ' '.join(str(text or '').lower().split())
+
+def analysis_fingerprint(company_data, investment_themes, rag_results):
+    """Fingerprint of the normalized inputs of the analysis prompt.
+
+    Price-driven fields (price, market cap, trailing P/E) are reduced to the
+    quantities they imply - earnings per share and shares outstanding - so a
+    moving price alone doesn't change the fingerprint; price moves are checked
+    separately against LLM_CACHE_PRICE_MOVE_PCT.
+    """
+    price = _significant(company_data.get('current_price'), 6)
+    pe_ratio = _significant(company_data.get('pe_ratio'), 6)
+    market_cap = _significant(company_data.get('market_cap'), 6)
+
+    inputs = {
+        'ticker': company_data.get('symbol'),
+        'name': company_data.get('name'),
+        'sector': company_data.get('sector'),
+        'eps': _significant(price / pe_ratio) if price and pe_ratio else None,
+        'shares': _significant(market_cap / price) if price and market_cap else None,
+        'themes': _normalize_text(investment_themes),
+        'sources': sorted(f"{r.get('book_name')}|{r.get('page')}" for r in rag_results[:3])
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+def heuristic_analysis(company_data):
+    """Low-confidence recommendation from analyst consensus, used when there is no time left for Claude"""
+    try:
+        upside = (float(company_data.get('target_mean_price')) / float(company_data.get('current_price')) - 1) * 100
+    except (TypeError, ValueError, ZeroDivisionError):
+        upside = None
+    
+    consensus = str(company_data.get('recommendation') or '').lower()
+    if consensus in ('strong_buy', 'buy') and (upside is None or upside > 5):
+        recommendation = 'BUY'
+    elif consensus in ('sell', 'strong_sell', 'underperform') and (upside is None or upside < 0):
+        recommendation = 'SELL'
+    else:
+        recommendation = 'HOLD'
+    
+    key_factors = [f"Analyst consensus: {consensus.replace('_', ' ') or 'n/a'}"]
+    if upside is not None:
+        key_factors.append(f"Mean analyst target implies {upside:+.1f}% from the current price")
+    
+    return {
+        'recommendation': recommendation,
+        'confidence_score': 30,
+        'rationale': 'The full analysis did not finish in time; this preliminary view is based only on analyst consensus and price targets.',
+        'key_factors': key_factors,
+        'risks': ['Preliminary analysis without news or investment literature context'],
+        'price_target': f"${company_data['target_mean_price']}" if upside is not None else 'N/A'
+    }
+
+def heuristic_portfolio_analysis(risk, sectors):
+    """Rule-based portfolio assessment from the risk metrics, used when Claude is unavailable"""
+    volatility = risk['annual_volatility_pct']
+    risk_level = 'LOW' if volatility < 12 else 'MODERATE' if volatility < 22 else 'HIGH'
+    largest = max(risk['holdings'], key=lambda holding: holding['weight_pct'])
+    top_sector, top_sector_weight = next(iter(sectors.items()), ('Unclassified', 0))
+    
+    risks = []
+    if largest['weight_pct'] > 25:
+        risks.append(f"Concentration: {largest['ticker']} is {largest['weight_pct']}% of the portfolio")
+    if top_sector != 'Unclassified' and top_sector_weight > 40:
+        risks.append(f"Sector concentration: {top_sector_weight}% in {top_sector}")
+    if risk['average_correlation'] is not None and risk['average_correlation'] > 0.6:
+        risks.append(f"Holdings move together (average correlation {risk['average_correlation']})")
+    
+    return {
+        'risk_level': risk_level,
+        'confidence_score': 30,
+        'rationale': 'The full analysis is not available; this preliminary view is based only on the portfolio risk metrics.',
+        'key_factors': [
+            f"Annualized volatility {volatility}%",
+            f"Maximum drawdown {risk['max_drawdown_pct']}%",
+            f"One-day value at risk {risk['value_at_risk_pct']}%"
+        ],
+        'risks': risks or ['Preliminary analysis without news or investment literature context'],
+        'suggestions': []
+    }
+
+def _message_text(message):
+    """Concatenated text of a Messages API response"""
+    # Handle different content types in Anthropic API response
+    response_text = ""
+    for content_block in message.content:
+        if hasattr(content_block, 'text'):
+            response_text += content_block.text
+        elif hasattr(content_block, 'content'):
+            response_text += str(content_block.content)
+    return response_text
+
+def _extract_json(response_text):
+    """The JSON object embedded in a model response; ValueError if there is none"""
+    json_start = response_text.find('{')
+    json_end = response_text.rfind('}') + 1
+    if json_start == -1 or json_end == 0:
+        raise ValueError("No JSON found in response")
+    return json.loads(response_text[json_start:json_end])
+
+def _price_within_threshold(reference_price, current_price):
+    try:
+        reference_price = float(reference_price)
+        current_price = float(current_price)
+    except (TypeError, ValueError):
+        # Without prices to compare, rely on the fingerprint alone
+        return True
+    if reference_price <= 0:
+        return False
+    return abs(current_price / reference_price - 1) * 100 <= LLM_CACHE_PRICE_MOVE_PCT
+
 class LambdaAPILLMClient:
-    def __init__(self):
+    def __init__(self, cache=None, news_api=None, news_ranker=None):
+        self.cache = cache if cache is not None else SimpleCache()
+        
         self.api_key = os.getenv('ANTHROPIC_API_KEY')
         if not self.api_key or self.api_key == 'your_anthropic_api_key_here':
             logger.warning("ANTHROPIC_API_KEY not found or not configured in environment variables")
@@ -26,11 +188,12 @@ class LambdaAPILLMClient:
                 self.client = None
         
         # Lambda API endpoint for RAG - Updated to new fast semantic search endpoint
-        self.lambda_api_endpoint = "https://7dg4etgob2uxmrv23yv5tawslu0dnhvj.lambda-url.us-east-2.on.aws/"
+        self.lambda_api_endpoint = LAMBDA_API_ENDPOINT
+        self.news_ranker = news_ranker
         
         # Initialize news components (keep these local)
         try:
-            self.news_api = NewsAPI()
+            self.news_api = news_api or NewsAPI()
             self.news_summarizer = NewsSummarizer()
             logger.info("News components initialized successfully")
         except Exception as e:
@@ -38,29 +201,45 @@ class LambdaAPILLMClient:
             self.news_api = None
             self.news_summarizer = None
     
-    def search_investment_books(self, query):
+    def search_investment_books(self, query, deadline=None):
         """Search investment books using Lambda API"""
+        guard = upstream_guard('lambda')
+        if not guard.allow():
+            return []
         try:
             response = requests.post(
                 self.lambda_api_endpoint,
                 json={"query": query},
                 headers={"Content-Type": "application/json"},
-                timeout=30
+                timeout=timeout_for(deadline, 30)
             )
+            guard.record_status(response.status_code)
             
             if response.status_code == 200:
                 data = response.json()
                 return data.get('results', [])
             else:
                 logger.error(f"Lambda API error: {response.status_code} - {response.text}")
+                record_upstream_error('lambda')
                 return []
                 
+        except DeadlineExceeded as e:
+            logger.warning(f"Skipping book search, out of time: {e}")
+            return []
         except Exception as e:
             logger.error(f"Error calling Lambda API: {e}")
+            record_upstream_error('lambda')
+            guard.record_error(e)
             return []
     
-    def get_stock_analysis(self, company_data, price_data, news_articles):
-        """Get comprehensive stock analysis using Lambda-powered RAG"""
+    def get_stock_analysis(self, company_data, price_data, news_articles, deadline=None):
+        """Get comprehensive stock analysis using Lambda-powered RAG.
+        
+        With a deadline, news, themes and book search share the budget minus
+        LLM_MIN_SECONDS; stages that run out of time are skipped or degraded and
+        listed in the result's `degraded` field.
+        """
+        degraded = []
         try:
             if not self.client:
                 return {
@@ -74,137 +253,314 @@ class LambdaAPILLMClient:
                         'sources': [],
                         'reasoning': 'LLM client not initialized.',
                         'global_news': []
-                    }
+                    },
+                    'degraded': ['llm']
                 }
             
-            # Get global news and investment themes
-            global_news = []
-            investment_themes = "investment principles risk management diversification"
+            global_news, investment_themes, rag_results = self._gather_context(deadline, degraded, company_data)
             
-            if self.news_api and self.news_summarizer:
-                try:
-                    # Get global affairs news
-                    global_topics = ['Global Tension', 'Wars', 'Trading co-operations', 'Federal Reserve', 'Interest Rates']
-                    global_news = self.news_api.get_global_affairs_news(topics=global_topics, max_articles=8)
-                    
-                    # Summarize how news affects markets
-                    if global_news:
-                        investment_themes = self.news_summarizer.summarize_market_impact(global_news)
-                    
-                    logger.info(f"Retrieved {len(global_news)} news articles, themes: '{investment_themes[:50]}...'")
-                except Exception as e:
-                    logger.error(f"Error getting news: {e}")
+            # Reuse a previous analysis when the normalized prompt inputs haven't changed
+            fingerprint = analysis_fingerprint(company_data, investment_themes, rag_results)
+            analysis = self._get_fingerprinted_analysis(fingerprint, company_data.get('current_price'))
+            if analysis is None:
+                analysis = self._timed_claude_analysis(company_data, rag_results, fingerprint, deadline,
+                                                       store=not degraded)
+                if analysis is None:
+                    degraded.append('llm')
+                    analysis = heuristic_analysis(company_data)
             
-            # Search books using investment themes
-            rag_results = self.search_investment_books(investment_themes)
+            analysis['rag_context'] = self._rag_context(rag_results, global_news)
+            # The parse-failure fallback marks itself degraded
+            analysis['degraded'] = degraded + [name for name in analysis.get('degraded', []) if name not in degraded]
             
-            # Format RAG context
-            book_context = ""
-            if rag_results:
-                book_context = "Relevant Investment Principles from Literature:\n\n"
-                for i, result in enumerate(rag_results[:3], 1):
-                    book_context += f"{i}. From '{result['book_name']}' (Page {result['page']}):\n"
-                    book_context += f"   {result['text'][:400]}{'...' if len(result['text']) > 400 else ''}\n\n"
-            else:
-                book_context = "Investment literature context not available."
+            return analysis
+            
+        except Exception as e:
+            logger.error(f"Error in stock analysis: {e}")
+            record_upstream_error('anthropic')
+            return {
+                'recommendation': 'HOLD',
+                'confidence_score': 0,
+                'rationale': f'Analysis failed: {str(e)}',
+                'key_factors': [],
+                'risks': ['Technical error'],
+                'price_target': 'N/A',
+                'rag_context': {'sources': [], 'reasoning': 'Error occurred.', 'global_news': []},
+                'degraded': degraded + ['llm']
+            }
+    
+    def get_portfolio_analysis(self, risk, sectors, deadline=None):
+        """One consolidated analysis of a whole portfolio.
+        
+        News, themes and book search run once for the portfolio rather than per
+        holding, followed by a single Claude call over the holdings and risk
+        metrics. Falls back to heuristic_portfolio_analysis when Claude is not
+        configured, out of time or behind an open circuit.
+        """
+        degraded = []
+        try:
+            if not self.client:
+                analysis = heuristic_portfolio_analysis(risk, sectors)
+                analysis['rag_context'] = {'sources': [], 'reasoning': 'LLM client not initialized.', 'global_news': []}
+                analysis['degraded'] = degraded
+                return analysis
             
-            # Simple analysis prompt with Lambda RAG
-            company_name = company_data.get('name', 'Unknown Company')
-            ticker = company_data.get('symbol', 'UNKNOWN')
-            current_price = company_data.get('current_price', 'N/A')
+            global_news, investment_themes, rag_results = self._gather_context(deadline, degraded)
             
-            prompt = f"""
-You are a professional stock analyst. Analyze {company_name} ({ticker}) and provide a recommendation.
-
-RELEVANT INVESTMENT PRINCIPLES:
-{book_context}
-
-COMPANY FUNDAMENTALS:
-- Name: {company_name}
-- Ticker: {ticker}
-- Current Price: ${current_price}
-- Market Cap: ${company_data.get('market_cap', 'N/A')}
-- P/E Ratio: {company_data.get('pe_ratio', 'N/A')}
-- Sector: {company_data.get('sector', 'N/A')}
-
-Please provide your analysis in JSON format:
-{{
-    "recommendation": "BUY|HOLD|SELL",
-    "confidence_score": <number between 0-100>,
-    "rationale": "<detailed explanation>",
-    "key_factors": ["<factor 1>", "<factor 2>"],
-    "risks": ["<risk 1>", "<risk 2>"],
-    "price_target": "<12-month target or N/A>"
-}}
-
-Reference the investment principles above when relevant.
-"""
+            analysis = None
+            if out_of_time(deadline, LLM_MIN_SECONDS / 2):
+                logger.warning("Skipping Claude portfolio analysis: out of time")
+            elif upstream_guard('anthropic').allow():
+                try:
+                    with stage('llm'):
+                        analysis = self._run_portfolio_analysis(risk, sectors, rag_results, deadline)
+                except Exception as e:
+                    if not out_of_time(deadline, 0.5):
+                        raise
+                    logger.warning(f"Claude portfolio analysis did not finish in time: {e}")
+            if analysis is None:
+                degraded.append('llm')
+                analysis = heuristic_portfolio_analysis(risk, sectors)
+            
+            analysis['rag_context'] = self._rag_context(rag_results, global_news)
+            analysis['degraded'] = degraded
+            return analysis
             
-            # Get analysis from Claude
+        except Exception as e:
+            logger.error(f"Error in portfolio analysis: {e}")
+            record_upstream_error('anthropic')
+            analysis = heuristic_portfolio_analysis(risk, sectors)
+            analysis['rationale'] = f'Analysis failed: {str(e)}'
+            analysis['rag_context'] = {'sources': [], 'reasoning': 'Error occurred.', 'global_news': []}
+            analysis['degraded'] = degraded + ['llm']
+            return analysis
+    
+    def _run_portfolio_analysis(self, risk, sectors, rag_results, deadline=None):
+        request_args = build_portfolio_request(risk, sectors, rag_results)
+        guard = upstream_guard('anthropic')
+        started = time.monotonic()
+        try:
             message = self.client.messages.create(
                 model="claude-3-5-sonnet-20241022",
                 max_tokens=2000,
                 temperature=0.3,
-                messages=[{"role": "user", "content": prompt}]
+                timeout=timeout_for(deadline, 120),
+                **request_args
             )
-            
-            # Handle different content types in Anthropic API response
-            response_text = ""
-            for content_block in message.content:
-                if hasattr(content_block, 'text'):
-                    response_text += content_block.text
-                elif hasattr(content_block, 'content'):
-                    response_text += str(content_block.content)
-            
-            # Parse JSON response
+        except Exception as e:
+            guard.record_error(e)
+            raise
+        guard.record_success()
+        log_usage(f"Portfolio analysis ({len(risk['holdings'])} holdings)", message,
+                  int((time.monotonic() - started) * 1000))
+        
+        try:
+            analysis = _extract_json(_message_text(message))
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Failed to parse portfolio JSON: {e}")
+            analysis = heuristic_portfolio_analysis(risk, sectors)
+            analysis['rationale'] = 'Analysis completed but parsing failed; showing the metrics-based view.'
+        return analysis
+    
+    def _gather_context(self, deadline, degraded, company_data=None):
+        """Global news, investment themes and book excerpts shared by stock and portfolio analyses.
+        
+        With company data and a news ranker, the news are the stored articles
+        most relevant to the company instead of the most recent ones.
+        Runs within the deadline minus LLM_MIN_SECONDS and appends the stages
+        that ran out of time or were cut off by a circuit breaker to `degraded`.
+        """
+        context_deadline = deadline.reserve(LLM_MIN_SECONDS) if deadline is not None else None
+        
+        # Get global news and investment themes
+        global_news = []
+        investment_themes = "investment principles risk management diversification"
+        
+        if self.news_api and self.news_summarizer:
             try:
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                
-                if json_start != -1 and json_end != -1:
-                    json_str = response_text[json_start:json_end]
-                    analysis = json.loads(json_str)
+                # Get global affairs news
+                if out_of_time(context_deadline, 1):
+                    degraded.append('news')
                 else:
-                    raise ValueError("No JSON found in response")
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                logger.error(f"Failed to parse JSON: {e}")
-                analysis = {
-                    'recommendation': 'HOLD',
-                    'confidence_score': 50,
-                    'rationale': f'Analysis completed but parsing failed: {response_text[:300]}...',
-                    'key_factors': ['LLM analysis available'],
-                    'risks': ['JSON parsing error'],
-                    'price_target': 'N/A'
-                }
-            
-            # Add RAG context in the format expected by frontend
-            formatted_sources = []
-            for r in rag_results[:3]:
-                formatted_sources.append({
-                    'book': r.get('book_name', 'Unknown'),
-                    'chapter': 'Investment Principles',  # Generic since we don't have chapter info
-                    'page': r.get('page', 'N/A'),
-                    'text_preview': r.get('text', '')[:300] + ('...' if len(r.get('text', '')) > 300 else ''),
-                    'relevance_score': r.get('similarity', 0.5)  # Use similarity from new Lambda API
-                })
-            
-            analysis['rag_context'] = {
-                'sources': formatted_sources,
-                'reasoning': f"Found {len(rag_results)} relevant investment principles from classic literature",
-                'global_news': global_news[:5]  # Include top 5 news articles
-            }
-            
-            return analysis
-            
+                    with stage('news'):
+                        if self.news_ranker is not None and company_data:
+                            global_news = self.news_ranker.rank(company_data, limit=8, deadline=context_deadline)
+                        if not global_news:
+                            global_news = self.news_api.get_global_affairs_news(
+                                topics=GLOBAL_AFFAIRS_TOPICS, max_articles=8, deadline=context_deadline)
+                    # Stored articles are still real news while newsapi.org's circuit is open
+                    newsapi_down = self.news_api.store is None and not upstream_guard('newsapi').available()
+                    if out_of_time(context_deadline, 0.01) or newsapi_down:
+                        degraded.append('news')
+        
+                # Summarize how news affects markets (reused while the article set is unchanged)
+                if global_news:
+                    with stage('summarizer'):
+                        investment_themes, themes_complete = self._get_investment_themes(global_news, context_deadline)
+                    if not themes_complete:
+                        degraded.append('summarizer')
+        
+                logger.info(f"Retrieved {len(global_news)} news articles, themes: '{investment_themes[:50]}...'")
+            except Exception as e:
+                logger.error(f"Error getting news: {e}")
+        
+        # Search books using investment themes
+        rag_results = []
+        if out_of_time(context_deadline, 1):
+            degraded.append('rag')
+        else:
+            with stage('rag'):
+                rag_results = self.search_investment_books(investment_themes, deadline=context_deadline)
+            if not rag_results and (out_of_time(context_deadline, 0.01) or not upstream_guard('lambda').available()):
+                degraded.append('rag')
+        
+        return global_news, investment_themes, rag_results
+    
+    @staticmethod
+    def _rag_context(rag_results, global_news):
+        """RAG context in the format expected by the frontend"""
+        formatted_sources = []
+        for r in rag_results[:3]:
+            formatted_sources.append({
+                'book': r.get('book_name', 'Unknown'),
+                'chapter': 'Investment Principles',  # Generic since we don't have chapter info
+                'page': r.get('page', 'N/A'),
+                'text_preview': r.get('text', '')[:300] + ('...' if len(r.get('text', '')) > 300 else ''),
+                'relevance_score': r.get('similarity', 0.5)  # Use similarity from new Lambda API
+            })
+        
+        return {
+            'sources': formatted_sources,
+            'reasoning': f"Found {len(rag_results)} relevant investment principles from classic literature",
+            'global_news': global_news[:5]  # Include top 5 news articles (most relevant first when ranked)
+        }
+    
+    def _get_investment_themes(self, global_news, deadline=None):
+        """Summarize news into investment themes, cached per set of articles.
+        
+        Returns (themes, complete). When Claude can't summarize (circuit open,
+        error or out of time), the most recent themes (or the keyword fallback)
+        are used and nothing is cached.
+        """
+        themes_key = {
+            'type': 'investment_themes',
+            'articles': sorted(article.get('url', '') for article in global_news)
+        }
+        latest_key = {'type': 'investment_themes', 'latest': True}
+        cached_themes = self.cache.get(themes_key)
+        if cached_themes:
+            logger.info("Reusing investment themes for unchanged news set")
+            return cached_themes, True
+        
+        # Only a real summary is cached; the summarizer returns None instead of falling back itself
+        if not out_of_time(deadline, 2) and upstream_guard('anthropic').available():
+            investment_themes = self.news_summarizer.summarize_market_impact(global_news, deadline=deadline)
+            if investment_themes:
+                self.cache.set(themes_key, investment_themes, expiry_hours=LLM_CACHE_TTL_HOURS)
+                self.cache.set(latest_key, investment_themes, expiry_hours=LLM_CACHE_TTL_HOURS)
+                return investment_themes, True
+        
+        logger.warning("News themes unavailable in time, using the most recent themes")
+        return self.cache.get(latest_key) or self.news_summarizer._get_fallback_summary(global_news), False
+    
+    def _get_fingerprinted_analysis(self, fingerprint, current_price):
+        """Return a cached LLM analysis for this fingerprint if the price hasn't moved too far"""
+        entry = self.cache.get({'type': 'llm_analysis', 'fingerprint': fingerprint})
+        if not entry:
+            _count(misses=1)
+            return None
+        
+        if not _price_within_threshold(entry.get('reference_price'), current_price):
+            logger.info(f"LLM cache entry {fingerprint[:12]} skipped: price moved more than {LLM_CACHE_PRICE_MOVE_PCT}%")
+            _count(misses=1)
+            return None
+        
+        usage = entry.get('usage', {})
+        tokens_saved = usage.get('input_tokens', 0) + usage.get('output_tokens', 0)
+        latency_saved_ms = usage.get('latency_ms', 0)
+        _count(hits=1, tokens_saved=tokens_saved, latency_saved_ms=latency_saved_ms)
+        logger.info(f"LLM cache hit {fingerprint[:12]}: saved {tokens_saved} tokens, ~{latency_saved_ms} ms")
+        
+        analysis = dict(entry['analysis'])
+        analysis['llm_cache'] = {
+            'hit': True,
+            'fingerprint': fingerprint,
+            'analyzed_at': entry.get('analyzed_at'),
+            'reference_price': entry.get('reference_price'),
+            'tokens_saved': tokens_saved,
+            'latency_saved_ms': latency_saved_ms
+        }
+        return analysis
+    
+    def _timed_claude_analysis(self, company_data, rag_results, fingerprint, deadline=None, store=True):
+        """Run the Claude analysis within the deadline; None when it can't finish in time or the circuit is open"""
+        if out_of_time(deadline, LLM_MIN_SECONDS / 2):
+            logger.warning(f"Skipping Claude analysis for {company_data.get('symbol')}: out of time")
+            return None
+        if not upstream_guard('anthropic').allow():
+            return None
+        try:
+            with stage('llm'):
+                return self._run_claude_analysis(company_data, rag_results, fingerprint, deadline, store)
         except Exception as e:
-            logger.error(f"Error in stock analysis: {e}")
+            if not out_of_time(deadline, 0.5):
+                raise
+            logger.warning(f"Claude analysis for {company_data.get('symbol')} did not finish in time: {e}")
+            return None
+    
+    def _run_claude_analysis(self, company_data, rag_results, fingerprint, deadline=None, store=True):
+        """Ask Claude for the analysis and cache it under the input fingerprint"""
+        request_args = build_analysis_request(company_data, rag_results)
+        
+        # Get analysis from Claude
+        timeout = timeout_for(deadline, 120)
+        guard = upstream_guard('anthropic')
+        started = time.monotonic()
+        try:
+            message = self.client.messages.create(
+                model="claude-3-5-sonnet-20241022",
+                max_tokens=2000,
+                temperature=0.3,
+                timeout=timeout,
+                **request_args
+            )
+        except Exception as e:
+            guard.record_error(e)
+            raise
+        guard.record_success()
+        latency_ms = int((time.monotonic() - started) * 1000)
+        usage = log_usage(f"Stock analysis {company_data.get('symbol', 'UNKNOWN')}", message, latency_ms)
+        
+        response_text = _message_text(message)
+        
+        # Parse JSON response
+        try:
+            analysis = _extract_json(response_text)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Failed to parse JSON: {e}")
             return {
                 'recommendation': 'HOLD',
-                'confidence_score': 0,
-                'rationale': f'Analysis failed: {str(e)}',
-                'key_factors': [],
-                'risks': ['Technical error'],
+                'confidence_score': 50,
+                'rationale': f'Analysis completed but parsing failed: {response_text[:300]}...',
+                'key_factors': ['LLM analysis available'],
+                'risks': ['JSON parsing error'],
                 'price_target': 'N/A',
-                'rag_context': {'sources': [], 'reasoning': 'Error occurred.', 'global_news': []}
-            } 
\ No newline at end of file
+                'degraded': ['llm']
+            }
+        
+        # Only successfully parsed analyses of complete inputs are worth reusing
+        if store:
+            self.cache.set({'type': 'llm_analysis', 'fingerprint': fingerprint}, {
+                'analysis': analysis,
+                'reference_price': company_data.get('current_price'),
+                'analyzed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'usage': {
+                    'input_tokens': usage['input_tokens'] + usage['cache_creation_input_tokens'] + usage['cache_read_input_tokens'],
+                    'output_tokens': usage['output_tokens'],
+                    'latency_ms': latency_ms
+                }
+            }, expiry_hours=LLM_CACHE_TTL_HOURS)
+        
+        analysis = dict(analysis)
+        analysis['llm_cache'] = {'hit': False, 'fingerprint': fingerprint}
+        return analysis
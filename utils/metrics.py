@@ -0,0 +1,144 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request, Response
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover - metrics are optional
+    prometheus_client = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Stage latencies range from sub-millisecond cache reads to multi-second LLM calls
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+if prometheus_client is not None:
+    STAGE_SECONDS = Histogram(
+        'stockwellness_stage_duration_seconds', 'Time spent in each analysis pipeline stage',
+        ['stage'], buckets=STAGE_BUCKETS
+    )
+    REQUEST_SECONDS = Histogram(
+        'stockwellness_request_duration_seconds', 'HTTP request latency',
+        ['endpoint', 'status'], buckets=STAGE_BUCKETS
+    )
+    CACHE_REQUESTS = Counter(
+        'stockwellness_cache_requests_total', 'Analysis cache lookups', ['result']
+    )
+    UPSTREAM_ERRORS = Counter(
+        'stockwellness_upstream_errors_total', 'Errors returned by upstream services', ['upstream']
+    )
+    IN_FLIGHT = Gauge(
+        'stockwellness_requests_in_flight', 'Requests currently being served',
+        multiprocess_mode='livesum'
+    )
+    ADMISSION_ACTIVE = Gauge(
+        'stockwellness_admission_active', 'Cold analyses holding an admission slot',
+        multiprocess_mode='livesum'
+    )
+    ADMISSION_QUEUED = Gauge(
+        'stockwellness_admission_queue_depth', 'Cold analyses waiting for an admission slot',
+        multiprocess_mode='livesum'
+    )
+    SHED_REQUESTS = Counter(
+        'stockwellness_shed_requests_total', 'Requests rejected by admission control', ['reason']
+    )
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage for Prometheus and the Server-Timing header"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if prometheus_client is not None:
+            STAGE_SECONDS.labels(stage=name).observe(elapsed)
+        if has_request_context():
+            timings = g.setdefault('stage_timings', [])
+            timings.append((name, elapsed))
+
+
+def record_cache_lookup(hit):
+    if prometheus_client is not None:
+        CACHE_REQUESTS.labels(result='hit' if hit else 'miss').inc()
+
+
+def record_upstream_error(upstream):
+    if prometheus_client is not None:
+        UPSTREAM_ERRORS.labels(upstream=upstream).inc()
+
+
+def record_admission(active=0, queued=0):
+    if prometheus_client is not None:
+        if active:
+            ADMISSION_ACTIVE.inc(active)
+        if queued:
+            ADMISSION_QUEUED.inc(queued)
+
+
+def record_shed(reason):
+    if prometheus_client is not None:
+        SHED_REQUESTS.labels(reason=reason).inc()
+
+
+def _server_timing_header(total_seconds):
+    """Server-Timing value: one entry per stage (repeated stages are summed) plus the total"""
+    totals = {}
+    for name, elapsed in g.get('stage_timings', []):
+        totals[name] = totals.get(name, 0.0) + elapsed
+    entries = [f'{name};dur={elapsed * 1000:.1f}' for name, elapsed in totals.items()]
+    entries.append(f'total;dur={total_seconds * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def init_app(app):
+    """Register request hooks for in-flight tracking, request latency and Server-Timing"""
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+        if prometheus_client is not None:
+            IN_FLIGHT.inc()
+            g.in_flight_counted = True
+
+    @app.after_request
+    def _add_server_timing(response):
+        started = g.get('request_started')
+        if started is not None:
+            total = time.perf_counter() - started
+            response.headers['Server-Timing'] = _server_timing_header(total)
+            if prometheus_client is not None:
+                endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+                REQUEST_SECONDS.labels(endpoint=endpoint, status=str(response.status_code)).observe(total)
+        return response
+
+    @app.teardown_request
+    def _finish_request(exc):
+        if g.pop('in_flight_counted', False):
+            IN_FLIGHT.dec()
+
+
+def metrics_response():
+    """Prometheus exposition; aggregates all gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if prometheus_client is None:
+        return Response('prometheus_client is not installed\n', status=503, mimetype='text/plain')
+
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges (call from gunicorn's child_exit hook)"""
+    if prometheus_client is not None and os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
@@ -1,108 +1,241 @@
-import requests
 import os
-from datetime import datetime, timedelta
 import logging
+import threading
+from datetime import datetime, timedelta
+
+from .lazy_import import LazyModule
+from .metrics import record_upstream_error
+from .deadline import timeout_for, DeadlineExceeded
+from .circuit_breaker import upstream_guard
+from .news_store import NEWS_INGEST_INTERVAL_MINUTES
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+requests = LazyModule('requests')
+
+# Topics of the global affairs query used by the analysis pipeline and the ingester
+GLOBAL_AFFAIRS_TOPICS = ['Global Tension', 'Wars', 'Trading co-operations', 'Federal Reserve', 'Interest Rates']
+
+# First ingestion (empty store) looks back this far
+NEWS_BACKFILL_DAYS = int(os.getenv('NEWS_BACKFILL_DAYS', 7))
+
+# Result pages fetched per ingestion run (100 articles each); the rest of a busier window is fetched by later runs
+NEWS_MAX_PAGES = int(os.getenv('NEWS_MAX_PAGES', 1))
+
+
+def _parse_utc(value):
+    """Naive UTC datetime from newsapi.org's publishedAt format"""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+
+
+def _utc_string(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
 class NewsAPI:
-    def __init__(self):
+    def __init__(self, store=None):
         self.api_key = os.getenv('NEWS_API_KEY')
         self.base_url = "https://newsapi.org/v2/everything"
+        self.store = store  # NewsStore read by get_global_affairs_news; None to query newsapi.org inline
+        self.ingest_lock = threading.Lock()
         
         if not self.api_key:
             logger.warning("NEWS_API_KEY not found in environment variables")
     
-    def get_global_affairs_news(self, topics=['Global Tension', 'Wars', 'Trading co-operations'], days=7, max_articles=15):
-        """Fetch news about global affairs that could affect markets"""
-        if not self.api_key:
-            logger.error("News API key not configured")
-            return self._get_demo_global_news(topics)
+    def get_global_affairs_news(self, topics=['Global Tension', 'Wars', 'Trading co-operations'], days=7, max_articles=15, deadline=None):
+        """Fetch news about global affairs that could affect markets.
+        
+        With a store, the most recent ingested articles are returned (the
+        store holds GLOBAL_AFFAIRS_TOPICS, so `topics` is not used). The store
+        is only topped up inline when the ingester has not run for two
+        intervals, and then only with articles newer than the newest stored one.
+        """
+        if self.store is None:
+            articles = self.fetch_since(datetime.utcnow() - timedelta(days=days), topics, max_articles, deadline=deadline)
+            if articles is None:
+                return [] if deadline is not None and deadline.expired() else self._get_demo_global_news(topics)
+            return articles
         
         try:
-            # Calculate date range
-            to_date = datetime.now()
-            from_date = to_date - timedelta(days=days)
-            
-            # Create comprehensive query for global affairs with specific terms
-            query_terms = []
-            for topic in topics:
-                if topic.lower() == 'global tension':
-                    query_terms.extend(['geopolitical tension', 'international crisis', 'diplomatic relations', 'sanctions', 'Iran', 'China', 'Russia', 'NATO'])
-                elif topic.lower() == 'wars':
-                    query_terms.extend(['war', 'conflict', 'military action', 'Ukraine', 'Middle East', 'oil supply', 'Strait of Hormuz'])
-                elif topic.lower() == 'trading co-operations':
-                    query_terms.extend(['trade agreement', 'tariffs', 'supply chain', 'US China trade', 'OPEC', 'Federal Reserve'])
+            age = self.store.last_ingest_age()
+            if self.api_key and (age is None or age > 2 * 60 * NEWS_INGEST_INTERVAL_MINUTES):
+                # One inline refresh per worker at a time; other requests read what is stored
+                if self.ingest_lock.acquire(blocking=False):
+                    try:
+                        self.ingest(deadline=deadline)
+                    finally:
+                        self.ingest_lock.release()
+            articles = self.store.recent(days=days, limit=max_articles)
+        except Exception as e:
+            logger.error(f"Error reading stored news: {str(e)}")
+            articles = []
+        return articles or self._get_demo_global_news(topics)
+    
+    def ingest(self, deadline=None):
+        """Add articles published since the last fully fetched window to the store; returns how many were new, or None.
+        
+        newsapi.org returns a window newest first, so a run that stops early
+        (page budget, error, deadline) has the newest part of it. The
+        high-water mark (`ingest_watermark`, everything before it is stored)
+        then stays put and the rest of the window, up to the oldest article
+        fetched, is recorded as a backlog that later runs fetch first. Only
+        when the backlog is complete does the mark jump to the end of the
+        window it came from (`ingest_resume`), so nothing is skipped and
+        nothing is fetched twice.
+        """
+        if not self.api_key:
+            return None
+        added, pages_left = None, NEWS_MAX_PAGES
+        while pages_left > 0:
+            watermark = self.store.get_meta('ingest_watermark') or self.store.latest_published()
+            backlog = self.store.get_meta('ingest_backlog')
+            since = _parse_utc(watermark) if watermark else datetime.utcnow() - timedelta(days=NEWS_BACKFILL_DAYS)
+            until = _parse_utc(backlog) if backlog else datetime.utcnow()
             
-            query = ' OR '.join(query_terms[:12])  # Include more specific terms
+            articles, complete, pages = self._fetch(since, until, GLOBAL_AFFAIRS_TOPICS, 100, pages_left, deadline)
+            if articles is None:
+                break
+            pages_left -= pages
+            added = (added or 0) + self.store.add(articles)
             
+            oldest = min((article['published_at'] for article in articles if article.get('published_at')), default=None)
+            if not complete and oldest and _parse_utc(oldest) > since:
+                # Keep the mark; the next pages fetch the rest of the window, older than `oldest`
+                self.store.set_meta(ingest_watermark=_utc_string(since), ingest_backlog=oldest,
+                                    ingest_resume=self.store.get_meta('ingest_resume') or _utc_string(until))
+                continue
+            if backlog:
+                # Backlog done: everything up to the end of the window it was cut from is stored
+                self.store.set_meta(ingest_watermark=self.store.get_meta('ingest_resume') or backlog,
+                                    ingest_backlog=None, ingest_resume=None)
+                continue
+            self.store.set_meta(ingest_watermark=_utc_string(until))
+            break
+        if added is not None:
+            logger.info(f"Ingested {added} new global affairs articles")
+        return added
+    
+    @staticmethod
+    def _query(topics):
+        # Create comprehensive query for global affairs with specific terms
+        query_terms = []
+        for topic in topics:
+            if topic.lower() == 'global tension':
+                query_terms.extend(['geopolitical tension', 'international crisis', 'diplomatic relations', 'sanctions', 'Iran', 'China', 'Russia', 'NATO'])
+            elif topic.lower() == 'wars':
+                query_terms.extend(['war', 'conflict', 'military action', 'Ukraine', 'Middle East', 'oil supply', 'Strait of Hormuz'])
+            elif topic.lower() == 'trading co-operations':
+                query_terms.extend(['trade agreement', 'tariffs', 'supply chain', 'US China trade', 'OPEC', 'Federal Reserve'])
+        
+        return ' OR '.join(query_terms[:12])  # Include more specific terms
+    
+    def fetch_since(self, since, topics, page_size=15, max_pages=1, deadline=None):
+        """Articles matching the topics published since `since` (datetime), newest first.
+        
+        Returns None when newsapi.org is not configured, its circuit is open or
+        the first page fails; a later page failing ends the fetch early.
+        """
+        return self._fetch(since, datetime.utcnow(), topics, page_size, max_pages, deadline)[0]
+    
+    def _fetch(self, since, until, topics, page_size, max_pages, deadline=None):
+        """(articles newest first or None, whether the whole window was fetched, pages requested)"""
+        if not self.api_key:
+            logger.error("News API key not configured")
+            return None, False, 0
+        
+        guard = upstream_guard('newsapi')
+        if not guard.allow():
+            return None, False, 0
+        
+        articles = []
+        page = 0
+        try:
             params = {
-                'q': query,
+                'q': self._query(topics),
                 'apiKey': self.api_key,
                 'sortBy': 'publishedAt',
                 'language': 'en',
-                'pageSize': max_articles,
-                'from': from_date.strftime('%Y-%m-%d'),
-                'to': to_date.strftime('%Y-%m-%d')
+                'pageSize': page_size,
+                'from': since.strftime('%Y-%m-%dT%H:%M:%S'),
+                'to': until.strftime('%Y-%m-%dT%H:%M:%S')
             }
             
-            logger.info(f"NewsAPI request: {self.base_url} with params: {params}")
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            logger.info(f"NewsAPI response status: {data.get('status')}, total results: {data.get('totalResults', 0)}")
-            
-            if data['status'] != 'ok':
-                logger.error(f"News API returned error: {data.get('message', 'Unknown error')}")
-                return self._get_demo_global_news(topics)
-            
-            raw_articles = data.get('articles', [])
-            logger.info(f"Raw articles found: {len(raw_articles)}")
-            
-            articles = []
-            for i, article in enumerate(raw_articles):
-                logger.debug(f"Article {i}: title='{article.get('title', '')[:50]}...', has_desc={bool(article.get('description'))}")
+            for page in range(1, max_pages + 1):
+                if page > 1:
+                    params['page'] = page
+                logger.info(f"NewsAPI request: {self.base_url} with params: {params}")
+                response = requests.get(self.base_url, params=params, timeout=timeout_for(deadline, 10))
+                guard.record_status(response.status_code)
+                response.raise_for_status()
                 
-                # More lenient filtering - just check if title exists
-                if (article.get('title') and 
-                    article.get('url') and
-                    '[Removed]' not in article.get('title', '')):
-                    
-                    # Combine description and content for more detailed context
-                    description = article.get('description', 'No description available')
-                    content = article.get('content', '')
-                    
-                    # Create comprehensive details from both description and content
-                    full_details = description
-                    if content and content != description:
-                        # Remove [+xxx chars] indicators and combine
-                        content_clean = content.split('[+')[0].strip()
-                        if content_clean and len(content_clean) > len(description):
-                            full_details = f"{description} {content_clean}"
-                    
-                    articles.append({
-                        'title': article['title'],
-                        'description': full_details[:500] + '...' if len(full_details) > 500 else full_details,  # More detailed description
-                        'url': article['url'],
-                        'source': article.get('source', {}).get('name', 'Unknown'),
-                        'published_at': article.get('publishedAt', ''),
-                        'content': content,
-                        'author': article.get('author', 'Unknown')
-                    })
-                else:
-                    logger.debug(f"Filtered out article: {article.get('title', 'No title')}")
+                data = response.json()
+                logger.info(f"NewsAPI response status: {data.get('status')}, total results: {data.get('totalResults', 0)}")
+                
+                if data['status'] != 'ok':
+                    logger.error(f"News API returned error: {data.get('message', 'Unknown error')}")
+                    record_upstream_error('newsapi')
+                    return (articles if page > 1 else None), False, page
+                
+                raw_articles = data.get('articles', [])
+                logger.info(f"Raw articles found: {len(raw_articles)}")
+                articles.extend(self._clean_articles(raw_articles))
+                if len(raw_articles) < page_size or page * page_size >= data.get('totalResults', 0):
+                    logger.info(f"Successfully fetched {len(articles)} global affairs articles")
+                    return articles, True, page
             
-            logger.info(f"Successfully fetched {len(articles)} global affairs articles (filtered from {len(raw_articles)})")
-            return articles
+            logger.info(f"Fetched {len(articles)} global affairs articles, more are available")
+            return articles, False, page
             
+        except DeadlineExceeded as e:
+            logger.warning(f"Skipping global affairs news, out of time: {str(e)}")
+            return articles or None, False, page
         except requests.exceptions.RequestException as e:
             logger.error(f"Network error fetching global affairs news: {str(e)}")
-            return self._get_demo_global_news(topics)
+            record_upstream_error('newsapi')
+            if getattr(e, 'response', None) is None:  # HTTP errors were recorded by status above
+                guard.record_error(e)
+            return articles or None, False, page
         except Exception as e:
             logger.error(f"Error fetching global affairs news: {str(e)}")
-            return self._get_demo_global_news(topics)
+            record_upstream_error('newsapi')
+            return articles or None, False, page
+    
+    @staticmethod
+    def _clean_articles(raw_articles):
+        articles = []
+        for i, article in enumerate(raw_articles):
+            logger.debug(f"Article {i}: title='{article.get('title', '')[:50]}...', has_desc={bool(article.get('description'))}")
+            
+            # More lenient filtering - just check if title exists
+            if (article.get('title') and 
+                article.get('url') and
+                '[Removed]' not in article.get('title', '')):
+                
+                # Combine description and content for more detailed context
+                description = article.get('description') or 'No description available'
+                content = article.get('content') or ''
+                
+                # Create comprehensive details from both description and content
+                full_details = description
+                if content and content != description:
+                    # Remove [+xxx chars] indicators and combine
+                    content_clean = content.split('[+')[0].strip()
+                    if content_clean and len(content_clean) > len(description):
+                        full_details = f"{description} {content_clean}"
+                
+                articles.append({
+                    'title': article['title'],
+                    'description': full_details[:500] + '...' if len(full_details) > 500 else full_details,  # More detailed description
+                    'url': article['url'],
+                    'source': (article.get('source') or {}).get('name', 'Unknown'),
+                    'published_at': article.get('publishedAt', ''),
+                    'content': content,
+                    'author': article.get('author', 'Unknown')
+                })
+            else:
+                logger.debug(f"Filtered out article: {article.get('title', 'No title')}")
+        return articles
     
     def format_news_for_llm(self, articles):
         """Format news articles for LLM context"""
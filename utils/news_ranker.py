@@ -0,0 +1,220 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+
+from .lazy_import import LazyModule
+from .metrics import record_upstream_error
+from .deadline import timeout_for, DeadlineExceeded
+from .circuit_breaker import upstream_guard
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+np = LazyModule('numpy')
+requests = LazyModule('requests')
+sentence_transformers = LazyModule('sentence_transformers')
+
+# Same model as the book corpus (lambda_deploy/lambda_function_semantic.py), so scores are comparable
+EMBEDDING_MODEL = 'all-mpnet-base-v2'
+
+# lambda (the book-search Lambda embeds), local (sentence-transformers installed here) or off
+NEWS_EMBEDDING_BACKEND = os.getenv('NEWS_EMBEDDING_BACKEND', 'lambda').strip().lower()
+
+# Articles considered when ranking: published in the last NEWS_RANK_DAYS, at most NEWS_RANK_MAX_ARTICLES
+NEWS_RANK_DAYS = int(os.getenv('NEWS_RANK_DAYS', 7))
+NEWS_RANK_MAX_ARTICLES = int(os.getenv('NEWS_RANK_MAX_ARTICLES', 2000))
+
+# Texts per embedding request
+EMBED_BATCH_SIZE = 64
+
+# How often the in-memory article matrix is checked against the store
+MATRIX_RECHECK_SECONDS = 30
+
+
+def article_text(article):
+    return f"{article.get('title') or ''}. {article.get('description') or ''}".strip()
+
+
+def profile_text(company_data):
+    """What a ticker is about: company name, sector and industry (None when none are known)"""
+    parts = [str(company_data.get(field)) for field in ('name', 'sector', 'industry')
+             if company_data.get(field) and company_data.get(field) != 'N/A']
+    return '. '.join(parts) if parts else None
+
+
+class ArticleEmbedder:
+    """Sentence embeddings (unit-length float32 rows) from the book-search Lambda or a local model"""
+
+    def __init__(self, lambda_endpoint, backend=None):
+        self.lambda_endpoint = lambda_endpoint
+        self.backend = backend or NEWS_EMBEDDING_BACKEND
+        self.local_model = None
+        self.local_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.backend in ('lambda', 'local')
+
+    def embed(self, texts, deadline=None):
+        """(len(texts) x dim) array of normalized embeddings, or None when they can't be computed"""
+        if not texts or not self.enabled:
+            return None
+        try:
+            if self.backend == 'local':
+                vectors = self._embed_local(texts)
+            else:
+                vectors = self._embed_lambda(texts, deadline)
+        except DeadlineExceeded as e:
+            logger.warning(f"Skipping embeddings, out of time: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Error computing embeddings: {e}")
+            return None
+        if vectors is None:
+            return None
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    def _embed_local(self, texts):
+        with self.local_lock:
+            if self.local_model is None:
+                self.local_model = sentence_transformers.SentenceTransformer(EMBEDDING_MODEL)
+        return self.local_model.encode(texts, convert_to_numpy=True, batch_size=EMBED_BATCH_SIZE)
+
+    def _embed_lambda(self, texts, deadline):
+        guard = upstream_guard('lambda')
+        if not guard.allow():
+            return None
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            try:
+                response = requests.post(
+                    self.lambda_endpoint,
+                    json={"texts": texts[start:start + EMBED_BATCH_SIZE]},
+                    headers={"Content-Type": "application/json"},
+                    timeout=timeout_for(deadline, 30)
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                record_upstream_error('lambda')
+                guard.record_error(e)
+                raise
+            guard.record_status(response.status_code)
+            if response.status_code != 200:
+                logger.error(f"Lambda embedding error: {response.status_code} - {response.text[:200]}")
+                record_upstream_error('lambda')
+                return None
+            vectors.extend(response.json().get('embeddings', []))
+        return vectors if len(vectors) == len(texts) else None
+
+
+class NewsRanker:
+    """Ranks stored news articles by relevance to a ticker.
+
+    Articles are embedded once, after ingestion, and their vectors stored
+    with them. Each worker keeps the recent ones as one (articles x dim)
+    matrix; ranking a ticker is a single matrix-vector product with the
+    embedding of its company/sector/industry profile, which is itself
+    embedded once per distinct profile and shared through the store.
+    """
+
+    def __init__(self, store, embedder):
+        self.store = store
+        self.embedder = embedder
+        self.lock = threading.Lock()
+        self.articles = []
+        self.matrix = None
+        self.version = None
+        self.checked_at = 0.0
+        self.profiles = {}
+
+    def embed_pending(self, deadline=None):
+        """Embed stored articles that have no embedding yet; returns how many were embedded"""
+        if not self.embedder.enabled:
+            return 0
+        embedded = 0
+        while True:
+            rows = self.store.unembedded(limit=EMBED_BATCH_SIZE * 4)
+            if not rows:
+                break
+            vectors = self.embedder.embed([f"{title}. {description or ''}".strip() for _, title, description in rows],
+                                          deadline=deadline)
+            if vectors is None:
+                break
+            self.store.set_embeddings([row[0] for row in rows], [vector.tobytes() for vector in vectors])
+            embedded += len(rows)
+        if embedded:
+            logger.info(f"Embedded {embedded} news articles")
+        return embedded
+
+    def _current_matrix(self):
+        """(articles, matrix) for ranking, reloaded from the store when its embeddings change"""
+        now = time.monotonic()
+        if now - self.checked_at >= MATRIX_RECHECK_SECONDS and self.lock.acquire(blocking=False):
+            try:
+                self.checked_at = now
+                version = self.store.embedding_version()
+                if version != self.version:
+                    articles, blobs = self.store.embedded(days=NEWS_RANK_DAYS, limit=NEWS_RANK_MAX_ARTICLES)
+                    matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for blob in blobs]) if blobs else None
+                    # Swap both at once; concurrent rankings keep using the previous pair
+                    self.articles, self.matrix = articles, matrix
+                    self.version = version
+            except Exception as e:
+                logger.error(f"Error loading news embeddings: {str(e)}")
+            finally:
+                self.lock.release()
+        return self.articles, self.matrix
+
+    def profile_vector(self, company_data, deadline=None):
+        """Embedding of the ticker's profile text (memory, then store, then one embedding call)"""
+        text = profile_text(company_data)
+        if text is None:
+            return None
+        key = hashlib.sha1(f"{EMBEDDING_MODEL}|{text}".encode('utf-8')).hexdigest()
+        vector = self.profiles.get(key)
+        if vector is not None:
+            return vector
+        blob = self.store.get_profile(key)
+        if blob is not None:
+            vector = np.frombuffer(blob, dtype=np.float32)
+        else:
+            vectors = self.embedder.embed([text], deadline=deadline)
+            if vectors is None:
+                return None
+            vector = vectors[0]
+            self.store.set_profile(key, vector.tobytes())
+        self.profiles[key] = vector
+        return vector
+
+    def rank(self, company_data, limit=8, deadline=None):
+        """The `limit` stored articles most relevant to the company, best first, or None when unranked"""
+        if not self.embedder.enabled:
+            return None
+        try:
+            articles, matrix = self._current_matrix()
+            if matrix is None:
+                return None
+            vector = self.profile_vector(company_data, deadline=deadline)
+            if vector is None or len(vector) != matrix.shape[1]:
+                return None
+            scores = matrix @ vector
+            k = min(limit, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [{**articles[i], 'relevance': round(float(scores[i]), 3)} for i in top]
+        except Exception as e:
+            logger.error(f"Error ranking news for {company_data.get('symbol')}: {str(e)}")
+            return None
+
+    def status(self):
+        return {
+            'backend': self.embedder.backend if self.embedder.enabled else 'off',
+            'model': EMBEDDING_MODEL,
+            'ranked_articles': len(self.articles),
+            'profiles_cached': len(self.profiles)
+        }
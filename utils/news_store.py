@@ -0,0 +1,260 @@
+import os
+import re
+import hashlib
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    # url and title_hash are both unique, so INSERT OR IGNORE drops re-fetched and syndicated copies
+    """CREATE TABLE IF NOT EXISTS articles (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL UNIQUE,
+        title_hash TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL,
+        description TEXT,
+        content TEXT,
+        source TEXT,
+        author TEXT,
+        published_at TEXT NOT NULL,
+        ingested_at TEXT NOT NULL,
+        embedding BLOB
+    )""",
+    "CREATE INDEX IF NOT EXISTS articles_published_at ON articles (published_at)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    # Embedded ticker profiles (company, sector, industry), keyed by a hash of the profile text
+    "CREATE TABLE IF NOT EXISTS profiles (key TEXT PRIMARY KEY, embedding BLOB NOT NULL)"
+]
+
+# Articles published longer ago than this are deleted
+NEWS_RETENTION_DAYS = int(os.getenv('NEWS_RETENTION_DAYS', 30))
+
+# How often the ingester asks newsapi.org for new articles
+NEWS_INGEST_INTERVAL_MINUTES = float(os.getenv('NEWS_INGEST_INTERVAL_MINUTES', 15))
+
+ARTICLE_FIELDS = ('title', 'description', 'url', 'source', 'published_at', 'content', 'author')
+
+
+def _utc_iso(moment):
+    """Timestamp in newsapi.org's publishedAt format, so stored values compare as strings"""
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def title_hash(title):
+    """Hash of a headline without case, punctuation or a trailing ' - Source' suffix"""
+    title = str(title or '')
+    if ' - ' in title:
+        title = title.rsplit(' - ', 1)[0]
+    normalized = ' '.join(re.findall(r'[a-z0-9]+', title.lower()))
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+class NewsStore:
+    """Local SQLite store of ingested news articles, indexed by publication time.
+
+    The ingester appends what is new on newsapi.org and the analysis path
+    reads the most recent articles from here, so requests never wait on
+    newsapi.org and its quota is spent on new articles only.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            # Stores created before article embeddings lack the column
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(articles)")]
+            if 'embedding' not in columns:
+                connection.execute("ALTER TABLE articles ADD COLUMN embedding BLOB")
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @property
+    def connection(self):
+        # Connections must not cross threads or a fork (gunicorn --preload)
+        if getattr(self.local, 'pid', None) != os.getpid():
+            self.local.connection = self._connect()
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def add(self, articles):
+        """Store new articles (NewsAPI article dicts); returns how many were not already stored"""
+        now = _utc_iso(datetime.now(timezone.utc))
+        rows = [(
+            article['url'], title_hash(article['title']), article['title'], article.get('description'),
+            article.get('content'), article.get('source'), article.get('author'),
+            article.get('published_at') or now, now
+        ) for article in articles if article.get('url') and article.get('title')]
+        with self.connection as connection:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO articles (url, title_hash, title, description, content, source, author,"
+                " published_at, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            added = connection.total_changes - before
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_ingest', ?)", (now,))
+        return added
+
+    def recent(self, days=7, limit=15):
+        """Most recent articles published in the last `days`, newest first"""
+        cutoff = _utc_iso(datetime.now(timezone.utc) - timedelta(days=days))
+        rows = self.connection.execute(
+            f"SELECT {', '.join(ARTICLE_FIELDS)} FROM articles WHERE published_at >= ?"
+            " ORDER BY published_at DESC LIMIT ?", (cutoff, limit)
+        ).fetchall()
+        return [dict(zip(ARTICLE_FIELDS, row)) for row in rows]
+
+    def unembedded(self, limit=256):
+        """(id, title, description) of the newest articles without an embedding"""
+        return self.connection.execute(
+            "SELECT id, title, description FROM articles WHERE embedding IS NULL"
+            " ORDER BY published_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+    def set_embeddings(self, ids, embeddings):
+        """Store one float32 vector (bytes) per article id"""
+        with self.connection as connection:
+            connection.executemany("UPDATE articles SET embedding = ? WHERE id = ?",
+                                   [(embedding, article_id) for article_id, embedding in zip(ids, embeddings)])
+
+    def embedded(self, days=7, limit=2000):
+        """(article dicts, embedding bytes) of the most recent embedded articles, newest first"""
+        cutoff = _utc_iso(datetime.now(timezone.utc) - timedelta(days=days))
+        rows = self.connection.execute(
+            f"SELECT {', '.join(ARTICLE_FIELDS)}, embedding FROM articles"
+            " WHERE published_at >= ? AND embedding IS NOT NULL ORDER BY published_at DESC LIMIT ?", (cutoff, limit)
+        ).fetchall()
+        return [dict(zip(ARTICLE_FIELDS, row)) for row in rows], [row[-1] for row in rows]
+
+    def embedding_version(self):
+        """Changes whenever articles are embedded or pruned"""
+        return self.connection.execute(
+            "SELECT COUNT(embedding), MAX(CASE WHEN embedding IS NOT NULL THEN id END), MIN(id) FROM articles"
+        ).fetchone()
+
+    def get_profile(self, key):
+        row = self.connection.execute("SELECT embedding FROM profiles WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_profile(self, key, embedding):
+        with self.connection as connection:
+            connection.execute("INSERT OR REPLACE INTO profiles (key, embedding) VALUES (?, ?)", (key, embedding))
+
+    def get_meta(self, key):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, **values):
+        """Set meta values in one transaction; None deletes the key"""
+        with self.connection as connection:
+            for key, value in values.items():
+                if value is None:
+                    connection.execute("DELETE FROM meta WHERE key = ?", (key,))
+                else:
+                    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def latest_published(self):
+        """publishedAt of the newest stored article, or None for an empty store"""
+        return self.connection.execute("SELECT MAX(published_at) FROM articles").fetchone()[0]
+
+    def last_ingest_age(self):
+        """Seconds since articles were last ingested, or None if they never were"""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'last_ingest'").fetchone()
+        if row is None:
+            return None
+        last = datetime.strptime(row[0], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - last).total_seconds()
+
+    def prune(self, retention_days=None):
+        """Delete articles older than the retention period; returns how many were deleted"""
+        cutoff = _utc_iso(datetime.now(timezone.utc) - timedelta(days=retention_days or NEWS_RETENTION_DAYS))
+        with self.connection as connection:
+            return connection.execute("DELETE FROM articles WHERE published_at < ?", (cutoff,)).rowcount
+
+    def status(self):
+        try:
+            count, embedded, first, last = self.connection.execute(
+                "SELECT COUNT(*), COUNT(embedding), MIN(published_at), MAX(published_at) FROM articles").fetchone()
+            age = self.last_ingest_age()
+            return {'articles': count, 'embedded': embedded, 'first': first, 'last': last,
+                    'last_ingest_seconds_ago': round(age) if age is not None else None}
+        except Exception as e:
+            logger.error(f"Error reading news store status: {str(e)}")
+            return {'error': str(e)}
+
+
+class NewsIngester:
+    """Pulls new articles into the NewsStore every NEWS_INGEST_INTERVAL_MINUTES.
+
+    Like the cache warmer, only the process holding the lock file runs, so
+    newsapi.org is polled once across all gunicorn workers.
+    """
+
+    def __init__(self, ingest_fn, store, lock_path, interval_minutes=None):
+        self.ingest_fn = ingest_fn
+        self.store = store
+        self.lock_path = lock_path
+        self.interval = 60 * (interval_minutes or NEWS_INGEST_INTERVAL_MINUTES)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.lock_file = None
+        self.last_run = None
+        self.last_added = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='news-ingester', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _acquire_lock(self):
+        if self.lock_file is not None:
+            return True
+        if fcntl is None:
+            return False
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            if self._acquire_lock():
+                try:
+                    self.last_added = self.ingest_fn()
+                    self.last_run = datetime.now().isoformat()
+                    pruned = self.store.prune()
+                    if pruned:
+                        logger.info(f"Pruned {pruned} news articles past retention")
+                except Exception as e:
+                    logger.error(f"News ingestion failed: {str(e)}")
+            self.stop_event.wait(self.interval)
+
+    def status(self):
+        return {'leader': self.lock_file is not None, 'last_run': self.last_run, 'last_added': self.last_added}
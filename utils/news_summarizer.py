@@ -1,12 +1,20 @@
-import anthropic
 import os
 import json
+import time
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+from .lazy_import import LazyModule
+from .prompt_builder import build_news_themes_request, log_usage
+from .metrics import record_upstream_error
+from .deadline import timeout_for, DeadlineExceeded
+from .circuit_breaker import upstream_guard
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+anthropic = LazyModule('anthropic')
+
 class NewsSummarizer:
     def __init__(self):
         self.api_key = os.getenv('ANTHROPIC_API_KEY')
@@ -20,43 +28,33 @@ class NewsSummarizer:
                 logger.error(f"Failed to initialize Anthropic client: {str(e)}")
                 self.client = None
     
-    def summarize_market_impact(self, news_articles: List[Dict[str, Any]]) -> str:
-        """Summarize how global news affects stock markets in generic terms"""
+    def summarize_market_impact(self, news_articles: List[Dict[str, Any]], deadline=None) -> Optional[str]:
+        """Summarize how global news affects stock markets in generic terms.
+        
+        Returns None when Claude can't summarize (no client, circuit open, out of
+        time or an error); callers then use _get_fallback_summary and know not
+        to cache it.
+        """
         
         if not news_articles:
             return "stable market conditions defensive investing risk management"
         
-        # Format news for analysis
-        news_context = "Recent Global News:\n\n"
-        for i, article in enumerate(news_articles[:5], 1):
-            news_context += f"{i}. {article['title']}\n"
-            news_context += f"   {article['description']}\n\n"
-        
-        if not self.client:
-            return self._get_fallback_summary(news_articles)
+        guard = upstream_guard('anthropic')
+        if not self.client or not guard.allow():
+            return None
         
         try:
-            prompt = f"""
-Analyze the following global news and identify the general investment themes and market conditions they suggest. 
-Focus on broad investment patterns rather than specific companies.
-
-{news_context}
-
-Provide a concise analysis in 2-3 sentences about:
-1. What general market conditions these events suggest (volatility, uncertainty, growth, etc.)
-2. What investment themes or principles would be most relevant (defensive strategies, growth opportunities, risk management, etc.)
-3. What economic factors investors should consider (inflation, supply chains, geopolitical risk, etc.)
-
-Return ONLY the key investment themes and patterns as a short summary suitable for searching investment literature.
-"""
-            
+            # Static instructions go in the system prompt; only the news changes per call
+            started = time.monotonic()
             response = self.client.messages.create(
                 model="claude-3-5-sonnet-20241022",
                 max_tokens=200,
                 temperature=0.3,
-                system="You are a financial analyst who identifies general investment themes from current events.",
-                messages=[{"role": "user", "content": prompt}]
+                timeout=timeout_for(deadline, 60, minimum=2),
+                **build_news_themes_request(news_articles)
             )
+            guard.record_success()
+            log_usage("News themes", response, int((time.monotonic() - started) * 1000))
             
             # Handle response content
             if hasattr(response.content[0], 'text'):
@@ -67,9 +65,14 @@ Return ONLY the key investment themes and patterns as a short summary suitable f
             logger.info(f"Generated market impact summary: {summary[:100]}...")
             return summary
             
+        except DeadlineExceeded as e:
+            logger.warning(f"No news summary, out of time for the summarizer: {e}")
+            return None
         except Exception as e:
             logger.error(f"Error generating news summary: {e}")
-            return self._get_fallback_summary(news_articles)
+            record_upstream_error('anthropic')
+            guard.record_error(e)
+            return None
     
     def _get_fallback_summary(self, news_articles: List[Dict[str, Any]]) -> str:
         """Provide fallback summary when LLM is not available"""
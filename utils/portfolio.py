@@ -0,0 +1,163 @@
+import os
+import logging
+from statistics import NormalDist
+
+from .lazy_import import LazyModule
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+np = LazyModule('numpy')
+
+# Largest portfolio accepted by /portfolio
+MAX_PORTFOLIO_HOLDINGS = int(os.getenv('MAX_PORTFOLIO_HOLDINGS', 100))
+
+# Price history used for portfolio risk metrics
+PORTFOLIO_HISTORY_MONTHS = int(os.getenv('PORTFOLIO_HISTORY_MONTHS', 12))
+
+# Confidence level of the one-day value at risk
+PORTFOLIO_VAR_CONFIDENCE = float(os.getenv('PORTFOLIO_VAR_CONFIDENCE', 0.95))
+
+TRADING_DAYS = 252
+
+# Fewest daily returns that give meaningful volatility and correlation estimates
+MIN_RETURN_DAYS = 20
+
+
+def parse_holdings(holdings):
+    """Validate [{'ticker': 'AAPL', 'weight': 0.3}, ...] into [(ticker, weight)] with weights summing to 1.
+
+    Weights may be fractions, percentages or share counts - they are
+    normalized. Without any weights the portfolio is equally weighted.
+    Duplicate tickers are merged. Raises ValueError with a user-facing message.
+    """
+    if not isinstance(holdings, list) or not holdings:
+        raise ValueError('Please provide holdings as a list of {"ticker": ..., "weight": ...} objects.')
+
+    weights = {}
+    for holding in holdings:
+        if isinstance(holding, str):
+            holding = {'ticker': holding}
+        if not isinstance(holding, dict):
+            raise ValueError('Each holding must be an object with a ticker and a weight.')
+        ticker = str(holding.get('ticker') or '').upper().strip()
+        if not ticker or len(ticker) > 12:
+            raise ValueError(f'Invalid ticker symbol: {ticker or "(empty)"}')
+        weight = holding.get('weight', 1)
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid weight for {ticker}: {weight}')
+        if not weight >= 0 or weight == float('inf'):
+            raise ValueError(f'Invalid weight for {ticker}: {weight}')
+        weights[ticker] = weights.get(ticker, 0.0) + weight
+
+    if len(weights) > MAX_PORTFOLIO_HOLDINGS:
+        raise ValueError(f'A portfolio can have at most {MAX_PORTFOLIO_HOLDINGS} holdings.')
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError('Holding weights must add up to more than zero.')
+    return [(ticker, weight / total) for ticker, weight in weights.items() if weight > 0]
+
+
+def _pct(value, digits=2):
+    return round(float(value) * 100, digits)
+
+
+def portfolio_risk(dates, closes, tickers, weights, confidence=None):
+    """Risk metrics of a weighted portfolio from a (days x holdings) matrix of closes.
+
+    Everything is computed on whole arrays: one return matrix, one covariance
+    matrix and one portfolio return series, so the cost grows with days x
+    holdings^2 in NumPy rather than with Python loops. Weights are renormalized
+    over the given tickers (holdings without prices are dropped upstream).
+    """
+    confidence = confidence or PORTFOLIO_VAR_CONFIDENCE
+    closes = np.asarray(closes, dtype=float)
+    returns = closes[1:] / closes[:-1] - 1  # (days - 1) x holdings
+    if len(returns) < MIN_RETURN_DAYS:
+        raise ValueError(f'Not enough overlapping price history ({len(returns)} days) for risk metrics.')
+
+    w = np.asarray(weights, dtype=float)
+    w = w / w.sum()
+
+    cov = np.atleast_2d(np.cov(returns, rowvar=False))
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.where(np.outer(std, std) > 0, cov / np.outer(std, std), 0.0)
+    np.fill_diagonal(corr, 1.0)
+
+    portfolio_returns = returns @ w
+    variance = float(w @ cov @ w)
+    daily_vol = variance ** 0.5
+    # Share of portfolio variance each holding contributes (sums to 100%)
+    risk_contribution = w * (cov @ w) / variance if variance > 0 else np.zeros_like(w)
+
+    # One-day value at risk: historical (empirical quantile) and parametric (normal)
+    historical_var = -float(np.quantile(portfolio_returns, 1 - confidence))
+    tail = portfolio_returns[portfolio_returns <= -historical_var]
+    expected_shortfall = -float(tail.mean()) if len(tail) else historical_var
+    z = NormalDist().inv_cdf(confidence)
+    parametric_var = -(float(portfolio_returns.mean()) - z * daily_vol)
+
+    # Drawdowns of the portfolio and of every holding from their running peaks. Values
+    # start at 1.0 on dates[0], so values[k] is the value on dates[k] and a loss on the
+    # first day counts as a drawdown from the starting value
+    values = np.vstack([np.ones(returns.shape[1]), np.cumprod(1 + returns, axis=0)])
+    drawdowns = values / np.maximum.accumulate(values, axis=0) - 1
+    portfolio_value = np.concatenate([[1.0], np.cumprod(1 + portfolio_returns)])
+    portfolio_drawdowns = portfolio_value / np.maximum.accumulate(portfolio_value) - 1
+    trough = int(np.argmin(portfolio_drawdowns))
+    peak = int(np.argmax(portfolio_value[:trough + 1]))
+
+    annual_returns = (values[-1] ** (TRADING_DAYS / len(returns))) - 1
+    annual_vols = std * TRADING_DAYS ** 0.5
+    annual_vol = daily_vol * TRADING_DAYS ** 0.5
+    annual_return = float(portfolio_value[-1] ** (TRADING_DAYS / len(returns))) - 1
+
+    # Most correlated pairs from the upper triangle
+    rows, cols = np.triu_indices(len(tickers), 1)
+    pair_corr = corr[rows, cols]
+    top_pairs = np.argsort(pair_corr)[::-1][:5]
+
+    holdings = [{
+        'ticker': ticker,
+        'weight_pct': _pct(w[i]),
+        'annual_return_pct': _pct(annual_returns[i]),
+        'annual_volatility_pct': _pct(annual_vols[i]),
+        'max_drawdown_pct': _pct(drawdowns[:, i].min()),
+        'risk_contribution_pct': _pct(risk_contribution[i])
+    } for i, ticker in enumerate(tickers)]
+
+    return {
+        'period': {'start': dates[0], 'end': dates[-1], 'trading_days': len(returns)},
+        'annual_return_pct': _pct(annual_return),
+        'annual_volatility_pct': _pct(annual_vol),
+        'sharpe_ratio': round(annual_return / annual_vol, 2) if annual_vol > 0 else None,
+        'confidence': confidence,
+        'value_at_risk_pct': _pct(historical_var),
+        'parametric_var_pct': _pct(parametric_var),
+        'expected_shortfall_pct': _pct(expected_shortfall),
+        'max_drawdown_pct': _pct(portfolio_drawdowns[trough]),
+        'max_drawdown_period': {'peak': dates[peak], 'trough': dates[trough]},
+        'diversification_ratio': round(float(w @ std) / daily_vol, 2) if daily_vol > 0 else None,
+        'average_correlation': round(float(pair_corr.mean()), 3) if len(pair_corr) else None,
+        'top_correlated_pairs': [
+            {'pair': [tickers[rows[k]], tickers[cols[k]]], 'correlation': round(float(pair_corr[k]), 3)}
+            for k in top_pairs
+        ],
+        'holdings': holdings,
+        'correlation': {'tickers': list(tickers), 'matrix': np.round(corr, 3).tolist()}
+    }
+
+
+def sector_weights(holdings):
+    """Portfolio weight per sector (holdings without company data count as 'Unclassified')"""
+    sectors = {}
+    for holding in holdings:
+        sector = holding.get('sector') or 'Unclassified'
+        if sector == 'N/A':
+            sector = 'Unclassified'
+        sectors[sector] = sectors.get(sector, 0.0) + holding['weight_pct']
+    return dict(sorted(((sector, round(weight, 2)) for sector, weight in sectors.items()),
+                       key=lambda item: -item[1]))
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import hmac
+import cProfile
+import pstats
+import io
+import threading
+import logging
+from collections import Counter
+
+from flask import g, request
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=1)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Brendan Gregg collapsed-stack format, ready for flamegraph.pl / speedscope"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Opt-in per-request profiling stored in a bounded on-disk ring buffer.
+
+    A request is profiled when it is randomly sampled (PROFILE_SAMPLE_RATE) or
+    carries `X-Profile: 1` with the admin token. `cprofile` mode produces pstats
+    dumps; `sampling` mode samples the request thread's stack and produces
+    collapsed stacks for flame graphs. Profiles live in a shared directory so any
+    gunicorn worker can serve them. With sampling off and no header the cost is
+    a single comparison per request.
+    """
+
+    def __init__(self, profile_dir, sample_rate=None, admin_token=None, buffer_size=None,
+                 mode=None, sample_interval_ms=None):
+        self.profile_dir = os.path.abspath(profile_dir)
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+        self.admin_token = admin_token if admin_token is not None else os.getenv('PROFILE_ADMIN_TOKEN', '')
+        self.buffer_size = buffer_size or int(os.getenv('PROFILE_BUFFER_SIZE', 50))
+        self.mode = mode or os.getenv('PROFILE_MODE', 'cprofile')
+        self.sample_interval = (sample_interval_ms or float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5))) / 1000.0
+
+    def is_admin(self):
+        """True when the request carries the configured admin token"""
+        token = request.headers.get('X-Admin-Token', '')
+        return bool(self.admin_token) and hmac.compare_digest(token, self.admin_token)
+
+    def _should_profile(self):
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        return request.headers.get('X-Profile') == '1' and self.is_admin()
+
+    def init_app(self, app):
+        @app.before_request
+        def _start_profile():
+            if not self._should_profile():
+                return
+            if self.mode == 'sampling':
+                sampler = StackSampler(threading.get_ident(), self.sample_interval)
+                sampler.start()
+                g.profile = ('sampling', sampler, time.perf_counter())
+            else:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError as e:
+                    # Python 3.12+ allows one active cProfile per process; concurrent requests skip profiling
+                    logger.warning(f"Request not profiled: {str(e)}")
+                    return
+                g.profile = ('cprofile', profiler, time.perf_counter())
+
+        @app.after_request
+        def _finish_profile(response):
+            profile = g.pop('profile', None)
+            if profile is None:
+                return response
+            mode, collector, started = profile
+            if mode == 'sampling':
+                collector.stop()
+            else:
+                collector.disable()
+            try:
+                profile_id = self._store(mode, collector, time.perf_counter() - started, response.status_code)
+                response.headers['X-Profile-Id'] = profile_id
+            except Exception as e:
+                logger.error(f"Failed to store request profile: {str(e)}")
+            return response
+
+    def _store(self, mode, collector, duration, status):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        profile_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        base = os.path.join(self.profile_dir, profile_id)
+
+        if mode == 'sampling':
+            with open(base + '.collapsed', 'w') as f:
+                f.write(collector.collapsed())
+        else:
+            collector.dump_stats(base + '.pstats')
+
+        with open(base + '.json', 'w') as f:
+            json.dump({
+                'id': profile_id,
+                'mode': mode,
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': status,
+                'duration_ms': round(duration * 1000, 1),
+                'pid': os.getpid(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+            }, f)
+
+        self._prune()
+        logger.info(f"Stored {mode} profile {profile_id} for {request.path} ({duration * 1000:.0f} ms)")
+        return profile_id
+
+    def _prune(self):
+        """Keep only the newest `buffer_size` profiles (ids sort by creation time)"""
+        ids = sorted({name.split('.')[0] for name in os.listdir(self.profile_dir)})
+        for old_id in ids[:-self.buffer_size]:
+            for ext in ('.json', '.pstats', '.collapsed'):
+                try:
+                    os.remove(os.path.join(self.profile_dir, old_id + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self):
+        if not os.path.isdir(self.profile_dir):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.profile_dir), reverse=True):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.profile_dir, name)) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return profiles
+
+    def profile_path(self, profile_id, fmt):
+        """Path of a stored profile in a given format, or None. `text` renders pstats on the fly."""
+        if not profile_id.replace('-', '').isalnum():
+            return None
+        ext = '.pstats' if fmt in ('pstats', 'text') else '.collapsed'
+        path = os.path.join(self.profile_dir, profile_id + ext)
+        return path if os.path.exists(path) else None
+
+    @staticmethod
+    def pstats_text(path, limit=60):
+        stream = io.StringIO()
+        pstats.Stats(path, stream=stream).sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
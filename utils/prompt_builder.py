@@ -0,0 +1,210 @@
+import os
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bound on estimated input tokens for a portfolio analysis prompt (holdings need more room)
+PORTFOLIO_PROMPT_TOKEN_BUDGET = int(os.getenv('PORTFOLIO_PROMPT_TOKEN_BUDGET', 6000))
+
+# Longest excerpt taken from a single book chunk (at most three are sent)
+MAX_EXCERPT_CHARS = 400
+
+# Shortest excerpt worth sending; below this an excerpt is dropped instead
+MIN_EXCERPT_CHARS = 120
+
+# Rough characters-per-token ratio for English prose
+CHARS_PER_TOKEN = 4
+
+ANALYSIS_INSTRUCTIONS = """You are a professional stock analyst. You will be given investment principles from classic literature and the fundamentals of one company, and you provide a recommendation.
+
+Please provide your analysis in JSON format:
+{
+    "recommendation": "BUY|HOLD|SELL",
+    "confidence_score": <number between 0-100>,
+    "rationale": "<detailed explanation>",
+    "key_factors": ["<factor 1>", "<factor 2>"],
+    "risks": ["<risk 1>", "<risk 2>"],
+    "price_target": "<12-month target or N/A>"
+}
+
+Reference the investment principles when relevant."""
+
+PORTFOLIO_INSTRUCTIONS = """You are a professional portfolio analyst. You will be given investment principles from classic literature, the holdings of one portfolio and its risk metrics over the past year, and you assess the portfolio as a whole.
+
+Please provide your analysis in JSON format:
+{
+    "risk_level": "LOW|MODERATE|HIGH",
+    "confidence_score": <number between 0-100>,
+    "rationale": "<detailed explanation>",
+    "key_factors": ["<factor 1>", "<factor 2>"],
+    "risks": ["<risk 1>", "<risk 2>"],
+    "suggestions": ["<rebalancing or diversification suggestion 1>", "<suggestion 2>"]
+}
+
+Consider concentration, sector exposure, correlation between holdings, drawdowns and value at risk. Reference the investment principles when relevant."""
+
+NEWS_THEMES_INSTRUCTIONS = """You are a financial analyst who identifies general investment themes from current events.
+
+Analyze the global news you are given and identify the general investment themes and market conditions they suggest.
+Focus on broad investment patterns rather than specific companies.
+
+Provide a concise analysis in 2-3 sentences about:
+1. What general market conditions these events suggest (volatility, uncertainty, growth, etc.)
+2. What investment themes or principles would be most relevant (defensive strategies, growth opportunities, risk management, etc.)
+3. What economic factors investors should consider (inflation, supply chains, geopolitical risk, etc.)
+
+Return ONLY the key investment themes and patterns as a short summary suitable for searching investment literature."""
+
+
+def estimate_tokens(text):
+    """Cheap token estimate; good enough for budgeting, not for billing"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def build_book_context(rag_results, max_tokens=None):
+    """Format up to three book excerpts, shortening or dropping them to fit max_tokens (if given)"""
+    results = rag_results[:3]
+    if not results:
+        return "Investment literature context not available."
+
+    header = "RELEVANT INVESTMENT PRINCIPLES FROM LITERATURE:\n\n"
+
+    while results:
+        # Split what is left of the budget evenly across the remaining excerpts
+        overhead = sum(len(f"{i}. From '{r['book_name']}' (Page {r['page']}):\n   ...\n\n")
+                       for i, r in enumerate(results, 1))
+        if max_tokens is None:
+            excerpt_chars = MAX_EXCERPT_CHARS
+        else:
+            available_chars = max_tokens * CHARS_PER_TOKEN - len(header) - overhead
+            excerpt_chars = min(MAX_EXCERPT_CHARS, available_chars // len(results))
+
+        if excerpt_chars >= MIN_EXCERPT_CHARS:
+            book_context = header
+            for i, result in enumerate(results, 1):
+                text = result['text']
+                book_context += f"{i}. From '{result['book_name']}' (Page {result['page']}):\n"
+                book_context += f"   {text[:excerpt_chars]}{'...' if len(text) > excerpt_chars else ''}\n\n"
+            if len(results) < len(rag_results[:3]):
+                logger.info(f"Prompt budget: kept {len(results)} of {len(rag_results[:3])} book excerpts")
+            return book_context
+
+        # Least relevant excerpt goes first
+        results = results[:-1]
+
+    return "Investment literature context not available."
+
+
+def build_analysis_request(company_data, rag_results):
+    """Build messages.create arguments for a stock analysis.
+
+    Instructions and the book context go in the system prompt, the per-ticker
+    fundamentals in the user message. The whole prompt is a few hundred tokens
+    (three excerpts of at most MAX_EXCERPT_CHARS), below Anthropic's minimum
+    cacheable prefix, so no cache breakpoints are set and no budget applies.
+    """
+    company_name = company_data.get('name', 'Unknown Company')
+    ticker = company_data.get('symbol', 'UNKNOWN')
+
+    fundamentals = f"""Analyze {company_name} ({ticker}) and provide a recommendation.
+
+COMPANY FUNDAMENTALS:
+- Name: {company_name}
+- Ticker: {ticker}
+- Current Price: ${company_data.get('current_price', 'N/A')}
+- Market Cap: ${company_data.get('market_cap', 'N/A')}
+- P/E Ratio: {company_data.get('pe_ratio', 'N/A')}
+- Sector: {company_data.get('sector', 'N/A')}"""
+
+    return {
+        'system': f"{ANALYSIS_INSTRUCTIONS}\n\n{build_book_context(rag_results)}",
+        'messages': [{'role': 'user', 'content': fundamentals}]
+    }
+
+
+def _holding_line(holding):
+    name = holding.get('name') or holding['ticker']
+    sector = holding.get('sector') or 'N/A'
+    return (f"- {holding['ticker']} ({name}, {sector}): weight {holding['weight_pct']}%, "
+            f"return {holding['annual_return_pct']}%, volatility {holding['annual_volatility_pct']}%, "
+            f"max drawdown {holding['max_drawdown_pct']}%, risk contribution {holding['risk_contribution_pct']}%")
+
+
+def build_portfolio_request(risk, sectors, rag_results, token_budget=None):
+    """Build messages.create arguments for one consolidated portfolio analysis.
+
+    Holdings are listed largest first; when they don't fit the budget the
+    smallest ones are summarized in a single line. The instructions and book
+    context form the system prompt, as for a stock analysis.
+    """
+    token_budget = token_budget or PORTFOLIO_PROMPT_TOKEN_BUDGET
+    holdings = sorted(risk['holdings'], key=lambda holding: -holding['weight_pct'])
+    pairs = ', '.join(f"{'/'.join(p['pair'])} {p['correlation']}" for p in risk['top_correlated_pairs'])
+
+    summary = f"""Analyze this portfolio of {len(holdings)} holdings ({risk['period']['start']} to {risk['period']['end']}).
+
+PORTFOLIO RISK METRICS:
+- Annualized Return: {risk['annual_return_pct']}%
+- Annualized Volatility: {risk['annual_volatility_pct']}%
+- Sharpe Ratio (no risk-free rate): {risk['sharpe_ratio']}
+- One-day {int(risk['confidence'] * 100)}% Value at Risk: {risk['value_at_risk_pct']}% (expected shortfall {risk['expected_shortfall_pct']}%)
+- Maximum Drawdown: {risk['max_drawdown_pct']}%
+- Average Pairwise Correlation: {risk['average_correlation']}
+- Diversification Ratio: {risk['diversification_ratio']}
+- Most Correlated Pairs: {pairs or 'N/A'}
+
+SECTOR WEIGHTS:
+""" + '\n'.join(f"- {sector}: {weight}%" for sector, weight in sectors.items()) + "\n\nHOLDINGS:\n"
+
+    # Keep roughly a third of the budget for the book context
+    available = token_budget * 2 // 3 - estimate_tokens(PORTFOLIO_INSTRUCTIONS) - estimate_tokens(summary)
+    lines = []
+    for i, holding in enumerate(holdings):
+        line = _holding_line(holding)
+        if estimate_tokens(line) + 20 > available:
+            rest = holdings[i:]
+            lines.append(f"- {len(rest)} smaller holdings totalling {round(sum(h['weight_pct'] for h in rest), 2)}%")
+            logger.info(f"Prompt budget: listed {i} of {len(holdings)} holdings")
+            break
+        lines.append(line)
+        available -= estimate_tokens(line)
+    holdings_prompt = summary + '\n'.join(lines)
+
+    book_budget = token_budget - estimate_tokens(PORTFOLIO_INSTRUCTIONS) - estimate_tokens(holdings_prompt)
+    book_context = build_book_context(rag_results, book_budget)
+
+    return {
+        'system': f"{PORTFOLIO_INSTRUCTIONS}\n\n{book_context}",
+        'messages': [{'role': 'user', 'content': holdings_prompt}]
+    }
+
+
+def build_news_themes_request(news_articles):
+    """Build messages.create arguments for the news-to-themes summary"""
+    news_context = "Recent Global News:\n\n"
+    for i, article in enumerate(news_articles[:5], 1):
+        news_context += f"{i}. {article['title']}\n"
+        news_context += f"   {article['description']}\n\n"
+
+    return {
+        'system': NEWS_THEMES_INSTRUCTIONS,
+        'messages': [{'role': 'user', 'content': news_context}]
+    }
+
+
+def log_usage(label, message, latency_ms=None):
+    """Log input/output/cached token counts of a Messages API response and return them"""
+    usage = getattr(message, 'usage', None)
+    counts = {
+        'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+        'output_tokens': getattr(usage, 'output_tokens', 0) or 0,
+        'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+        'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0
+    }
+    logger.info(
+        f"{label} tokens: input={counts['input_tokens']} output={counts['output_tokens']} "
+        f"cache_write={counts['cache_creation_input_tokens']} cache_read={counts['cache_read_input_tokens']}"
+        + (f" latency={latency_ms}ms" if latency_ms is not None else "")
+    )
+    return counts
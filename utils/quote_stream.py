@@ -0,0 +1,189 @@
+import os
+import time
+import logging
+import threading
+from collections import defaultdict
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from .admission import Overloaded
+from .deadline import Deadline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How often the quotes of subscribed symbols are fetched
+QUOTE_POLL_SECONDS = float(os.getenv('QUOTE_POLL_SECONDS', 5))
+
+# Symbols per stream, and open streams per worker (each holds a thread under gthread, see gunicorn.conf.py's budget)
+QUOTE_MAX_SYMBOLS = int(os.getenv('QUOTE_MAX_SYMBOLS', 20))
+QUOTE_MAX_STREAMS = int(os.getenv('QUOTE_MAX_STREAMS', 4))
+
+# Streams end after this long and the browser reconnects, so idle tabs don't pin threads forever
+QUOTE_STREAM_MAX_SECONDS = float(os.getenv('QUOTE_STREAM_MAX_SECONDS', 300))
+
+# A comment line is sent when nothing changed for this long, so proxies keep the connection open
+QUOTE_HEARTBEAT_SECONDS = 15
+
+
+class Subscription:
+    """One client's pending quotes.
+
+    Pending quotes are kept per symbol and a newer quote replaces an unsent
+    one, so a slow client gets the latest prices when it catches up and never
+    holds more than one quote per symbol - the poller never waits on it.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.dropped = 0
+
+    def offer(self, quote):
+        with self.lock:
+            if quote['symbol'] in self.pending:
+                self.dropped += 1
+            self.pending[quote['symbol']] = quote
+        self.event.set()
+
+    def drain(self, timeout):
+        """Quotes that arrived since the last drain, waiting up to `timeout` seconds for one"""
+        if not self.event.wait(timeout):
+            return []
+        with self.lock:
+            self.event.clear()
+            quotes, self.pending = list(self.pending.values()), {}
+        return quotes
+
+
+class QuoteHub:
+    """Polls quotes for the symbols clients are subscribed to and fans them out.
+
+    A single poller thread per worker fetches every subscribed symbol in one
+    batched request per interval, however many clients watch it. Quotes go
+    through the shared cache under a lock file, so workers with overlapping
+    subscribers reuse each other's fetches instead of repeating them:
+    upstream load grows with the number of distinct symbols, not viewers.
+    """
+
+    def __init__(self, fetch_fn, cache, lock_path, interval=None, max_streams=None):
+        self.fetch_fn = fetch_fn
+        self.cache = cache
+        self.lock_path = lock_path
+        self.interval = interval or QUOTE_POLL_SECONDS
+        self.max_streams = max_streams or QUOTE_MAX_STREAMS
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)  # symbol -> subscriptions
+        self.streams = 0
+        self.latest = {}
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.polls = 0
+        self.fetched = 0
+
+    def subscribe(self, symbols):
+        """Register a client; raises Overloaded when this worker already serves max_streams"""
+        subscription = Subscription(symbols)
+        with self.lock:
+            if self.streams >= self.max_streams:
+                raise Overloaded('streams', max(1, int(self.interval)))
+            self.streams += 1
+            for symbol in symbols:
+                self.subscribers[symbol].add(subscription)
+            latest = [self.latest[symbol] for symbol in symbols if symbol in self.latest]
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='quote-poller', daemon=True)
+                self.thread.start()
+        for quote in latest:
+            subscription.offer(quote)
+        self.wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.streams -= 1
+            for symbol in subscription.symbols:
+                watchers = self.subscribers.get(symbol)
+                if watchers is not None:
+                    watchers.discard(subscription)
+                    if not watchers:
+                        del self.subscribers[symbol]
+                        self.latest.pop(symbol, None)
+
+    def symbols(self):
+        with self.lock:
+            return sorted(self.subscribers)
+
+    def publish(self, quotes):
+        """Hand changed quotes to their subscribers; unchanged ones are not resent"""
+        with self.lock:
+            deliveries = []
+            for symbol, quote in quotes.items():
+                previous = self.latest.get(symbol)
+                if previous and (previous['price'], previous['volume']) == (quote['price'], quote['volume']):
+                    continue
+                self.latest[symbol] = quote
+                deliveries.extend((subscription, quote) for subscription in self.subscribers.get(symbol, ()))
+        for subscription, quote in deliveries:
+            subscription.offer(quote)
+
+    def _cached(self, symbols):
+        return {symbol: quote for symbol in symbols
+                if (quote := self.cache.get({'type': 'quote', 'ticker': symbol})) is not None}
+
+    def poll_once(self):
+        """Fetch quotes of the subscribed symbols no worker fetched this interval, then publish all of them"""
+        symbols = self.symbols()
+        if not symbols:
+            return
+        self.polls += 1
+        quotes = self._cached(symbols)
+        missing = [symbol for symbol in symbols if symbol not in quotes]
+        if missing:
+            lock_file = open(self.lock_path, 'a') if fcntl is not None else None
+            try:
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    # Another worker may have fetched them while we waited
+                    quotes.update(self._cached(missing))
+                    missing = [symbol for symbol in missing if symbol not in quotes]
+                if missing:
+                    fetched = self.fetch_fn(missing, deadline=Deadline(self.interval * 2)) or {}
+                    self.fetched += len(fetched)
+                    for symbol, quote in fetched.items():
+                        self.cache.set({'type': 'quote', 'ticker': symbol}, quote,
+                                       expiry_hours=self.interval * 0.8 / 3600)
+                    quotes.update(fetched)
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+        self.publish(quotes)
+
+    def _run(self):
+        while True:
+            if not self.symbols():
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Quote poll failed: {str(e)}")
+            self.wakeup.wait(max(0.0, self.interval - (time.monotonic() - started)))
+            self.wakeup.clear()
+
+    def status(self):
+        with self.lock:
+            return {
+                'streams': self.streams,
+                'symbols': len(self.subscribers),
+                'polls': self.polls,
+                'quotes_fetched': self.fetched,
+                'interval_seconds': self.interval
+            }
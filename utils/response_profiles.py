@@ -0,0 +1,111 @@
+import os
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Response profiles accepted by /analyze
+PROFILES = ('full', 'slim', 'minimal')
+DEFAULT_PROFILE = 'full'
+
+# Server-side truncation limits used by the slim profile
+SUMMARY_MAX_CHARS = int(os.getenv('SLIM_SUMMARY_MAX_CHARS', 600))
+NEWS_DESCRIPTION_MAX_CHARS = int(os.getenv('SLIM_NEWS_DESCRIPTION_MAX_CHARS', 300))
+
+PRICE_COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+
+# Fields of a news article kept by the slim profile (full `content` is dropped)
+SLIM_NEWS_FIELDS = ('title', 'description', 'url', 'source', 'published_at')
+
+
+def truncate(text, max_chars):
+    """Truncate text to max_chars, appending an ellipsis when shortened"""
+    if not isinstance(text, str) or len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + '...'
+
+
+def to_columnar(price_data):
+    """Convert a list of OHLCV rows into a dict of columns"""
+    return {column: [row.get(column) for row in price_data] for column in PRICE_COLUMNS}
+
+
+def from_columnar(price_series):
+    """Convert a dict of OHLCV columns back into a list of rows"""
+    if not price_series:
+        return []
+    columns = [column for column in PRICE_COLUMNS if column in price_series]
+    return [dict(zip(columns, values)) for values in zip(*(price_series[c] for c in columns))]
+
+
+def compact_result(result):
+    """Canonical stored form of an analysis result.
+
+    The price series is kept once in columnar form; the Plotly chart JSON and the
+    top-level news_articles copy are dropped because both can be rebuilt from it.
+    Results cached before this format existed are converted on the fly.
+    """
+    if 'price_series' in result:
+        return result
+
+    compact = {key: value for key, value in result.items()
+               if key not in ('price_data', 'chart_data', 'news_articles')}
+    compact['price_series'] = to_columnar(result.get('price_data') or [])
+    return compact
+
+
+def _slim_news(articles):
+    slim = []
+    for article in articles or []:
+        item = {field: article.get(field) for field in SLIM_NEWS_FIELDS if field in article}
+        item['description'] = truncate(item.get('description'), NEWS_DESCRIPTION_MAX_CHARS)
+        slim.append(item)
+    return slim
+
+
+def _slim_analysis(analysis, include_news=True):
+    analysis = dict(analysis or {})
+    rag_context = dict(analysis.get('rag_context') or {})
+    if include_news:
+        rag_context['global_news'] = _slim_news(rag_context.get('global_news'))
+    else:
+        rag_context.pop('global_news', None)
+    analysis['rag_context'] = rag_context
+    return analysis
+
+
+def render_profile(stored, profile, chart_builder=None):
+    """Shape a stored (compact) analysis result for the requested response profile.
+
+    full    - the original payload: row-wise price_data, Plotly chart_data and news_articles
+    slim    - price series once in columnar form, no duplicated news, truncated text
+    minimal - recommendation, fundamentals and sources only; no price series or news
+    """
+    stored = compact_result(stored)
+
+    if profile == 'full':
+        result = {key: value for key, value in stored.items() if key != 'price_series'}
+        result['price_data'] = from_columnar(stored.get('price_series'))
+        result['news_articles'] = (stored.get('analysis', {}).get('rag_context', {}).get('global_news') or [])[:5]
+        company_name = stored.get('company_data', {}).get('name', stored.get('ticker'))
+        result['chart_data'] = chart_builder(result['price_data'], company_name) if chart_builder else None
+        return result
+
+    company_data = dict(stored.get('company_data') or {})
+
+    if profile == 'slim':
+        company_data['summary'] = truncate(company_data.get('summary'), SUMMARY_MAX_CHARS)
+        result = {key: value for key, value in stored.items() if key not in ('company_data', 'analysis')}
+        result['company_data'] = company_data
+        result['analysis'] = _slim_analysis(stored.get('analysis'))
+        return result
+
+    if profile == 'minimal':
+        company_data.pop('summary', None)
+        result = {key: value for key, value in stored.items()
+                  if key not in ('company_data', 'analysis', 'price_series')}
+        result['company_data'] = company_data
+        result['analysis'] = _slim_analysis(stored.get('analysis'), include_news=False)
+        return result
+
+    raise ValueError(f"Unknown response profile: {profile}")
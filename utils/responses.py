@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import json
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from flask import request, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional speedup
+    brotli = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are not worth compressing
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+
+# Number of encoded bodies kept in memory, keyed by ETag
+ENCODED_BODY_CACHE_SIZE = int(os.getenv('ENCODED_BODY_CACHE_SIZE', 64))
+
+_encoded_bodies = OrderedDict()
+_encoded_bodies_lock = threading.Lock()
+
+
+def dumps_json(payload):
+    """Serialize a payload to UTF-8 JSON bytes, using orjson when available"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY, default=str)
+        except TypeError as e:
+            logger.debug(f"orjson could not serialize payload, falling back to json: {str(e)}")
+    return json.dumps(payload, default=str, separators=(',', ':')).encode('utf-8')
+
+
+def make_etag(*parts):
+    """Build a strong ETag value from the given identifying parts"""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def entry_etag(entry, *variant):
+    """ETag for a cache entry returned by SimpleCache.get_entry, optionally per variant"""
+    return make_etag(entry.get('key'), entry.get('created'), *variant)
+
+
+def _choose_encoding():
+    """Pick the best content encoding the client accepts"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def _encoded_body(payload, etag, encoding):
+    """Return the (possibly compressed) body, reusing earlier encodings of the same ETag"""
+    variants = None
+    if etag:
+        with _encoded_bodies_lock:
+            variants = _encoded_bodies.get(etag)
+            if variants is not None:
+                _encoded_bodies.move_to_end(etag)
+    if variants is None:
+        # Encoding happens outside the lock; two threads may both encode a new ETag, which is harmless
+        variants = {'identity': dumps_json(payload() if callable(payload) else payload)}
+        if etag:
+            with _encoded_bodies_lock:
+                variants = _encoded_bodies.setdefault(etag, variants)
+                while len(_encoded_bodies) > ENCODED_BODY_CACHE_SIZE:
+                    _encoded_bodies.popitem(last=False)
+
+    identity = variants['identity']
+    if encoding is None or len(identity) < COMPRESSION_MIN_BYTES:
+        return identity, None
+
+    compressed = variants.get(encoding)
+    if compressed is None:
+        compressed = variants[encoding] = _compress(identity, encoding)
+    return compressed, encoding
+
+
+def _matching_client_etag(etag):
+    """Return the If-None-Match tag matching an ETag, ignoring content-encoding suffixes"""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return None
+    if if_none_match.star_tag:
+        return etag
+    for tag in if_none_match.as_set(include_weak=True):
+        if tag.split('-', 1)[0] == etag:
+            return tag
+    return None
+
+
+def json_response(payload, status=200, etag=None, cache_control='no-cache'):
+    """Build a compressed JSON response with ETag / If-None-Match support.
+
+    `payload` may be a zero-argument callable; it is only invoked when no encoded
+    body for the ETag is memoised yet.
+
+    The ETag names the identity representation; compressed variants carry an
+    encoding suffix so caches never mix them up.
+    """
+    headers = {'Vary': 'Accept-Encoding'}
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+
+    matched = _matching_client_etag(etag) if etag and status == 200 else None
+    if matched:
+        headers['ETag'] = f'"{matched}"'
+        return Response(status=304, headers=headers)
+
+    encoding = _choose_encoding()
+    body, encoding = _encoded_body(payload, etag, encoding)
+
+    if etag:
+        headers['ETag'] = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+    if encoding:
+        headers['Content-Encoding'] = encoding
+
+    return Response(body, status=status, headers=headers, mimetype='application/json')
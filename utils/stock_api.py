@@ -1,20 +1,68 @@
-import yfinance as yf
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+import os
 import logging
+import threading
+
+from .lazy_import import LazyModule
+from .metrics import record_upstream_error
+from .deadline import call_with_deadline, DeadlineExceeded, UpstreamTimeout
+from .circuit_breaker import upstream_guard
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# yfinance (and pandas with it) is imported on the first market data request
+yf = LazyModule('yfinance')
+np = LazyModule('numpy')
+
+# Share of trading days a holding needs prices for to be kept in a portfolio price matrix
+PORTFOLIO_MIN_COVERAGE = float(os.getenv('PORTFOLIO_MIN_COVERAGE', 0.8))
+
+# yfinance intraday limits per interval: (days of history available, days per request)
+INTRADAY_LIMITS = {
+    '1m': (30, 7),
+    '5m': (60, 60),
+    '60m': (730, 730)
+}
+
+# Columns of intraday bars as returned by get_intraday_bars
+INTRADAY_COLUMNS = ('ts', 'offset', 'open', 'high', 'low', 'close', 'volume')
+
+# yf.download collects results in module-level state, so concurrent downloads could mix them up
+_download_lock = threading.Lock()
+
+def _empty_bars():
+    return {name: np.array([], dtype=np.int32 if name == 'offset' else np.int64 if name in ('ts', 'volume') else float)
+            for name in INTRADAY_COLUMNS}
+
+def _frame_bars(frame):
+    """Columnar bars from a yfinance history frame; minutes without prices are dropped"""
+    if frame is None or frame.empty:
+        return _empty_bars()
+    frame = frame.dropna(subset=['Open', 'High', 'Low', 'Close'])
+    utc = np.asarray(frame.index.tz_convert('UTC').tz_localize(None), dtype='datetime64[s]').astype(np.int64)
+    local = np.asarray(frame.index.tz_localize(None), dtype='datetime64[s]').astype(np.int64)
+    bars = {'ts': utc, 'offset': (local - utc).astype(np.int32)}
+    for name in ('open', 'high', 'low', 'close'):
+        bars[name] = frame[name.capitalize()].to_numpy(dtype=float)
+    bars['volume'] = frame['Volume'].fillna(0).to_numpy(dtype=np.int64)
+    return bars
+
 class StockAPI:
-    def __init__(self):
-        pass
+    def __init__(self, symbol_index=None):
+        # Optional local symbol directory (utils.symbol_index.SymbolIndex) for offline validation
+        self.symbol_index = symbol_index
     
-    def get_company_info(self, ticker):
+    def get_company_info(self, ticker, deadline=None):
         """Get company information and key metrics"""
+        guard = upstream_guard('yfinance')
+        if not guard.allow():
+            return None
         try:
             stock = yf.Ticker(ticker)
-            info = stock.info
+            info = call_with_deadline(deadline, lambda: stock.info, cap=15)
+            guard.record_success()
             
             # Extract key metrics
             company_data = {
@@ -38,19 +86,30 @@ class StockAPI:
             logger.info(f"Successfully fetched company info for {ticker}")
             return company_data
             
+        except DeadlineExceeded as e:
+            logger.warning(f"Company info for {ticker} ran out of time: {str(e)}")
+            if isinstance(e, UpstreamTimeout):
+                guard.record_failure()
+            return None
         except Exception as e:
             logger.error(f"Error fetching company info for {ticker}: {str(e)}")
+            record_upstream_error('yfinance')
+            guard.record_error(e)
             return None
     
-    def get_historical_data(self, ticker, months=6):
+    def get_historical_data(self, ticker, months=6, deadline=None):
         """Get historical stock prices for the last specified months"""
+        guard = upstream_guard('yfinance')
+        if not guard.allow():
+            return None
         try:
             # Calculate start date
             end_date = datetime.now()
             start_date = end_date - timedelta(days=months * 30)
             
             stock = yf.Ticker(ticker)
-            hist_data = stock.history(start=start_date, end=end_date)
+            hist_data = call_with_deadline(deadline, stock.history, start=start_date, end=end_date, cap=15)
+            guard.record_success()
             
             if hist_data.empty:
                 logger.warning(f"No historical data found for {ticker}")
@@ -75,21 +134,221 @@ class StockAPI:
             logger.info(f"Successfully fetched {len(price_data)} days of historical data for {ticker}")
             return price_data
             
+        except DeadlineExceeded as e:
+            logger.warning(f"Historical data for {ticker} ran out of time: {str(e)}")
+            if isinstance(e, UpstreamTimeout):
+                guard.record_failure()
+            return None
         except Exception as e:
             logger.error(f"Error fetching historical data for {ticker}: {str(e)}")
+            record_upstream_error('yfinance')
+            guard.record_error(e)
+            return None
+    
+    def get_price_matrix(self, tickers, months=6, deadline=None):
+        """Aligned daily closes for many tickers, fetched in one batched download.
+        
+        Returns {'dates', 'tickers', 'closes', 'missing'} where closes is a
+        (days x tickers) float array. Tickers with prices for fewer than
+        PORTFOLIO_MIN_COVERAGE of the days are listed in `missing`; gaps in the
+        rest (holidays, halts) are forward-filled and days before every
+        remaining ticker has a price are dropped.
+        """
+        guard = upstream_guard('yfinance')
+        if not guard.allow():
+            return None
+        try:
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=months * 30)
+            
+            def download():
+                with _download_lock:
+                    return yf.download(tickers, start=start_date, end=end_date, auto_adjust=True,
+                                       progress=False, threads=True)
+            
+            frame = call_with_deadline(deadline, download, cap=20)
+            guard.record_success()
+            if frame is None or frame.empty:
+                logger.warning(f"No price data found for {len(tickers)} portfolio holdings")
+                return None
+            
+            closes = frame['Close']
+            if getattr(closes, 'columns', None) is None:
+                closes = closes.to_frame(tickers[0])  # older yfinance returns a Series for one ticker
+            closes = closes.reindex(columns=tickers)
+            coverage = closes.notna().mean()
+            usable = [ticker for ticker in tickers if coverage[ticker] >= PORTFOLIO_MIN_COVERAGE]
+            closes = closes[usable].ffill().dropna(how='any')
+            
+            logger.info(f"Fetched {len(closes)} days of prices for {len(usable)} of {len(tickers)} holdings")
+            return {
+                'dates': [date.strftime('%Y-%m-%d') for date in closes.index],
+                'tickers': usable,
+                'closes': closes.to_numpy(dtype=float),
+                'missing': [ticker for ticker in tickers if ticker not in usable]
+            }
+            
+        except DeadlineExceeded as e:
+            logger.warning(f"Portfolio price history ran out of time: {str(e)}")
+            if isinstance(e, UpstreamTimeout):
+                guard.record_failure()
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching portfolio price history: {str(e)}")
+            record_upstream_error('yfinance')
+            guard.record_error(e)
+            return None
+    
+    def get_quotes(self, tickers, deadline=None):
+        """Latest price, change and volume for many tickers from one batched download.
+
+        Returns {ticker: quote} for the tickers with prices, or None when the
+        request failed.
+        """
+        guard = upstream_guard('yfinance')
+        if not guard.allow():
+            return None
+        try:
+            def download():
+                with _download_lock:
+                    return yf.download(tickers, period='5d', interval='1d', auto_adjust=False,
+                                       progress=False, threads=True)
+
+            frame = call_with_deadline(deadline, download, cap=10)
+            guard.record_success()
+            if frame is None or frame.empty:
+                return {}
+
+            closes, volumes = frame['Close'], frame['Volume']
+            if getattr(closes, 'columns', None) is None:
+                closes, volumes = closes.to_frame(tickers[0]), volumes.to_frame(tickers[0])
+            updated_at = datetime.now().isoformat()
+            quotes = {}
+            for ticker in tickers:
+                if ticker not in closes.columns:
+                    continue
+                prices = closes[ticker].dropna()
+                if prices.empty:
+                    continue
+                price = float(prices.iloc[-1])
+                previous = float(prices.iloc[-2]) if len(prices) > 1 else None
+                quotes[ticker] = {
+                    'symbol': ticker,
+                    'price': round(price, 4),
+                    'change': round(price - previous, 4) if previous else None,
+                    'change_percent': round((price / previous - 1) * 100, 2) if previous else None,
+                    'volume': int(volumes[ticker].fillna(0).iloc[-1]),
+                    'updated_at': updated_at
+                }
+            return quotes
+
+        except DeadlineExceeded as e:
+            logger.warning(f"Quotes ran out of time: {str(e)}")
+            if isinstance(e, UpstreamTimeout):
+                guard.record_failure()
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching quotes for {len(tickers)} tickers: {str(e)}")
+            record_upstream_error('yfinance')
+            guard.record_error(e)
+            return None
+
+    def get_intraday_bars(self, ticker, start, end=None, interval='1m', deadline=None, on_window=None):
+        """Intraday OHLCV bars since `start` (aware datetime), fetched in windows within yfinance's limits.
+        
+        Returns columnar arrays sorted by time - 'ts' (UTC epoch seconds),
+        'offset' (the exchange's UTC offset in seconds, for session alignment),
+        'open', 'high', 'low', 'close', 'volume' - possibly empty, or None when
+        the request failed. With `on_window`, windows are fetched newest first
+        and each one's bars are passed to on_window(bars, window_start) as soon
+        as they arrive, so the caller keeps them if a later window fails.
+        """
+        guard = upstream_guard('yfinance')
+        if not guard.allow():
             return None
+        try:
+            max_days, window_days = INTRADAY_LIMITS[interval]
+            end = end or datetime.now(timezone.utc)
+            start = max(start, end - timedelta(days=max_days) + timedelta(minutes=1))
+            
+            stock = yf.Ticker(ticker)
+            windows = []
+            window_start = start
+            while window_start < end:
+                window_end = min(window_start + timedelta(days=window_days), end)
+                windows.append((window_start, window_end))
+                window_start = window_end
+            if on_window is not None:
+                windows.reverse()
+            
+            parts = []
+            for window_start, window_end in windows:
+                frame = call_with_deadline(deadline, stock.history, start=window_start, end=window_end,
+                                           interval=interval, prepost=False, cap=15)
+                parts.append(_frame_bars(frame))
+                if on_window is not None:
+                    on_window(parts[-1], window_start)
+            guard.record_success()
+            
+            bars = {name: np.concatenate([part[name] for part in parts]) for name in INTRADAY_COLUMNS} if parts else _empty_bars()
+            # Adjacent windows can share a bar; unique also sorts windows fetched newest first
+            _, first = np.unique(bars['ts'], return_index=True)
+            bars = {name: values[first] for name, values in bars.items()}
+            logger.info(f"Fetched {len(bars['ts'])} {interval} bars for {ticker}")
+            return bars
+            
+        except DeadlineExceeded as e:
+            logger.warning(f"Intraday data for {ticker} ran out of time: {str(e)}")
+            if isinstance(e, UpstreamTimeout):
+                guard.record_failure()
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching intraday data for {ticker}: {str(e)}")
+            record_upstream_error('yfinance')
+            guard.record_error(e)
+            return None
+    
+    def get_company_infos(self, tickers, deadline=None, max_workers=8):
+        """get_company_info for several tickers concurrently; {ticker: company_data} for those that succeeded"""
+        if not tickers:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as executor:
+            infos = executor.map(lambda ticker: self.get_company_info(ticker, deadline=deadline), tickers)
+            return {ticker: info for ticker, info in zip(tickers, infos) if info}
     
-    def validate_ticker(self, ticker):
-        """Validate if the ticker symbol exists"""
+    def validate_ticker(self, ticker, deadline=None):
+        """True if the ticker symbol exists, False if not, None when yfinance cannot tell right now.
+        
+        None (circuit open, out of time or a failed lookup) is not a verdict on
+        the ticker, so callers answer it with a retryable error instead of 400.
+        """
+        if self.symbol_index is not None:
+            if self.symbol_index.is_known(ticker):
+                return True
+            if self.symbol_index.rejects(ticker):
+                logger.info(f"{ticker} is not in the symbol directory")
+                return False
+        
+        guard = upstream_guard('yfinance')
+        if not guard.allow():
+            return None
         try:
             stock = yf.Ticker(ticker)
-            info = stock.info
+            info = call_with_deadline(deadline, lambda: stock.info, cap=15)
+            guard.record_success()
             
             # Check if we got valid data
             if 'symbol' in info or 'longName' in info:
                 return True
             return False
             
+        except DeadlineExceeded as e:
+            logger.warning(f"Validating {ticker} ran out of time: {str(e)}")
+            if isinstance(e, UpstreamTimeout):
+                guard.record_failure()
+            return None
         except Exception as e:
             logger.error(f"Error validating ticker {ticker}: {str(e)}")
-            return False 
\ No newline at end of file
+            record_upstream_error('yfinance')
+            guard.record_error(e)
+            return None
\ No newline at end of file
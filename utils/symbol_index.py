@@ -0,0 +1,258 @@
+import os
+import time
+import bisect
+import logging
+import threading
+
+from .lazy_import import LazyModule
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+requests = LazyModule('requests')
+
+# Nasdaq Trader's daily symbol directory: every security listed on US exchanges
+SYMBOL_DIRECTORY_URLS = {
+    'nasdaq': 'https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt',
+    'other': 'https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt'
+}
+
+EXCHANGE_NAMES = {'A': 'NYSE American', 'N': 'NYSE', 'P': 'NYSE Arca', 'Z': 'Cboe BZX', 'V': 'IEX'}
+
+# How old the stored directory may get before the refresher downloads it again
+SYMBOL_REFRESH_HOURS = float(os.getenv('SYMBOL_REFRESH_HOURS', 24))
+
+# Reject symbols missing from a downloaded directory instead of asking yfinance
+# (off by default: the directory only covers US listings)
+SYMBOL_INDEX_STRICT = os.getenv('SYMBOL_INDEX_STRICT', 'false').lower() == 'true'
+
+# How often lookups check whether another worker refreshed the stored file
+RELOAD_CHECK_SECONDS = 60
+
+
+def _yahoo_symbol(symbol):
+    """Nasdaq Trader writes share classes as BRK.B, Yahoo Finance as BRK-B"""
+    return symbol.replace('.', '-').replace('$', '-P')
+
+
+def parse_directory(text, source):
+    """Parse a pipe-delimited Nasdaq Trader file into (symbol, name, exchange, type) rows"""
+    lines = text.splitlines()
+    if not lines:
+        return []
+    header = lines[0].split('|')
+    rows = []
+    for line in lines[1:]:
+        fields = dict(zip(header, line.split('|')))
+        if line.startswith('File Creation Time') or fields.get('Test Issue') == 'Y':
+            continue
+        symbol = fields.get('Symbol') or fields.get('ACT Symbol') or fields.get('NASDAQ Symbol')
+        if not symbol:
+            continue
+        # 'Apple Inc. - Common Stock' -> 'Apple Inc.'
+        name = (fields.get('Security Name') or '').split(' - ')[0].strip()
+        exchange = 'NASDAQ' if source == 'nasdaq' else EXCHANGE_NAMES.get(fields.get('Exchange'), fields.get('Exchange', ''))
+        security_type = 'ETF' if fields.get('ETF') == 'Y' else 'Equity'
+        rows.append((_yahoo_symbol(symbol.strip().upper()), name, exchange, security_type))
+    return rows
+
+
+class SymbolIndex:
+    """In-memory symbol directory with a prefix index for validation and autocomplete.
+
+    The directory is stored as a TSV file shared by all gunicorn workers; each
+    worker keeps sorted arrays of symbols and name words and answers prefix
+    queries with bisect, so lookups never touch the network. Until the first
+    download succeeds the index holds only the seed entries.
+    """
+
+    def __init__(self, path, seed=None, refresh_hours=None):
+        self.path = os.path.abspath(path)
+        self.refresh_hours = refresh_hours or SYMBOL_REFRESH_HOURS
+        self.seed = [(symbol, name, '', 'Equity') for symbol, name in (seed or [])]
+        self.popular = {symbol for symbol, _ in (seed or [])}
+        self.loaded_mtime = None
+        self.complete = False
+        self.next_reload_check = 0.0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self._build(self.seed)
+        self.reload_if_changed(force=True)
+
+    def _build(self, rows):
+        rows = sorted({row[0]: row for row in rows}.values())
+        symbols = [row[0] for row in rows]
+        words = sorted(
+            (word, i)
+            for i, row in enumerate(rows)
+            for word in set(row[1].upper().replace(',', ' ').replace('-', ' ').split())
+        )
+        # One attribute holds the whole snapshot, so concurrent readers never mix old and new arrays
+        self._index = (rows, symbols, {symbol: i for i, symbol in enumerate(symbols)},
+                       words, [word for word, _ in words])
+
+    @property
+    def symbols(self):
+        return self._index[1]
+
+    def reload_if_changed(self, force=False):
+        """Load the stored directory if another worker (or the refresher) replaced it"""
+        now = time.monotonic()
+        if not force and now < self.next_reload_check:
+            return False
+        self.next_reload_check = now + RELOAD_CHECK_SECONDS
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self.loaded_mtime:
+            return False
+
+        with self.lock:
+            if mtime == self.loaded_mtime:
+                return False  # another thread loaded it while we waited
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    rows = [tuple(line.rstrip('\n').split('\t')) for line in f if line.strip()]
+                rows = [row for row in rows if len(row) == 4]
+                self._build(self.seed + rows)  # directory entries win over the seed
+                self.loaded_mtime = mtime
+                self.complete = bool(rows)
+                logger.info(f"Loaded {len(self.symbols)} symbols from {self.path}")
+                return True
+            except Exception as e:
+                logger.error(f"Error loading symbol directory: {str(e)}")
+                return False
+
+    def lookup(self, symbol):
+        """Directory entry for an exact symbol, or None"""
+        self.reload_if_changed()
+        entries, _, positions, _, _ = self._index
+        i = positions.get(symbol.upper())
+        return self._as_dict(entries[i]) if i is not None else None
+
+    def is_known(self, symbol):
+        self.reload_if_changed()
+        return symbol.upper() in self._index[2]
+
+    def rejects(self, symbol):
+        """True when strict validation is on and a full directory doesn't list the symbol"""
+        return SYMBOL_INDEX_STRICT and self.complete and not self.is_known(symbol)
+
+    def listed(self, security_type=None):
+        """All directory symbols, optionally only one security type ('Equity' or 'ETF')"""
+        self.reload_if_changed()
+        return [row[0] for row in self._index[0] if security_type is None or row[3] == security_type]
+
+    def search(self, query, limit=10):
+        """Ranked matches: exact symbol, symbol prefix, then name-word prefix"""
+        self.reload_if_changed()
+        query = query.strip().upper()
+        if not query:
+            return []
+        entries, symbols, _, words, word_keys = self._index
+        scored = {}
+
+        start = bisect.bisect_left(symbols, query)
+        for i in range(start, min(len(symbols), start + limit * 4)):
+            if not symbols[i].startswith(query):
+                break
+            rank = 0 if symbols[i] == query else 1
+            scored[i] = (rank, symbols[i] not in self.popular, len(symbols[i]), symbols[i])
+
+        first_word = query.split()[0]
+        start = bisect.bisect_left(word_keys, first_word)
+        for j in range(start, min(len(words), start + limit * 8)):
+            word, i = words[j]
+            if not word.startswith(first_word):
+                break
+            if i not in scored and (' ' not in query or query in entries[i][1].upper()):
+                scored[i] = (2, symbols[i] not in self.popular, len(symbols[i]), symbols[i])
+
+        ranked = sorted(scored, key=scored.get)[:limit]
+        return [self._as_dict(entries[i]) for i in ranked]
+
+    @staticmethod
+    def _as_dict(row):
+        symbol, name, exchange, security_type = row
+        return {'symbol': symbol, 'name': name, 'exchange': exchange, 'type': security_type}
+
+    def refresh(self, timeout=30):
+        """Download the symbol directory and atomically replace the stored file"""
+        try:
+            rows = []
+            for source, url in SYMBOL_DIRECTORY_URLS.items():
+                response = requests.get(url, timeout=timeout)
+                response.raise_for_status()
+                rows.extend(parse_directory(response.text, source))
+            if not rows:
+                logger.warning("Symbol directory download was empty, keeping the current file")
+                return False
+
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for row in rows:
+                    f.write('\t'.join(field.replace('\t', ' ') for field in row) + '\n')
+            os.replace(tmp_path, self.path)
+            logger.info(f"Refreshed symbol directory: {len(rows)} symbols")
+            self.reload_if_changed(force=True)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error refreshing symbol directory: {str(e)}")
+            return False
+
+    def is_stale(self):
+        try:
+            return time.time() - os.path.getmtime(self.path) > self.refresh_hours * 3600
+        except OSError:
+            return True
+
+    def start_refresher(self, check_minutes=60):
+        """Background refresh; a non-blocking file lock makes sure only one worker downloads"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(check_minutes * 60,),
+                                       name='symbol-refresher', daemon=True)
+        self.thread.start()
+
+    def stop_refresher(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _run(self, check_seconds):
+        while not self.stop_event.is_set():
+            if self.is_stale():
+                self._refresh_once()
+            self.reload_if_changed(force=True)
+            self.stop_event.wait(check_seconds)
+
+    def _refresh_once(self):
+        if fcntl is None:
+            return self.refresh()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False  # another worker is downloading
+            try:
+                return self.is_stale() and self.refresh()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def status(self):
+        return {
+            'symbols': len(self.symbols),
+            'complete': self.complete,
+            'updated': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_mtime)) if self.loaded_mtime else None
+        }
@@ -0,0 +1,431 @@
+import os
+import math
+import secrets
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from .lazy_import import LazyModule
+from .cache_warmer import market_open
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+np = LazyModule('numpy')
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS users (user TEXT PRIMARY KEY, created_at TEXT NOT NULL)",
+    """CREATE TABLE IF NOT EXISTS watchlist (
+        user TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        added_at TEXT NOT NULL,
+        PRIMARY KEY (user, ticker)
+    )""",
+    "CREATE INDEX IF NOT EXISTS watchlist_ticker ON watchlist (ticker)",
+    # metric and op are indexes into METRICS and OPS; armed is cleared while the condition holds
+    """CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY,
+        user TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        metric INTEGER NOT NULL,
+        op INTEGER NOT NULL,
+        threshold REAL NOT NULL,
+        armed INTEGER NOT NULL DEFAULT 1,
+        created_at TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS alerts_user ON alerts (user)",
+    """CREATE TABLE IF NOT EXISTS notifications (
+        id INTEGER PRIMARY KEY,
+        user TEXT NOT NULL,
+        alert_id INTEGER NOT NULL,
+        ticker TEXT NOT NULL,
+        metric INTEGER NOT NULL,
+        op INTEGER NOT NULL,
+        threshold REAL NOT NULL,
+        value REAL NOT NULL,
+        triggered_at TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS notifications_user_id ON notifications (user, id)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+]
+
+# Columns of the per-ticker metrics matrix alerts are evaluated against
+METRICS = ('price', 'change_pct', 'rsi', 'pe')
+OPS = ('above', 'below')
+
+WATCHLIST_MAX_TICKERS = int(os.getenv('WATCHLIST_MAX_TICKERS', 50))
+WATCHLIST_MAX_ALERTS = int(os.getenv('WATCHLIST_MAX_ALERTS', 100))
+
+# How often watched tickers are re-priced and alerts evaluated while the market is open
+ALERT_EVALUATE_MINUTES = float(os.getenv('ALERT_EVALUATE_MINUTES', 5))
+
+# Tickers per batched price download
+ALERT_BATCH_SIZE = 200
+
+RSI_PERIOD = 14
+
+NOTIFICATION_PAGE_SIZE = 100
+
+
+def wilder_rsi(closes, period=RSI_PERIOD):
+    """RSI of the last row of a (days x tickers) close matrix, Wilder-smoothed, for all tickers at once"""
+    days = closes.shape[0]
+    if days <= period:
+        return np.full(closes.shape[1], np.nan)
+    deltas = np.diff(closes, axis=0)
+    gains, losses = np.clip(deltas, 0, None), np.clip(-deltas, 0, None)
+    average_gain, average_loss = gains[:period].mean(axis=0), losses[:period].mean(axis=0)
+    for i in range(period, days - 1):
+        average_gain = (average_gain * (period - 1) + gains[i]) / period
+        average_loss = (average_loss * (period - 1) + losses[i]) / period
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + average_gain / average_loss)
+    return np.where(average_loss == 0, np.where(average_gain > 0, 100.0, 50.0), rsi)
+
+
+def compute_metrics(closes, pe_ratio=None, pe_price=None):
+    """(tickers x METRICS) matrix from a (days x tickers) close matrix.
+
+    P/E moves with the price: the stored ratio is rescaled by the latest
+    close over the price it was recorded at. Unknown values are NaN and never
+    trigger an alert.
+    """
+    tickers = closes.shape[1]
+    values = np.full((tickers, len(METRICS)), np.nan)
+    if closes.shape[0] == 0:
+        return values
+    price = closes[-1]
+    values[:, 0] = price
+    if closes.shape[0] > 1:
+        values[:, 1] = (price / closes[-2] - 1) * 100
+    values[:, 2] = wilder_rsi(closes)
+    if pe_ratio is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values[:, 3] = np.where(pe_price > 0, pe_ratio * price / pe_price, pe_ratio)
+    return values
+
+
+def evaluate(values, ticker_index, metric, op, threshold, armed):
+    """Evaluate every rule in one vectorized pass.
+
+    values is (tickers x METRICS); each rule is one element of the other
+    arrays. A rule fires when its condition holds and it is armed, and is
+    re-armed once the condition stops holding, so a level crossing alerts
+    once rather than on every evaluation. Returns (fired mask, new armed).
+    """
+    current = values[ticker_index, metric]
+    sign = np.where(op == 0, 1.0, -1.0)
+    with np.errstate(invalid='ignore'):
+        condition = (sign * (current - threshold) >= 0) & np.isfinite(current)
+    return condition & armed, ~condition
+
+
+class WatchlistStore:
+    """SQLite store of users' watchlists, alert rules and triggered notifications.
+
+    Users are identified by an unguessable id handed out when the watchlist
+    is created; holding it is what grants access. Like the history store,
+    SQLite in WAL mode lets every worker read and write, with one connection
+    per thread.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @property
+    def connection(self):
+        # Connections must not cross threads or a fork (gunicorn --preload)
+        if getattr(self.local, 'pid', None) != os.getpid():
+            self.local.connection = self._connect()
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def _bump_version(self, connection):
+        connection.execute("INSERT INTO meta (key, value) VALUES ('rules_version', 1)"
+                           " ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    def create_user(self):
+        user = secrets.token_urlsafe(16)
+        with self.connection as connection:
+            connection.execute("INSERT INTO users (user, created_at) VALUES (?, ?)", (user, datetime.now().isoformat()))
+        return user
+
+    def user_exists(self, user):
+        return self.connection.execute("SELECT 1 FROM users WHERE user = ?", (user,)).fetchone() is not None
+
+    def tickers(self, user):
+        return [row[0] for row in self.connection.execute(
+            "SELECT ticker FROM watchlist WHERE user = ? ORDER BY added_at, ticker", (user,))]
+
+    def add_tickers(self, user, tickers):
+        """Watch tickers; raises ValueError past WATCHLIST_MAX_TICKERS"""
+        current = set(self.tickers(user))
+        new = [ticker for ticker in dict.fromkeys(tickers) if ticker not in current]
+        if len(current) + len(new) > WATCHLIST_MAX_TICKERS:
+            raise ValueError(f"A watchlist holds at most {WATCHLIST_MAX_TICKERS} tickers")
+        now = datetime.now().isoformat()
+        with self.connection as connection:
+            connection.executemany("INSERT OR IGNORE INTO watchlist (user, ticker, added_at) VALUES (?, ?, ?)",
+                                   [(user, ticker, now) for ticker in new])
+            self._bump_version(connection)
+        return self.tickers(user)
+
+    def remove_ticker(self, user, ticker):
+        """Stop watching a ticker and drop its alerts"""
+        with self.connection as connection:
+            removed = connection.execute("DELETE FROM watchlist WHERE user = ? AND ticker = ?", (user, ticker)).rowcount
+            connection.execute("DELETE FROM alerts WHERE user = ? AND ticker = ?", (user, ticker))
+            self._bump_version(connection)
+        return removed > 0
+
+    def alerts(self, user):
+        rows = self.connection.execute(
+            "SELECT id, ticker, metric, op, threshold, armed, created_at FROM alerts WHERE user = ? ORDER BY id", (user,))
+        return [{'id': row[0], 'ticker': row[1], 'metric': METRICS[row[2]], 'op': OPS[row[3]], 'threshold': row[4],
+                 'armed': bool(row[5]), 'created_at': row[6]} for row in rows]
+
+    def add_alert(self, user, ticker, metric, op, threshold):
+        """Add a rule (watching its ticker too); raises ValueError for bad rules or past WATCHLIST_MAX_ALERTS"""
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+        if op not in OPS:
+            raise ValueError(f"op must be one of: {', '.join(OPS)}")
+        try:
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            raise ValueError("threshold must be a number")
+        if not math.isfinite(threshold):
+            raise ValueError("threshold must be a finite number")
+        count = self.connection.execute("SELECT COUNT(*) FROM alerts WHERE user = ?", (user,)).fetchone()[0]
+        if count >= WATCHLIST_MAX_ALERTS:
+            raise ValueError(f"A watchlist holds at most {WATCHLIST_MAX_ALERTS} alerts")
+        self.add_tickers(user, [ticker])
+        with self.connection as connection:
+            cursor = connection.execute(
+                "INSERT INTO alerts (user, ticker, metric, op, threshold, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (user, ticker, METRICS.index(metric), OPS.index(op), threshold, datetime.now().isoformat()))
+            self._bump_version(connection)
+        return cursor.lastrowid
+
+    def remove_alert(self, user, alert_id):
+        with self.connection as connection:
+            removed = connection.execute("DELETE FROM alerts WHERE user = ? AND id = ?", (user, alert_id)).rowcount
+            self._bump_version(connection)
+        return removed > 0
+
+    def watched_tickers(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT ticker FROM watchlist ORDER BY ticker")]
+
+    def rules_version(self):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'rules_version'").fetchone()
+        return row[0] if row else 0
+
+    def rules(self):
+        """Every alert rule as columns: {'id', 'user', 'ticker', 'metric', 'op', 'threshold', 'armed'}"""
+        rows = self.connection.execute(
+            "SELECT id, user, ticker, metric, op, threshold, armed FROM alerts ORDER BY id").fetchall()
+        columns = list(zip(*rows)) if rows else [()] * 7
+        return {
+            'id': np.array(columns[0], dtype=np.int64),
+            'user': np.array(columns[1], dtype=object),
+            'ticker': np.array(columns[2], dtype=object),
+            'metric': np.array(columns[3], dtype=np.int8),
+            'op': np.array(columns[4], dtype=np.int8),
+            'threshold': np.array(columns[5], dtype=float),
+            'armed': np.array(columns[6], dtype=bool)
+        }
+
+    def record_evaluation(self, notifications, rearmed, disarmed):
+        """Store triggered notifications and the rules whose armed state changed"""
+        with self.connection as connection:
+            connection.executemany(
+                "INSERT INTO notifications (user, alert_id, ticker, metric, op, threshold, value, triggered_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", notifications)
+            connection.executemany("UPDATE alerts SET armed = 1 WHERE id = ?", [(int(i),) for i in rearmed])
+            connection.executemany("UPDATE alerts SET armed = 0 WHERE id = ?", [(int(i),) for i in disarmed])
+
+    def notifications(self, user, since=0, limit=None):
+        """Notifications after the `since` cursor, oldest first; pass back `next_since` to get only newer ones"""
+        limit = limit or NOTIFICATION_PAGE_SIZE
+        rows = self.connection.execute(
+            "SELECT id, alert_id, ticker, metric, op, threshold, value, triggered_at FROM notifications"
+            " WHERE user = ? AND id > ? ORDER BY id LIMIT ?", (user, since, limit)).fetchall()
+        items = [{'id': row[0], 'alert_id': row[1], 'ticker': row[2], 'metric': METRICS[row[3]], 'op': OPS[row[4]],
+                  'threshold': row[5], 'value': round(row[6], 4), 'triggered_at': row[7]} for row in rows]
+        return {'items': items, 'next_since': items[-1]['id'] if items else since}
+
+    def status(self):
+        try:
+            users, watched, alerts, notifications = self.connection.execute(
+                "SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(DISTINCT ticker) FROM watchlist),"
+                " (SELECT COUNT(*) FROM alerts), (SELECT COUNT(*) FROM notifications)").fetchone()
+            return {'users': users, 'watched_tickers': watched, 'alerts': alerts, 'notifications': notifications}
+        except Exception as e:
+            logger.error(f"Error reading watchlist status: {str(e)}")
+            return {'error': str(e)}
+
+
+class AlertEvaluator:
+    """Re-prices watched tickers and evaluates every alert rule in one pass.
+
+    Like the news ingester, only the process holding the lock file runs, so
+    prices are fetched once across all gunicorn workers: one batched download
+    per ALERT_BATCH_SIZE tickers every ALERT_EVALUATE_MINUTES while the
+    market is open. Rules are kept as NumPy columns, reloaded only when the
+    store's rules change, and evaluated only when new prices arrived. The
+    latest metrics per ticker are published through the cache for watchlist
+    views.
+    """
+
+    def __init__(self, store, prices_fn, fundamentals, cache, lock_path, interval_minutes=None):
+        self.store = store
+        self.prices_fn = prices_fn
+        self.fundamentals = fundamentals
+        self.cache = cache
+        self.lock_path = lock_path
+        self.interval = 60 * (interval_minutes or ALERT_EVALUATE_MINUTES)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.lock_file = None
+        self.rules = None
+        self.rules_version = None
+        self.last_prices = None
+        self.last_run = None
+        self.last_fired = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='alert-evaluator', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _acquire_lock(self):
+        if self.lock_file is not None:
+            return True
+        if fcntl is None:
+            return False
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            if self._acquire_lock() and (market_open() or self.last_prices is None):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f"Alert evaluation failed: {str(e)}")
+            self.stop_event.wait(self.interval)
+
+    def metrics(self, tickers):
+        """(tickers, values) for the watched tickers that have prices, one batched download per ALERT_BATCH_SIZE"""
+        view = self.fundamentals.view()
+        priced, parts = [], []
+        for start in range(0, len(tickers), ALERT_BATCH_SIZE):
+            prices = self.prices_fn(tickers[start:start + ALERT_BATCH_SIZE], months=3)
+            if not prices or not prices['tickers']:
+                continue
+            positions = np.searchsorted(view['symbol'], prices['tickers']) if len(view['symbol']) else None
+            pe_ratio = pe_price = None
+            if positions is not None:
+                positions = np.minimum(positions, len(view['symbol']) - 1)
+                known = view['symbol'][positions] == np.array(prices['tickers'], dtype=view['symbol'].dtype)
+                pe_ratio = np.where(known, view['pe_ratio'][positions], np.nan)
+                pe_price = np.where(known, view['current_price'][positions], np.nan)
+            priced.extend(prices['tickers'])
+            parts.append(compute_metrics(prices['closes'], pe_ratio, pe_price))
+        values = np.vstack(parts) if parts else np.empty((0, len(METRICS)))
+        return priced, values
+
+    def run_once(self):
+        """Fetch prices and, if they changed, evaluate all rules; returns the number of alerts fired"""
+        tickers = self.store.watched_tickers()
+        if not tickers:
+            return 0
+        priced, values = self.metrics(tickers)
+        self.cache.set({'type': 'watchlist_metrics'}, {
+            ticker: {metric: (round(float(value), 4) if math.isfinite(value) else None)
+                     for metric, value in zip(METRICS, row)}
+            for ticker, row in zip(priced, values)
+        }, expiry_hours=24)
+        snapshot = (tuple(priced), values[:, 0].tobytes())
+        if snapshot == self.last_prices:
+            return 0  # No new bars since the last evaluation
+        self.last_prices = snapshot
+
+        version = self.store.rules_version()
+        if version != self.rules_version:
+            self.rules, self.rules_version = self.store.rules(), version
+        fired = self.evaluate(priced, values)
+        self.last_run = datetime.now().isoformat()
+        self.last_fired = fired
+        return fired
+
+    def evaluate(self, priced, values):
+        """Evaluate the loaded rules against a metrics matrix and record what fired"""
+        rules = self.rules
+        if not len(rules['id']):
+            return 0
+        order = np.argsort(np.array(priced, dtype=object))
+        sorted_tickers = np.array(priced, dtype=object)[order]
+        positions = np.minimum(np.searchsorted(sorted_tickers, rules['ticker']), max(len(priced) - 1, 0))
+        if len(priced):
+            known = sorted_tickers[positions] == rules['ticker']
+            ticker_index = order[positions]
+        else:
+            known = np.zeros(len(rules['id']), dtype=bool)
+            ticker_index = positions
+        # Rules of tickers without prices keep their state
+        padded = np.vstack([values, np.full((1, len(METRICS)), np.nan)])
+        ticker_index = np.where(known, ticker_index, len(priced))
+        fired, armed = evaluate(padded, ticker_index, rules['metric'], rules['op'], rules['threshold'], rules['armed'])
+        armed = np.where(known, armed, rules['armed'])
+
+        now = datetime.now().isoformat()
+        hits = np.flatnonzero(fired)
+        notifications = [(rules['user'][i], int(rules['id'][i]), rules['ticker'][i], int(rules['metric'][i]),
+                          int(rules['op'][i]), float(rules['threshold'][i]),
+                          float(padded[ticker_index[i], rules['metric'][i]]), now) for i in hits]
+        changed = armed != rules['armed']
+        self.store.record_evaluation(notifications, rules['id'][changed & armed], rules['id'][changed & ~armed])
+        rules['armed'] = armed
+        if len(hits):
+            logger.info(f"{len(hits)} alerts fired across {len(rules['id'])} rules")
+        return len(hits)
+
+    def status(self):
+        return {
+            'leader': self.lock_file is not None,
+            'last_run': self.last_run,
+            'last_fired': self.last_fired,
+            'rules_loaded': len(self.rules['id']) if self.rules is not None else None
+        }